@@ -0,0 +1,5 @@
+"""
+Benchmarks and the load-testing suite, run from the repo root:
+
+    python -m benchmarks.run --url http://localhost:8002
+"""
@@ -0,0 +1,92 @@
+"""
+Load-test the sync (threadpool) and async database paths side by side.
+
+Serves a small app with the same event lookup written both ways, against
+the database in DATABASE_URL, and reports requests/sec and latency
+percentiles for each.
+
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_async_db --concurrency 64
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+from fastapi import Depends, FastAPI
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.api.db.session import get_async_session, get_session
+from src.api.events.models import EventModel
+
+app = FastAPI()
+
+
+@app.get("/sync/{event_id}")
+def sync_lookup(event_id: int, session: Session = Depends(get_session)):
+    query = select(func.count()).select_from(EventModel).where(EventModel.id <= event_id)
+    return {"count": session.exec(query).one()}
+
+
+@app.get("/async/{event_id}")
+async def async_lookup(event_id: int, session: AsyncSession = Depends(get_async_session)):
+    query = select(func.count()).select_from(EventModel).where(EventModel.id <= event_id)
+    return {"count": (await session.exec(query)).one()}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_load(url, requests_total, concurrency):
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        local.session.get(f"{url}/{i % 1000 + 1}").raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests_total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_sec": round(requests_total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    report = {"concurrency": args.concurrency, "requests": args.requests}
+    for path in ("sync", "async"):
+        run_load(f"{base_url}/{path}", min(200, args.requests), args.concurrency)  # warm up
+        report[path] = run_load(f"{base_url}/{path}", args.requests, args.concurrency)
+    server.should_exit = True
+    thread.join()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Disk footprint and read_events latency with the events hypertable's
+chunks uncompressed and then compressed.
+
+Decompresses every chunk, measures, compresses the chunks older than
+--older-than (the model's compress_after by default) and measures again.
+Chunks are left the way the compression policy would leave them.
+
+Use a duration that doesn't line up with a rollup (e.g. "30 minutes") and
+a window over old data, otherwise read_events never touches raw chunks.
+
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_compression \
+        --url http://localhost:8002 --window-days 30
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+from sqlalchemy import text
+
+from src.api.db.session import engine
+from src.api.events.models import EventModel
+
+TABLE = EventModel.__tablename__
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def footprint():
+    with engine.connect() as conn:
+        total = conn.execute(text(f"SELECT hypertable_size('{TABLE}')")).scalar_one()
+        chunks = conn.execute(text(
+            f"SELECT count(*) FILTER (WHERE is_compressed), count(*) "
+            f"FROM timescaledb_information.chunks WHERE hypertable_name = '{TABLE}'"
+        )).one()
+    return {
+        "total_mb": round((total or 0) / 1024 / 1024, 2),
+        "compressed_chunks": chunks[0],
+        "chunks": chunks[1],
+    }
+
+
+def read_latency(url, params, requests_total):
+    session = requests.Session()
+    session.get(f"{url}/api/events/", params=params).raise_for_status()  # warm up
+    latencies = []
+    for _ in range(requests_total):
+        start = time.perf_counter()
+        session.get(f"{url}/api/events/", params=params).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def decompress_all():
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"SELECT decompress_chunk(c, if_compressed => true) FROM show_chunks('{TABLE}') c"
+        ))
+
+
+def compress_older_than(interval):
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"SELECT compress_chunk(c, if_not_compressed => true) "
+            f"FROM show_chunks('{TABLE}', older_than => CAST(:interval AS interval)) c"
+        ), {"interval": interval})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8002")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--duration", default="30 minutes")
+    parser.add_argument("--window-days", type=int, default=30)
+    default_after = EventModel.__compress_after__.replace("INTERVAL", "").strip()
+    parser.add_argument("--older-than", default=default_after)
+    args = parser.parse_args()
+
+    end = datetime.now(timezone.utc) - timedelta(days=7)
+    params = {
+        "duration": args.duration,
+        "start": (end - timedelta(days=args.window_days)).isoformat(),
+        "end": end.isoformat(),
+    }
+    decompress_all()
+    uncompressed = {**footprint(), **read_latency(args.url, params, args.requests)}
+    compress_older_than(args.older_than)
+    compressed = {**footprint(), **read_latency(args.url, params, args.requests)}
+    report = {
+        "params": params,
+        "uncompressed": uncompressed,
+        "compressed": compressed,
+        "size_ratio": round(uncompressed["total_mb"] / max(compressed["total_mb"], 0.01), 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
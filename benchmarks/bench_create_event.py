@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of the single-event write path.
+
+Runs the old ORM path (add -> commit -> refresh) and the current
+INSERT ... RETURNING path (insert_event) against the database in
+DATABASE_URL and reports time and SQL statements per event.
+
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_create_event --events 2000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.api.db.session import async_engine
+from src.api.events.dimensions import encode_rows
+from src.api.events.ingest import event_row, insert_event
+from src.api.events.models import EventCreateSchema, EventModel, EventReadSchema
+
+PAYLOAD = EventCreateSchema(
+    page="/pricing",
+    user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)",
+    ip_address="10.0.0.1",
+    referrer="",
+    session_id="bench-session",
+    duration=42,
+)
+
+statements = 0
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+async def create_orm(session):
+    # the previous create_event body
+    data = event_row(PAYLOAD)
+    encoded = (await encode_rows(session, [data]))[0]
+    obj = EventModel.model_validate(encoded)
+    session.add(obj)
+    await session.commit()
+    await session.refresh(obj)
+    return EventReadSchema(**data | {"id": obj.id, "time": obj.time}).model_dump_json()
+
+
+async def create_returning(session):
+    data = event_row(PAYLOAD)
+    event_id, created = await insert_event(session, data)
+    return EventReadSchema(**data | {"id": event_id, "time": created}).model_dump_json()
+
+
+async def run(create, events):
+    global statements
+    latencies = []
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        await create(session)  # warm up: pool, dimension cache
+        statements = 0
+        for _ in range(events):
+            start = time.perf_counter()
+            await create(session)
+            latencies.append(time.perf_counter() - start)
+    return {
+        "mean_us": round(statistics.mean(latencies) * 1e6, 1),
+        "p50_us": round(statistics.median(latencies) * 1e6, 1),
+        "statements_per_event": round(statements / events, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+
+    report = {
+        "events": args.events,
+        "orm_refresh": await run(create_orm, args.events),
+        "insert_returning": await run(create_returning, args.events),
+    }
+    report["speedup"] = round(
+        report["orm_refresh"]["mean_us"] / report["insert_returning"]["mean_us"], 2
+    )
+    print(json.dumps(report, indent=2))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
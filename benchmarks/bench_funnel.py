@@ -0,0 +1,125 @@
+"""
+Funnel query at scale: the one-pass funnel_progress aggregate against
+the classic self-join per step.
+
+Generates --rows synthetic events (10M by default) into a scratch
+hypertable indexed like eventmodel, runs both funnels over the same
+window and reports their timings and step counts. The scratch table is
+dropped afterwards. The self-join runs under --join-timeout and is
+reported as timed out past it.
+
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_funnel --rows 10000000
+"""
+import argparse
+import json
+import time
+from datetime import timedelta
+
+from sqlalchemy import MetaData, Table, text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from src.api.db.session import engine
+from src.api.events.funnel import funnel_query, sync_funnel_aggregate
+from src.api.events.models import get_utc_now
+
+TABLE = "bench_funnel_events"
+PAGES = 10
+
+GENERATE_SQL = f"""
+INSERT INTO {TABLE} (time, page_id, session_id, duration)
+SELECT
+    now() - random() * (:days * INTERVAL '1 day'),
+    -- skewed so later funnel steps are rarer
+    1 + floor({PAGES} * power(random(), 2))::int,
+    'session-' || floor(random() * :sessions)::int,
+    floor(random() * 300)::int
+FROM generate_series(1, :rows)
+"""
+
+
+def self_join_sql(steps):
+    """
+    Sessions reaching each step by joining the table once per step
+    """
+    joins = []
+    counts = ["count(DISTINCT e1.session_id)"]
+    for number in range(2, len(steps) + 1):
+        joins.append(
+            f"LEFT JOIN {TABLE} e{number} ON e{number}.session_id = e{number - 1}.session_id "
+            f"AND e{number}.page_id = {steps[number - 1]} AND e{number}.time > e{number - 1}.time "
+            f"AND e{number}.time < :end"
+        )
+        counts.append(f"count(DISTINCT e{number}.session_id)")
+    return (
+        f"SELECT {', '.join(counts)} FROM {TABLE} e1 {' '.join(joins)} "
+        f"WHERE e1.page_id = {steps[0]} AND e1.time >= :start AND e1.time < :end"
+    )
+
+
+def setup(rows, sessions, days):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        conn.execute(text(f"CREATE TABLE {TABLE} (LIKE eventmodel INCLUDING DEFAULTS)"))
+        conn.execute(text(
+            f"SELECT create_hypertable('{TABLE}', 'time', chunk_time_interval => INTERVAL '1 day')"
+        ))
+        conn.execute(text(GENERATE_SQL), {"rows": rows, "sessions": sessions, "days": days})
+        conn.execute(text(
+            f"CREATE INDEX ON {TABLE} (session_id, time) INCLUDE (page_id)"
+        ))
+        conn.execute(text(f"ANALYZE {TABLE}"))
+    with Session(engine) as session:
+        sync_funnel_aggregate(session)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--steps", default="1,3,5,7", help="page ids, in funnel order")
+    parser.add_argument("--join-timeout", type=int, default=120, help="seconds")
+    args = parser.parse_args()
+
+    steps = [int(step) for step in args.steps.split(",")]
+    end = get_utc_now()
+    start = end - timedelta(days=args.days)
+    started = time.perf_counter()
+    setup(args.rows, args.sessions, args.days)
+    report = {"rows": args.rows, "sessions": args.sessions, "steps": steps,
+              "setup_s": round(time.perf_counter() - started, 1)}
+    try:
+        table = Table(TABLE, MetaData(), autoload_with=engine)
+        with engine.connect() as conn:
+            started = time.perf_counter()
+            rows = conn.execute(funnel_query(steps, start, end, events=table)).all()
+            stopped = dict(rows)
+            reached = [sum(n for progress, n in stopped.items() if progress >= k)
+                       for k in range(1, len(steps) + 1)]
+            report["funnel_progress"] = {
+                "seconds": round(time.perf_counter() - started, 3),
+                "sessions": reached,
+            }
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL statement_timeout = '{args.join_timeout}s'"))
+            started = time.perf_counter()
+            try:
+                counts = conn.execute(text(self_join_sql(steps)), {"start": start, "end": end}).one()
+                report["self_join"] = {
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "sessions": list(counts),
+                }
+                report["speedup"] = round(
+                    report["self_join"]["seconds"] / report["funnel_progress"]["seconds"], 2
+                )
+            except OperationalError:
+                report["self_join"] = {"seconds": None, "timed_out_after_s": args.join_timeout}
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
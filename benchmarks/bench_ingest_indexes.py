@@ -0,0 +1,116 @@
+"""
+Measure what the EventModel index set costs on ingest.
+
+Creates two scratch hypertables shaped like eventmodel, one with the old
+single-column indexes and one with the composite indexes declared on the
+model, bulk inserts the same rows into each and reports inserts/sec and
+index size. The scratch tables are dropped afterwards.
+
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_ingest_indexes --rows 200000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import MetaData, Table, insert, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from src.api.db.session import engine
+from src.api.events.models import EventModel
+
+LEGACY_COLUMNS = [
+    "page_id", "user_agent_id", "ip_address", "referrer_id", "session_id", "operating_system",
+]
+OPERATING_SYSTEMS = ["Windows", "macOS", "iOS", "Android", "Linux"]
+
+
+def legacy_indexes(table):
+    return [f"CREATE INDEX ON {table} ({column})" for column in LEGACY_COLUMNS]
+
+
+def current_indexes(table):
+    statements = []
+    for index in EventModel.__table__.indexes:
+        sql = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        statements.append(sql.replace(f"INDEX {index.name} ON eventmodel", f"INDEX ON {table}"))
+    return statements
+
+
+def make_rows(count, pages, sessions):
+    start = datetime.now(timezone.utc) - timedelta(days=2)
+    step = timedelta(days=2) / count
+    return [
+        {
+            "time": start + step * i,
+            "page_id": random.randint(1, pages),
+            "user_agent_id": random.randint(1, 200),
+            "ip_address": f"10.0.{random.randint(0, 255)}.{random.randint(0, 255)}",
+            "referrer_id": random.randint(1, 50),
+            "session_id": f"session-{random.randint(1, sessions)}",
+            "duration": random.randint(1, 300),
+            "operating_system": random.choice(OPERATING_SYSTEMS),
+            "browser": "",
+            "device_type": "",
+        }
+        for i in range(count)
+    ]
+
+
+def bench_layout(name, index_sql, rows, batch_size):
+    table_name = f"bench_eventmodel_{name}"
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        conn.execute(text(f"CREATE TABLE {table_name} (LIKE eventmodel INCLUDING DEFAULTS)"))
+        conn.execute(text(
+            f"SELECT create_hypertable('{table_name}', 'time', "
+            f"chunk_time_interval => INTERVAL '1 day')"
+        ))
+        for statement in index_sql(table_name):
+            conn.execute(text(statement))
+        table = Table(table_name, MetaData(), autoload_with=conn)
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(rows), batch_size):
+            with engine.begin() as conn:
+                conn.execute(insert(table), rows[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        with engine.connect() as conn:
+            index_bytes = conn.execute(text(
+                f"SELECT COALESCE(SUM(index_bytes), 0) FROM chunks_detailed_size('{table_name}')"
+            )).scalar_one()
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+    return {
+        "indexes": len(index_sql(table_name)),
+        "inserts_per_sec": round(len(rows) / elapsed, 1),
+        "index_mb": round(index_bytes / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.pages, args.sessions)
+    before = bench_layout("legacy", legacy_indexes, rows, args.batch_size)
+    after = bench_layout("current", current_indexes, rows, args.batch_size)
+    report = {
+        "rows": args.rows,
+        "batch_size": args.batch_size,
+        "before": before,
+        "after": after,
+        "speedup": round(after["inserts_per_sec"] / before["inserts_per_sec"], 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Measure the per-request cost of MetricsMiddleware.
+
+Calls a trivial ASGI app directly (no network, no event-loop switches per
+request) with and without the middleware and reports the difference.
+
+    python -m benchmarks.bench_metrics_overhead --requests 200000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from src.api.metrics import MetricsMiddleware
+
+
+class Route:
+    path = "/api/events/{event_id}"
+
+
+async def plain_app(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def time_app(app, requests):
+    scope = {"type": "http", "method": "GET", "path": "/api/events/1"}
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    instrumented = MetricsMiddleware(plain_app)
+    asyncio.run(time_app(instrumented, 1000))  # warm up
+    baseline = asyncio.run(time_app(plain_app, args.requests))
+    with_metrics = asyncio.run(time_app(instrumented, args.requests))
+    print(json.dumps({
+        "requests": args.requests,
+        "baseline_us": round(baseline * 1e6, 3),
+        "with_metrics_us": round(with_metrics * 1e6, 3),
+        "overhead_us": round((with_metrics - baseline) * 1e6, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
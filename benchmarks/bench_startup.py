@@ -0,0 +1,99 @@
+"""
+Worker startup report: how long importing the app takes and how long a
+fresh server takes to answer its first request.
+
+Each measurement runs in a new interpreter. The first request is
+GET /healthz against `uvicorn src.main:app`, timed from process start.
+Neither needs a database: engines are created lazily and the schema is
+set up by `python -m src.api.db.migrate`, not at boot. With
+--thresholds (the "startup" entry of thresholds.json) violations are
+reported and the run exits with status 1, for CI.
+
+    python -m benchmarks.bench_startup --runs 5 --thresholds benchmarks/thresholds.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .run import check_thresholds
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import src.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import(env) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_request(env, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"no response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--thresholds")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    imports = [time_import(env) for _ in range(args.runs)]
+    first_requests = [time_first_request(env, args.timeout) for _ in range(args.runs)]
+    report = {
+        "startup": {
+            "runs": args.runs,
+            "import_ms": round(statistics.median(imports) * 1000, 1),
+            "first_request_ms": round(statistics.median(first_requests) * 1000, 1),
+        }
+    }
+    violations = []
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            violations = check_thresholds(report, json.load(f))
+        report["violations"] = violations
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
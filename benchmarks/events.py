@@ -0,0 +1,58 @@
+"""
+Seeded generator of realistic-looking page events.
+
+The same seed always produces the same events, so runs are comparable.
+"""
+import random
+from typing import Dict, List
+
+# weights roughly follow a marketing site: landing pages dominate
+PAGES = {
+    "/": 30, "/pricing": 12, "/about": 8, "/blog": 10, "/products": 10,
+    "/contact": 4, "/login": 8, "/signup": 5, "/dashboard": 10, "/settings": 3,
+}
+USER_AGENTS = {
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36": 35,
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15": 20,
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148": 20,
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Mobile Safari/537.36": 12,
+    "Mozilla/5.0 (iPad; CPU OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148": 5,
+    "Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0": 5,
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)": 3,
+}
+REFERRERS = {
+    "": 40, "https://google.com": 30, "https://twitter.com": 8,
+    "https://linkedin.com": 7, "https://github.com": 10, "https://facebook.com": 5,
+}
+
+
+class EventFactory:
+    """
+    Builds POST /api/events/ payloads. Sessions are reused so events
+    cluster into visits the way real traffic does.
+    """
+
+    def __init__(self, seed: int = 0, sessions: int = 500):
+        self.rng = random.Random(seed)
+        self.sessions = [
+            f"{self.rng.getrandbits(64):016x}-{self.rng.getrandbits(64):016x}"
+            for _ in range(sessions)
+        ]
+
+    def pick(self, weighted: Dict[str, int]) -> str:
+        return self.rng.choices(list(weighted), weights=list(weighted.values()))[0]
+
+    def event(self) -> Dict:
+        return {
+            "page": self.pick(PAGES),
+            "user_agent": self.pick(USER_AGENTS),
+            "ip_address": f"{self.rng.randint(1, 223)}.{self.rng.randint(0, 255)}."
+                          f"{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}",
+            "referrer": self.pick(REFERRERS),
+            "session_id": self.rng.choice(self.sessions),
+            # time on page: mostly short, long tail
+            "duration": int(self.rng.lognormvariate(3, 1)),
+        }
+
+    def events(self, count: int) -> List[Dict]:
+        return [self.event() for _ in range(count)]
@@ -0,0 +1,65 @@
+"""
+Concurrent async load generator.
+
+`run_load` keeps `concurrency` requests in flight until `total` have
+completed and summarizes throughput and latency percentiles.
+"""
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List, Sequence
+
+# one request: (request number) -> items it carried (0 when it failed)
+Request = Callable[[int], Awaitable[int]]
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, items: int, elapsed: float) -> Dict:
+    requests_total = len(latencies)
+    if not latencies:
+        latencies = [0.0]
+    return {
+        "requests": requests_total,
+        "errors": errors,
+        "error_rate": round(errors / requests_total, 4) if requests_total else 0.0,
+        "throughput_rps": round(requests_total / elapsed, 1) if elapsed else 0.0,
+        "items_per_sec": round(items / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_load(request: Request, total: int, concurrency: int) -> Dict:
+    """
+    Issue `total` requests with at most `concurrency` in flight.
+    Exceptions from `request` count as errors, they don't stop the run.
+    """
+    latencies: List[float] = []
+    counters = {"next": 0, "errors": 0, "items": 0}
+
+    async def worker():
+        while counters["next"] < total:
+            number = counters["next"]
+            counters["next"] += 1
+            start = time.perf_counter()
+            try:
+                items = await request(number)
+            except Exception:
+                items = 0
+            latencies.append(time.perf_counter() - start)
+            if items:
+                counters["items"] += items
+            else:
+                counters["errors"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, counters["errors"], counters["items"], elapsed)
@@ -0,0 +1,113 @@
+"""
+Run the load-testing scenarios against a running API and report
+throughput and p50/p95/p99 latency per scenario as JSON.
+
+    python -m benchmarks.run --url http://localhost:8002
+    python -m benchmarks.run --scenario ingest_batch --scenario get_event \
+        --requests 2000 --concurrency 64 --output report.json
+    python -m benchmarks.run --thresholds benchmarks/thresholds.json
+
+The API needs a PostgreSQL/TimescaleDB database behind it (the
+db_service in compose.yaml works). With --thresholds, any violated limit
+is listed under "violations" and the run exits with status 1.
+
+thresholds.json maps scenario names to limits. Keys ending in _ms or
+error_rate are maxima, everything else is a minimum:
+
+    {"ingest_batch": {"items_per_sec": 5000, "p99_ms": 500, "error_rate": 0}}
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+
+from .events import EventFactory
+from .loadgen import run_load
+from .scenarios import SCENARIOS, SkipScenario
+
+
+def is_maximum(metric: str) -> bool:
+    return metric.endswith("_ms") or metric == "error_rate"
+
+
+def check_thresholds(results: Dict[str, Dict], thresholds: Dict[str, Dict]) -> List[str]:
+    """
+    Human-readable descriptions of every limit the results break.
+    Scenarios that didn't run are skipped.
+    """
+    violations = []
+    for name, limits in thresholds.items():
+        if name not in results:
+            continue
+        for metric, limit in limits.items():
+            value = results[name].get(metric)
+            if value is None:
+                violations.append(f"{name}: unknown metric {metric!r}")
+            elif is_maximum(metric) and value > limit:
+                violations.append(f"{name}: {metric} {value} > {limit}")
+            elif not is_maximum(metric) and value < limit:
+                violations.append(f"{name}: {metric} {value} < {limit}")
+    return violations
+
+
+async def run_scenarios(args) -> Dict[str, Dict]:
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        for name in args.scenario or list(SCENARIOS):
+            # every scenario starts from the same seed
+            factory = EventFactory(seed=args.seed)
+            try:
+                request = await SCENARIOS[name].prepare(client, factory, {"batch_size": args.batch_size})
+            except SkipScenario as e:
+                print(f"{name}: skipped, {e}", file=sys.stderr)
+                continue
+            await run_load(request, min(args.warmup, args.requests), args.concurrency)
+            results[name] = await run_load(request, args.requests, args.concurrency)
+            print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8002")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--thresholds")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    results = asyncio.run(run_scenarios(args))
+    report = {
+        "url": args.url,
+        "started_at": started_at,
+        "seed": args.seed,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "batch_size": args.batch_size,
+        "scenarios": results,
+    }
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            report["violations"] = check_thresholds(results, json.load(f))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if report.get("violations"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Load-test scenarios against the events API.
+
+Each scenario's `prepare` does any setup (e.g. seeding events to look
+up) and returns the per-request coroutine handed to `run_load`, or
+raises SkipScenario when the server can't run it.
+"""
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict
+
+import httpx
+
+from .events import EventFactory
+from .loadgen import Request
+
+Prepare = Callable[[httpx.AsyncClient, EventFactory, Dict], Awaitable[Request]]
+# ingest statuses: 202 when the server spools or buffers writes
+INGESTED = (200, 202)
+
+
+class SkipScenario(Exception):
+    """Raised by `prepare` when the scenario can't run against this server"""
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    description: str
+    prepare: Prepare
+
+
+async def prepare_ingest_single(client, factory, options):
+    async def request(number):
+        response = await client.post("/api/events/", json=factory.event())
+        return 1 if response.status_code in INGESTED else 0
+    return request
+
+
+async def prepare_ingest_batch(client, factory, options):
+    async def request(number):
+        response = await client.post("/api/events/batch", json=factory.events(options["batch_size"]))
+        return response.json()["created"] if response.status_code in INGESTED else 0
+    return request
+
+
+def prepare_read_events(duration: str) -> Prepare:
+    async def prepare(client, factory, options):
+        async def request(number):
+            response = await client.get("/api/events/", params={"duration": duration})
+            return 1 if response.status_code == 200 else 0
+        return request
+    return prepare
+
+
+async def prepare_get_event(client, factory, options):
+    # look up events this run created so every request is a hit
+    response = await client.post("/api/events/batch", json=factory.events(options["batch_size"]))
+    response.raise_for_status()
+    ids = [item["id"] for item in response.json()["results"] if item["id"] is not None]
+    if not ids:
+        # spooled events only get ids once the replayer inserts them
+        raise SkipScenario(f"seeding returned no event ids (status {response.status_code})")
+
+    async def request(number):
+        response = await client.get(f"/api/events/{ids[number % len(ids)]}")
+        return 1 if response.status_code == 200 else 0
+    return request
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario("ingest_single", "POST /api/events/, one event per request", prepare_ingest_single),
+        Scenario("ingest_batch", "POST /api/events/batch, batch_size events per request", prepare_ingest_batch),
+        # 15 minutes is finer than any rollup, so it aggregates raw chunks
+        Scenario("read_events_15m", "GET /api/events/?duration=15 minutes (raw)", prepare_read_events("15 minutes")),
+        Scenario("read_events_1h", "GET /api/events/?duration=1 hour (hourly rollup)", prepare_read_events("1 hour")),
+        Scenario("read_events_1d", "GET /api/events/?duration=1 day (daily rollup)", prepare_read_events("1 day")),
+        Scenario("get_event", "GET /api/events/{id}", prepare_get_event),
+    ]
+}
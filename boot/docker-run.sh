@@ -5,5 +5,14 @@ source /opt/venv/bin/activate
 cd /code
 RUN_PORT=${PORT:-8000}
 RUN_HOST=${HOST:-0.0.0.0}
+# workers on this host share counters and caches through files here
+export SHM_DIR=${SHM_DIR:-/dev/shm/analytics-api}
+
+# schema setup (idempotent) before any worker serves; set RUN_MIGRATIONS=0
+# where a separate deploy step already runs it
+if [ "${RUN_MIGRATIONS:-1}" != "0" ]; then
+    # src/ is /code in the image, so src.api.db.migrate is api.db.migrate
+    python -m api.db.migrate || exit 1
+fi
 
 gunicorn -k uvicorn.workers.UvicornWorker -b $RUN_HOST:$RUN_PORT main:app 
\ No newline at end of file
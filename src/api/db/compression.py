@@ -0,0 +1,130 @@
+"""
+Idempotent compression setup for TimescaleModel hypertables.
+
+timescaledb.sync_compression_policies re-runs ALTER TABLE ... SET
+(timescaledb.compress) and add_compression_policy on every call, which
+fails on the second start once a policy exists. This reads the current
+settings and policy first and only changes what differs from the model.
+"""
+import logging
+from typing import List, Optional, Tuple, Type
+
+import sqlalchemy
+from sqlmodel import Session, SQLModel
+from timescaledb.compression.extractors import (
+    extract_model_compression_params,
+    extract_model_compression_policy_params,
+)
+from timescaledb.compression.sql import format_alter_compression_policy_sql
+from timescaledb.models import TimescaleModel
+
+logger = logging.getLogger(__name__)
+
+# (column, ascending)
+OrderBy = List[Tuple[str, bool]]
+
+CURRENT_SETTINGS_SQL = sqlalchemy.text("""
+SELECT attname, segmentby_column_index, orderby_column_index, orderby_asc
+FROM timescaledb_information.compression_settings
+WHERE hypertable_name = :table_name
+""")
+
+CURRENT_POLICY_SQL = sqlalchemy.text("""
+SELECT (config->>'compress_after')::interval = CAST(:compress_after AS interval)
+FROM timescaledb_information.jobs
+WHERE proc_name = 'policy_compression' AND hypertable_name = :table_name
+""")
+
+ADD_POLICY_SQL = sqlalchemy.text("""
+SELECT add_compression_policy(
+    CAST(:table_name AS regclass), compress_after => CAST(:compress_after AS interval), if_not_exists => true
+)
+""")
+
+REMOVE_POLICY_SQL = sqlalchemy.text(
+    "SELECT remove_compression_policy(CAST(:table_name AS regclass), if_exists => true)"
+)
+
+
+def compression_models() -> List[Type[SQLModel]]:
+    return [
+        model
+        for model in TimescaleModel.__subclasses__()
+        if getattr(model, "__table__", None) is not None
+        and extract_model_compression_params(model) is not None
+    ]
+
+
+def parse_orderby(orderby: Optional[str]) -> OrderBy:
+    """
+    "time DESC, page_id" -> [("time", False), ("page_id", True)]
+    """
+    if not orderby:
+        return []
+    parsed = []
+    for spec in orderby.split(","):
+        parts = spec.split()
+        parsed.append((parts[0], len(parts) < 2 or parts[1].upper() != "DESC"))
+    return parsed
+
+
+def declared_settings(model: Type[SQLModel]) -> Tuple[List[str], OrderBy]:
+    params = extract_model_compression_params(model) or {}
+    segmentby = params.get("compress_segmentby")
+    segmentby = [column.strip() for column in segmentby.split(",")] if segmentby else []
+    return segmentby, parse_orderby(params.get("compress_orderby"))
+
+
+def current_settings(session: Session, table_name: str) -> Optional[Tuple[List[str], OrderBy]]:
+    """
+    None when compression was never enabled on the table
+    """
+    rows = session.execute(CURRENT_SETTINGS_SQL, {"table_name": table_name}).all()
+    if not rows:
+        return None
+    segmentby = [row.attname for row in sorted(
+        (row for row in rows if row.segmentby_column_index is not None),
+        key=lambda row: row.segmentby_column_index,
+    )]
+    orderby = [(row.attname, row.orderby_asc) for row in sorted(
+        (row for row in rows if row.orderby_column_index is not None),
+        key=lambda row: row.orderby_column_index,
+    )]
+    return segmentby, orderby
+
+
+def sync_compression(session: Session, *models: Type[SQLModel]) -> None:
+    """
+    Enable compression and the compress_after policy declared on each
+    model. Safe to call on every start.
+    """
+    for model in models or compression_models():
+        table_name = model.__tablename__
+        params = extract_model_compression_params(model)
+        if params is None:
+            continue
+        if current_settings(session, table_name) != declared_settings(model):
+            logger.info(f"Setting compression on `{table_name}`")
+            sql = format_alter_compression_policy_sql(
+                table_name,
+                with_orderby="compress_orderby" in params,
+                with_segmentby="compress_segmentby" in params,
+            )
+            bind = {k: v for k, v in params.items() if k in ("compress_orderby", "compress_segmentby")}
+            # ALTER TABLE takes no bind parameters, inline them
+            query = sqlalchemy.text(sql).bindparams(**bind)
+            session.execute(sqlalchemy.text(str(query.compile(compile_kwargs={"literal_binds": True}))))
+
+        compress_after = extract_model_compression_policy_params(model).get("compress_after")
+        if compress_after is None:
+            continue
+        compress_after = compress_after.replace("INTERVAL", "").strip().strip("'\"")
+        policy = {"table_name": table_name, "compress_after": compress_after}
+        up_to_date = session.execute(CURRENT_POLICY_SQL, policy).scalar()
+        if up_to_date:
+            continue
+        if up_to_date is not None:
+            logger.info(f"Replacing compression policy on `{table_name}`")
+            session.execute(REMOVE_POLICY_SQL, {"table_name": table_name})
+        session.execute(ADD_POLICY_SQL, policy)
+    session.commit()
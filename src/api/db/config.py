@@ -1,6 +1,37 @@
 # pip install python-decouple
-from decouple import config as decouple_config
+from decouple import Csv, config as decouple_config
 
 
 DATABASE_URL = decouple_config("DATABASE_URL", default="")
-DB_TIMEZONE = decouple_config("DB_TIMEZONE", default="UTC")
\ No newline at end of file
+DB_TIMEZONE = decouple_config("DB_TIMEZONE", default="UTC")
+
+# connection pool (per engine, so per gunicorn worker)
+DB_POOL_SIZE = decouple_config("DB_POOL_SIZE", cast=int, default=5)
+DB_MAX_OVERFLOW = decouple_config("DB_MAX_OVERFLOW", cast=int, default=10)
+DB_POOL_TIMEOUT = decouple_config("DB_POOL_TIMEOUT", cast=float, default=30)
+DB_POOL_PRE_PING = decouple_config("DB_POOL_PRE_PING", cast=bool, default=True)
+# seconds, -1 never recycles
+DB_POOL_RECYCLE = decouple_config("DB_POOL_RECYCLE", cast=int, default=1800)
+# milliseconds, 0 means no limit; applies to the request (async) engines
+DB_STATEMENT_TIMEOUT_MS = decouple_config("DB_STATEMENT_TIMEOUT_MS", cast=int, default=0)
+# the same for the sync engine behind migrate, backfill and scripts, whose
+# full-history UPDATEs, index builds and refreshes run far longer
+DB_MAINTENANCE_STATEMENT_TIMEOUT_MS = decouple_config(
+    "DB_MAINTENANCE_STATEMENT_TIMEOUT_MS", cast=int, default=0
+)
+
+# read replicas (comma-separated URLs) for read routes; empty reads the primary
+DATABASE_REPLICA_URLS = decouple_config("DATABASE_REPLICA_URLS", cast=Csv(), default="")
+# seconds between replica health checks, and before a failed replica is retried
+DB_REPLICA_CHECK_INTERVAL_S = decouple_config("DB_REPLICA_CHECK_INTERVAL_S", cast=float, default=10)
+DB_REPLICA_RETRY_S = decouple_config("DB_REPLICA_RETRY_S", cast=float, default=30)
+# after a write, the client's reads go to the primary for this long (0 turns it off)
+DB_READ_YOUR_WRITES_S = decouple_config("DB_READ_YOUR_WRITES_S", cast=float, default=5)
+
+# statements slower than this (ms) go to the slow-query log; 0 turns it off
+DB_SLOW_QUERY_MS = decouple_config("DB_SLOW_QUERY_MS", cast=float, default=0)
+# fraction of slow SELECTs re-run with EXPLAIN (ANALYZE, BUFFERS), entries kept
+DB_SLOW_QUERY_EXPLAIN_SAMPLE = decouple_config("DB_SLOW_QUERY_EXPLAIN_SAMPLE", cast=float, default=0)
+DB_SLOW_QUERY_LOG_SIZE = decouple_config("DB_SLOW_QUERY_LOG_SIZE", cast=int, default=200)
+# GET /admin/slow-queries needs this in the x-admin-token header; unset, it 404s
+ADMIN_TOKEN = decouple_config("ADMIN_TOKEN", default="")
@@ -0,0 +1,91 @@
+"""
+One-shot schema setup, run once per deploy before the workers start.
+
+    python -m src.api.db.migrate
+
+Creates the tables, hypertables, compression and retention policies,
+the rollups and the funnel aggregate. Workers don't touch the schema
+when they boot. Safe to re-run. A rollup whose definition changed is
+dropped, recreated and refreshed over all of history, which can take a
+while on a big events table.
+
+An events table from before the dimension and user-agent columns has
+to be brought up to date first, since compression and the rollups are
+built on the new columns:
+
+    python -m src.api.events.backfill
+    python -m src.api.db.migrate
+
+`migrate` stops with LegacySchemaError when it finds such a table.
+"""
+import sys
+import time
+from typing import List
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel
+from timescaledb.activator import activate_timescaledb_extension
+from timescaledb.hypertables import sync_all_hypertables
+from timescaledb.retention import sync_retention_policies
+
+from .compression import sync_compression
+from .session import get_engine
+
+
+class LegacySchemaError(Exception):
+    """Raised when the events table predates columns the schema builds on"""
+
+
+def missing_event_columns(engine: Engine) -> List[str]:
+    """EventModel columns an existing events table lacks (none if it's new)."""
+    from src.api.events.models import EventModel
+
+    inspector = inspect(engine)
+    if not inspector.has_table(EventModel.__tablename__):
+        return []
+    existing = {column["name"] for column in inspector.get_columns(EventModel.__tablename__)}
+    return [name for name in EventModel.__table__.columns.keys() if name not in existing]
+
+
+def migrate(engine: Engine = None):
+    engine = engine or get_engine()
+    # the models register their tables and hypertables on import
+    from src.api.events.funnel import sync_funnel_aggregate
+    from src.api.events.rollups import refresh_event_rollups, sync_event_rollups
+
+    missing = missing_event_columns(engine)
+    if missing:
+        raise LegacySchemaError(
+            f"eventmodel has no {', '.join(missing)} column(s): run "
+            "`python -m src.api.events.backfill` first, then migrate again"
+        )
+
+    print("creating database")
+    SQLModel.metadata.create_all(engine)
+    print("creating hypertables")
+    # timescaledb.metadata.create_all, except compression is synced
+    # idempotently (its own sync fails once a policy exists)
+    with Session(engine) as session:
+        activate_timescaledb_extension(session)
+        sync_all_hypertables(session)
+        sync_compression(session)
+        sync_retention_policies(session, drop_after="1 day")
+    print("creating rollups and the funnel aggregate")
+    with Session(engine) as session:
+        rebuilt = sync_event_rollups(session)
+        sync_funnel_aggregate(session)
+    if rebuilt:
+        # a rebuilt rollup starts empty and its policy only refreshes the
+        # last few days, so older history has to be materialized here
+        print(f"refreshing rebuilt rollups: {', '.join(rollup.name for rollup in rebuilt)}")
+        refresh_event_rollups(engine, rebuilt)
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    try:
+        migrate()
+    except LegacySchemaError as e:
+        sys.exit(str(e))
+    print(f"migrated in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from src.api.metrics import REGISTRY
+
+
+class PoolWaitStats:
+    """Counters for time spent getting a connection out of the pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def begin(self):
+        with self._lock:
+            self.waiting += 1
+
+    def end(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waiting -= 1
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class InstrumentedPoolMixin:
+    """
+    Times every checkout so pool starvation (long waits, timeouts) can be
+    told apart from slow queries. The time includes opening a new
+    connection when the pool has to grow.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        self.wait_stats.begin()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.wait_stats.end(time.perf_counter() - start, timed_out=timed_out)
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(engine: Engine) -> Dict:
+    pool = engine.pool
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+    stats = getattr(pool, "wait_stats", None)
+    if stats is not None:
+        status.update({
+            "waiting": stats.waiting,
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "wait_seconds_total": round(stats.wait_seconds_total, 6),
+            "wait_seconds_max": round(stats.wait_seconds_max, 6),
+        })
+    return status
+
+
+DB_POOL_CHECKED_OUT = REGISTRY.gauge(
+    "db_pool_checked_out", "Connections currently checked out.", ("engine",))
+DB_POOL_OVERFLOW = REGISTRY.gauge(
+    "db_pool_overflow", "Connections open beyond pool_size.", ("engine",))
+DB_POOL_WAITING = REGISTRY.gauge(
+    "db_pool_waiting", "Callers waiting for a connection.", ("engine",))
+DB_POOL_TIMEOUTS = REGISTRY.gauge(
+    "db_pool_timeouts", "Checkouts that gave up waiting (since pool creation).", ("engine",))
+DB_POOL_WAIT_SECONDS = REGISTRY.gauge(
+    "db_pool_wait_seconds", "Total time spent waiting for connections (since pool creation).", ("engine",))
+
+
+def update_pool_metrics(engines: Dict[str, Engine]) -> None:
+    # pools keep their own counters, copy them into gauges at scrape time
+    for name, engine in engines.items():
+        status = pool_status(engine)
+        DB_POOL_CHECKED_OUT.labels(name).set(status["checked_out"])
+        DB_POOL_OVERFLOW.labels(name).set(status["overflow"])
+        DB_POOL_WAITING.labels(name).set(status.get("waiting", 0))
+        DB_POOL_TIMEOUTS.labels(name).set(status.get("timeouts", 0))
+        DB_POOL_WAIT_SECONDS.labels(name).set(status.get("wait_seconds_total", 0))
@@ -0,0 +1,190 @@
+"""
+Read replicas for the read routes.
+
+`get_read_session` hands out a session on the next healthy replica,
+round-robin, and falls back to the primary when none is configured or
+reachable, or when the request has to see its own writes. Writes keep
+using `get_write_session` (the primary).
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from fastapi import Depends, Request, Response
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import (
+    DATABASE_REPLICA_URLS,
+    DB_READ_YOUR_WRITES_S,
+    DB_REPLICA_CHECK_INTERVAL_S,
+    DB_REPLICA_RETRY_S,
+)
+from .session import create_async_engine_for, get_async_engine, get_write_session
+
+logger = logging.getLogger(__name__)
+
+# a client that sends this header (any value but "0"/"false") reads the primary
+READ_YOUR_WRITES_HEADER = "x-read-your-writes"
+# set after a write: reads go to the primary until this unix time
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+
+class ReplicaSet:
+    """
+    Round-robin over replica engines, skipping replicas marked down.
+
+    A replica is marked down when connecting to it fails, either for a
+    request or in the periodic health check, and is tried again after
+    `retry_s`. Engines are created on first use.
+    """
+
+    def __init__(
+            self,
+            urls: List[str],
+            retry_s: float = DB_REPLICA_RETRY_S,
+            check_interval_s: float = DB_REPLICA_CHECK_INTERVAL_S,
+            engine_factory: Callable[[str, str], AsyncEngine] = create_async_engine_for):
+        self.urls = list(urls)
+        self.retry_s = retry_s
+        self.check_interval = check_interval_s
+        self.engine_factory = engine_factory
+        self._engines: Dict[int, AsyncEngine] = {}
+        self._engines_lock = threading.Lock()
+        self._down_until = [0.0] * len(self.urls)
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self.urls)
+
+    def engine(self, index: int) -> AsyncEngine:
+        engine = self._engines.get(index)
+        if engine is None:
+            with self._engines_lock:
+                engine = self._engines.get(index)
+                if engine is None:
+                    engine = self._engines[index] = self.engine_factory(
+                        self.urls[index], f"replica{index}"
+                    )
+        return engine
+
+    def sync_engines(self) -> Dict[str, Engine]:
+        # the replicas in use so far, for pool metrics
+        return {f"replica{index}": engine.sync_engine for index, engine in self._engines.items()}
+
+    def is_up(self, index: int) -> bool:
+        return time.monotonic() >= self._down_until[index]
+
+    def mark_down(self, index: int) -> None:
+        self._down_until[index] = time.monotonic() + self.retry_s
+
+    def mark_up(self, index: int) -> None:
+        self._down_until[index] = 0.0
+
+    def candidates(self) -> List[int]:
+        """Healthy replicas, starting from the next one in turn."""
+        if not self.urls:
+            return []
+        start = next(self._turn)
+        indexes = [(start + offset) % len(self.urls) for offset in range(len(self.urls))]
+        return [index for index in indexes if self.is_up(index)]
+
+    async def check(self, timeout: float = 5) -> Dict[int, bool]:
+        """Ping every replica, marking each up or down."""
+        results = {}
+        for index in range(len(self.urls)):
+            try:
+                async with asyncio.timeout(timeout):
+                    async with self.engine(index).connect() as conn:
+                        await conn.execute(text("SELECT 1"))
+            except (DBAPIError, OSError, TimeoutError):
+                logger.warning("Read replica %s failed its health check", index)
+                self.mark_down(index)
+                results[index] = False
+            else:
+                self.mark_up(index)
+                results[index] = True
+        return results
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    async def start(self):
+        if self.urls and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+replicas = ReplicaSet(DATABASE_REPLICA_URLS)
+
+
+def reads_own_writes(request: Request) -> bool:
+    header = request.headers.get(READ_YOUR_WRITES_HEADER)
+    if header is not None and header.lower() not in ("0", "false"):
+        return True
+    try:
+        return time.time() < float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+    except ValueError:
+        return False
+
+
+def remember_write(response: Response) -> None:
+    """Send this client's reads to the primary for the next few seconds."""
+    if replicas and DB_READ_YOUR_WRITES_S > 0:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(round(time.time() + DB_READ_YOUR_WRITES_S, 3)),
+            max_age=int(DB_READ_YOUR_WRITES_S) + 1,
+            httponly=True,
+        )
+
+
+def get_read_engine() -> AsyncEngine:
+    # next replica in turn without a connection check (for code that
+    # opens its own sessions), else the primary
+    candidates = replicas.candidates()
+    return replicas.engine(candidates[0]) if candidates else get_async_engine()
+
+
+async def get_read_session(
+        request: Request,
+        primary: AsyncSession = Depends(get_write_session)):
+    """
+    A session on the next healthy replica. `primary` is only connected
+    to when it's used: with no replicas, none reachable, or a request
+    that has to read its own writes.
+    """
+    if replicas and not reads_own_writes(request):
+        for index in replicas.candidates():
+            session = AsyncSession(replicas.engine(index), expire_on_commit=False)
+            try:
+                # connect now so a dead replica falls through to the next
+                await session.connection()
+            except (DBAPIError, OSError):
+                logger.warning("Read replica %s is unreachable", index)
+                replicas.mark_down(index)
+                await session.close()
+                continue
+            try:
+                yield session
+            finally:
+                await session.close()
+            return
+    yield primary
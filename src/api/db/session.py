@@ -1,22 +1,133 @@
-import sqlmodel
-from sqlmodel import SQLModel, Session
-import timescaledb
+import threading
+from typing import Dict, Optional
 
-from .config import DATABASE_URL, DB_TIMEZONE
+import sqlalchemy
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-if DATABASE_URL == "":
-    raise NotImplementedError("DATABASE_URL needs to be set")
+from src.api.metrics import instrument_engine
 
-engine = timescaledb.create_engine(DATABASE_URL, timezone=DB_TIMEZONE)
+from .config import (
+    DATABASE_URL,
+    DB_MAINTENANCE_STATEMENT_TIMEOUT_MS,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT_MS,
+    DB_TIMEZONE,
+)
+from .pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from .slowlog import slow_query_log
+
+# engines are created on first use, not at import: importing the app
+# (and booting a worker) never needs DATABASE_URL or a connection
+_engines: Dict[str, object] = {}
+_engines_lock = threading.Lock()
+
+
+def engine_kwargs(statement_timeout_ms: Optional[int] = None) -> dict:
+    # what timescaledb.create_engine sets, plus pool sizing and a
+    # server-side statement_timeout (it would overwrite our options),
+    # DB_STATEMENT_TIMEOUT_MS unless given
+    if statement_timeout_ms is None:
+        statement_timeout_ms = DB_STATEMENT_TIMEOUT_MS
+    options = f"-c timezone={DB_TIMEZONE}"
+    if statement_timeout_ms > 0:
+        options += f" -c statement_timeout={statement_timeout_ms}"
+    return dict(
+        connect_args={"options": options},
+        execution_options={"isolation_level": "READ COMMITTED"},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+
+
+def create_async_engine_for(url: str, name: str) -> AsyncEngine:
+    # psycopg's async driver (postgresql+psycopg:// URLs work for both)
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncQueuePool,
+        **engine_kwargs()
+    )
+    instrument_engine(engine.sync_engine, name)
+    slow_query_log.instrument(engine.sync_engine, name, engine)
+    return engine
+
+
+def _create(name: str):
+    if DATABASE_URL == "":
+        raise NotImplementedError("DATABASE_URL needs to be set")
+    if name == "sync":
+        engine = sqlalchemy.create_engine(
+            DATABASE_URL,
+            poolclass=InstrumentedQueuePool,
+            # migrate and backfill run here, without the request timeout
+            **engine_kwargs(DB_MAINTENANCE_STATEMENT_TIMEOUT_MS)
+        )
+        instrument_engine(engine, "sync")
+        slow_query_log.instrument(engine, "sync")
+        return engine
+    return create_async_engine_for(DATABASE_URL, "async")
+
+
+def _get(name: str):
+    engine = _engines.get(name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                engine = _engines[name] = _create(name)
+    return engine
+
+
+def get_engine() -> Engine:
+    return _get("sync")
+
+
+def get_async_engine() -> AsyncEngine:
+    return _get("async")
+
+
+def sync_engines() -> Dict[str, Engine]:
+    # the engines created so far (async ones as their sync_engine), for
+    # pool metrics: reporting on an engine must not create it
+    return {name: getattr(engine, "sync_engine", engine) for name, engine in list(_engines.items())}
+
+
+def __getattr__(name: str):
+    # `from src.api.db.session import engine` in scripts and benchmarks
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def init_db():
-    print("creating database")
-    SQLModel.metadata.create_all(engine)
-    print("creating hypertables")
-    timescaledb.metadata.create_all(engine)
+    # schema setup runs once per deploy from `python -m src.api.db.migrate`,
+    # not from every worker's startup
+    from .migrate import migrate
+    migrate()
 
 
 def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+    with Session(get_engine()) as session:
+        yield session
+
+
+async def get_write_session():
+    # the primary; expire_on_commit=False: returned objects are
+    # serialized after commit
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+# the older name, still used by writes and dependency overrides
+get_async_session = get_write_session
@@ -0,0 +1,199 @@
+"""
+Slow-query log, viewable at GET /admin/slow-queries.
+
+Statements slower than DB_SLOW_QUERY_MS are kept, with their bound
+parameters and timing, in a bounded in-memory ring per worker. For a
+sampled fraction of slow SELECTs the plan is captured with
+`EXPLAIN (ANALYZE, BUFFERS)`, run again on a separate connection in the
+background (so the slow request doesn't pay for it twice) and rolled
+back. With DB_SLOW_QUERY_MS=0 no engine hook is installed at all.
+"""
+import asyncio
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.api.metrics.sql import statement_type
+
+from .config import DB_SLOW_QUERY_EXPLAIN_SAMPLE, DB_SLOW_QUERY_LOG_SIZE, DB_SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+# EXPLAIN ANALYZE executes the statement, so only reads are re-run
+# (and in a transaction that is rolled back either way)
+EXPLAINABLE = {"SELECT", "WITH"}
+# execution option, False on the EXPLAIN's own connection so it isn't logged
+LOG_OPTION = "slow_query_log"
+
+
+@dataclass
+class SlowQuery:
+    id: int
+    at: datetime
+    engine: str
+    statement: str
+    parameters: Any
+    duration_ms: float
+    # rows in an executemany (only the first parameter set is kept)
+    executemany_rows: Optional[int] = None
+    # EXPLAIN (ANALYZE, BUFFERS) text, or why it couldn't be captured
+    explain: Optional[str] = None
+    explain_error: Optional[str] = None
+
+
+class SlowQueryLog:
+    """
+    Ring of the last `size` statements that took `threshold_ms` or more.
+
+    At most one EXPLAIN runs at a time per worker: a slow database isn't
+    asked to repeat several slow queries at once, and samples that come
+    in meanwhile are logged without a plan.
+    """
+
+    def __init__(
+            self,
+            threshold_ms: float = DB_SLOW_QUERY_MS,
+            explain_sample: float = DB_SLOW_QUERY_EXPLAIN_SAMPLE,
+            size: int = DB_SLOW_QUERY_LOG_SIZE,
+            sample: Callable[[], float] = random.random):
+        self.threshold_ms = threshold_ms
+        self.explain_sample = explain_sample
+        self.sample = sample
+        self.entries: deque = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._explaining = False
+        self._tasks = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def record(
+            self,
+            engine_name: str,
+            statement: str,
+            parameters,
+            duration_ms: float,
+            executemany: bool = False) -> SlowQuery:
+        rows = None
+        if executemany:
+            rows = len(parameters)
+            parameters = parameters[0] if parameters else None
+        entry = SlowQuery(
+            id=next(self._ids),
+            at=datetime.now(timezone.utc),
+            engine=engine_name,
+            statement=statement,
+            parameters=parameters,
+            duration_ms=round(duration_ms, 3),
+            executemany_rows=rows,
+        )
+        with self._lock:
+            self.entries.append(entry)
+        return entry
+
+    def recent(self, limit: Optional[int] = None) -> List[dict]:
+        """The newest entries first."""
+        with self._lock:
+            entries = list(self.entries)
+        entries.reverse()
+        return [asdict(entry) for entry in entries[:limit]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+    def should_explain(self, entry: SlowQuery) -> bool:
+        if entry.executemany_rows is not None or statement_type(entry.statement) not in EXPLAINABLE:
+            return False
+        if self.explain_sample <= 0 or self.sample() >= self.explain_sample:
+            return False
+        with self._lock:
+            if self._explaining:
+                return False
+            self._explaining = True
+        return True
+
+    def _done_explaining(self, entry: SlowQuery, rows=None, error: Exception = None) -> None:
+        if error is not None:
+            logger.warning("EXPLAIN of slow query %s failed: %s", entry.id, error)
+            entry.explain_error = f"{type(error).__name__}: {error}"
+        else:
+            entry.explain = "\n".join(row[0] for row in rows)
+        with self._lock:
+            self._explaining = False
+
+    def explain_sync(self, engine: Engine, entry: SlowQuery) -> None:
+        try:
+            # closing without a commit rolls the transaction back
+            with engine.connect().execution_options(**{LOG_OPTION: False}) as conn:
+                rows = conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS) {entry.statement}", entry.parameters
+                ).all()
+        except Exception as e:
+            self._done_explaining(entry, error=e)
+        else:
+            self._done_explaining(entry, rows)
+
+    async def explain_async(self, engine: AsyncEngine, entry: SlowQuery) -> None:
+        try:
+            async with engine.connect() as conn:
+                await conn.execution_options(**{LOG_OPTION: False})
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS) {entry.statement}", entry.parameters
+                )
+                rows = result.all()
+        except Exception as e:
+            self._done_explaining(entry, error=e)
+        else:
+            self._done_explaining(entry, rows)
+
+    def _explain_later(self, engine: Engine, entry: SlowQuery, async_engine: Optional[AsyncEngine]) -> None:
+        if async_engine is None:
+            threading.Thread(target=self.explain_sync, args=(engine, entry), daemon=True).start()
+            return
+        # async engines call the hook from inside the event loop
+        task = asyncio.get_running_loop().create_task(self.explain_async(async_engine, entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def instrument(self, engine: Engine, name: str, async_engine: Optional[AsyncEngine] = None) -> None:
+        """
+        Log slow statements on `engine` (for async engines pass
+        `async_engine.sync_engine` and `async_engine`). Does nothing
+        when the log is disabled.
+        """
+        if not self.enabled:
+            return
+        threshold = self.threshold_ms / 1000
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_start = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - context._slow_query_start
+            if elapsed < threshold or not conn.get_execution_options().get(LOG_OPTION, True):
+                return
+            entry = self.record(name, statement, parameters, elapsed * 1000, executemany)
+            if self.should_explain(entry):
+                try:
+                    self._explain_later(engine, entry, async_engine)
+                except RuntimeError as e:
+                    self._done_explaining(entry, error=e)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+slow_query_log = SlowQueryLog()
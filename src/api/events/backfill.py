@@ -0,0 +1,123 @@
+"""
+Bring an existing events table up to the current schema.
+
+    python -m src.api.events.backfill
+
+- moves page / user_agent / referrer text into the dimension tables
+  and replaces the columns with integer ids
+- adds and fills the user-agent derived columns
+- swaps the old single-column indexes for the composite ones on EventModel
+- re-materializes the rollups over all history (rebuilt for a schema
+  change, they only refresh their recent window)
+
+Run it before `python -m src.api.db.migrate` on a table from before
+these columns: migrate builds compression and the rollups on them.
+Safe to re-run: every step checks what is already done.
+"""
+from sqlalchemy import inspect, text, update
+from sqlmodel import Session, SQLModel, select
+
+from src.api.db.session import get_engine
+
+from .models import EVENT_ROLLUPS, LEGACY_EVENT_INDEXES, EventModel, UserAgentDimension
+from .rollups import refresh_event_rollups, sync_event_rollups
+from .user_agents import classify_user_agent
+
+# (legacy text column, id column, dimension table)
+LEGACY_DIMENSION_COLUMNS = [
+    ("page", "page_id", "pagedimension"),
+    ("user_agent", "user_agent_id", "useragentdimension"),
+    ("referrer", "referrer_id", "referrerdimension"),
+]
+
+ADD_COLUMNS_SQL = [
+    "ALTER TABLE eventmodel ADD COLUMN IF NOT EXISTS operating_system VARCHAR DEFAULT ''",
+    "ALTER TABLE eventmodel ADD COLUMN IF NOT EXISTS browser VARCHAR DEFAULT ''",
+    "ALTER TABLE eventmodel ADD COLUMN IF NOT EXISTS device_type VARCHAR DEFAULT ''",
+]
+
+
+def encode_legacy_dimensions(session: Session) -> None:
+    """
+    Replace the free-text page/user_agent/referrer columns with dimension
+    ids. Rollups built on the old columns are dropped; sync_event_rollups at
+    the end of the backfill recreates them.
+    """
+    columns = {column["name"] for column in inspect(session.connection()).get_columns("eventmodel")}
+    legacy = [spec for spec in LEGACY_DIMENSION_COLUMNS if spec[0] in columns]
+    if not legacy:
+        return
+    for rollup in reversed(EVENT_ROLLUPS):
+        session.exec(text(f"DROP MATERIALIZED VIEW IF EXISTS {rollup.name} CASCADE"))
+    for column, id_column, table in legacy:
+        session.exec(text(f"ALTER TABLE eventmodel ADD COLUMN IF NOT EXISTS {id_column} INTEGER"))
+        session.exec(text(
+            f"INSERT INTO {table} (value) SELECT DISTINCT {column} FROM eventmodel "
+            f"WHERE {column} IS NOT NULL ON CONFLICT (value) DO NOTHING"
+        ))
+        session.exec(text(
+            f"UPDATE eventmodel SET {id_column} = d.id FROM {table} d "
+            f"WHERE eventmodel.{column} = d.value AND eventmodel.{id_column} IS NULL"
+        ))
+        session.exec(text(f"ALTER TABLE eventmodel DROP COLUMN {column}"))
+        session.commit()
+
+
+def migrate_event_indexes(session: Session) -> None:
+    """
+    Drop the legacy single-column indexes and build the ones declared on
+    EventModel (create_all only adds indexes to tables it creates).
+    """
+    for name in LEGACY_EVENT_INDEXES:
+        session.exec(text(f"DROP INDEX IF EXISTS {name}"))
+    for index in EventModel.__table__.indexes:
+        index.create(session.connection(), checkfirst=True)
+    session.commit()
+
+
+def add_user_agent_columns(session: Session) -> None:
+    for statement in ADD_COLUMNS_SQL:
+        session.exec(text(statement))
+    session.commit()
+
+
+def backfill_user_agents(session: Session) -> int:
+    """
+    Classify every distinct unclassified user agent once and update its
+    rows with a single UPDATE per UA. Returns rows updated.
+    """
+    unclassified = (EventModel.operating_system == "") | (EventModel.operating_system.is_(None))
+    user_agent_ids = session.exec(
+        select(EventModel.user_agent_id).where(unclassified).distinct()
+    ).all()
+    values = dict(session.exec(
+        select(UserAgentDimension.id, UserAgentDimension.value)
+        .where(UserAgentDimension.id.in_([id for id in user_agent_ids if id is not None]))
+    ).all())
+    updated = 0
+    for user_agent_id in user_agent_ids:
+        info = classify_user_agent(values.get(user_agent_id))
+        if user_agent_id is None:
+            matches_ua = EventModel.user_agent_id.is_(None)
+        else:
+            matches_ua = EventModel.user_agent_id == user_agent_id
+        result = session.exec(
+            update(EventModel)
+            .where(matches_ua, unclassified)
+            .values(**info._asdict())
+        )
+        updated += result.rowcount
+        session.commit()
+    return updated
+
+
+if __name__ == "__main__":
+    engine = get_engine()
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        encode_legacy_dimensions(session)
+        add_user_agent_columns(session)
+        migrate_event_indexes(session)
+        print(f"classified {backfill_user_agents(session)} events")
+        sync_event_rollups(session)
+    refresh_event_rollups(engine)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.api.db.session import get_async_engine
+
+from .config import (
+    EVENTS_BUFFER_FLUSH_MS,
+    EVENTS_BUFFER_FLUSH_ROWS,
+    EVENTS_BUFFER_MAX_ROWS,
+)
+from .ingest import bulk_insert_events
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFullError(Exception):
+    """Raised when the write-behind buffer can't take more rows"""
+
+
+async def write_rows(rows: List[Dict]) -> None:
+    async with AsyncSession(get_async_engine()) as session:
+        await bulk_insert_events(session, rows)
+
+
+class EventBuffer:
+    """
+    In-process write-behind buffer for event rows.
+
+    The ingest routes (async, on the event loop) `put` validated rows,
+    and `put` is safe from other threads too. A background task started
+    from the app lifespan flushes them in bulk once `flush_rows` are
+    waiting or every `flush_ms` milliseconds, whichever comes first.
+    `put` raises BufferFullError once `max_rows` are pending so callers
+    can shed load instead of queueing forever.
+    """
+
+    def __init__(
+            self,
+            flush_rows: int = EVENTS_BUFFER_FLUSH_ROWS,
+            flush_ms: int = EVENTS_BUFFER_FLUSH_MS,
+            max_rows: int = EVENTS_BUFFER_MAX_ROWS,
+            writer: Callable[[List[Dict]], Awaitable[None]] = write_rows):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_ms / 1000
+        self.max_rows = max_rows
+        self.writer = writer
+        self._rows = deque()
+        self._lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._rows)
+
+    def put(self, row: Dict) -> None:
+        with self._lock:
+            if len(self._rows) >= self.max_rows:
+                raise BufferFullError(f"{len(self._rows)} events pending")
+            self._rows.append(row)
+            pending = len(self._rows)
+        if pending >= self.flush_rows and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _take(self) -> List[Dict]:
+        with self._lock:
+            rows = list(self._rows)
+            self._rows.clear()
+        return rows
+
+    def _requeue(self, rows: List[Dict]) -> int:
+        # put rows back in front of anything that arrived during the flush,
+        # dropping whatever no longer fits
+        with self._lock:
+            room = max(self.max_rows - len(self._rows), 0)
+            keep = rows[:room]
+            self._rows.extendleft(reversed(keep))
+        return len(rows) - len(keep)
+
+    async def flush(self) -> int:
+        """Write everything pending; returns the number of rows written."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            rows = self._take()
+            if not rows:
+                return 0
+            try:
+                await self.writer(rows)
+            except Exception:
+                dropped = self._requeue(rows)
+                logger.exception(
+                    "Flushing %s buffered events failed (%s dropped)", len(rows), dropped
+                )
+                return 0
+            return len(rows)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # let the flush loop finish its current write, then drain the rest
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        self._loop = None
+        await self.flush()
+        if len(self):
+            logger.error("Shutting down with %s unflushed events", len(self))
+
+
+event_buffer = EventBuffer()
@@ -0,0 +1,68 @@
+"""
+Column-oriented encodings of read_events' bucket rows.
+
+Both are built straight from the cursor's row tuples, skipping the
+per-row EventBucketSchema validation and serialization of the default
+response.
+"""
+import json
+from typing import Dict, List, Sequence
+
+from fastapi import Response
+
+# read_events' select list, in order
+BUCKET_COLUMNS = [
+    "bucket", "operating_system", "page", "avg_duration", "count",
+    "unique_sessions", "p50_duration", "p90_duration", "p99_duration",
+]
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def wants_arrow(accept: str) -> bool:
+    return ARROW_MEDIA_TYPE in (accept or "")
+
+
+def to_columns(rows: Sequence[Sequence]) -> Dict[str, List]:
+    """
+    [(bucket, os, page, avg, count, ...), ...] -> {"bucket": [...], "os": [...], ...}
+    """
+    if not rows:
+        return {name: [] for name in BUCKET_COLUMNS}
+    columns = dict(zip(BUCKET_COLUMNS, (list(values) for values in zip(*rows))))
+    # avg() comes back as Decimal, and so does a sum() of counts
+    columns["avg_duration"] = [None if v is None else float(v) for v in columns["avg_duration"]]
+    columns["count"] = [int(v) for v in columns["count"]]
+    return columns
+
+
+def columnar_response(rows: Sequence[Sequence]) -> Response:
+    columns = to_columns(rows)
+    columns["bucket"] = [bucket.isoformat() for bucket in columns["bucket"]]
+    return Response(content=json.dumps(columns), media_type="application/json")
+
+
+def arrow_response(rows: Sequence[Sequence]) -> Response:
+    """
+    Arrow IPC stream of one record batch. Raises ImportError when the
+    optional pyarrow dependency isn't installed.
+    """
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("bucket", pa.timestamp("us", tz="UTC")),
+        ("operating_system", pa.string()),
+        ("page", pa.string()),
+        ("avg_duration", pa.float64()),
+        ("count", pa.int64()),
+        ("unique_sessions", pa.int64()),
+        ("p50_duration", pa.float64()),
+        ("p90_duration", pa.float64()),
+        ("p99_duration", pa.float64()),
+    ])
+    columns = to_columns(rows)
+    batch = pa.record_batch([columns[name] for name in BUCKET_COLUMNS], schema=schema)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_MEDIA_TYPE)
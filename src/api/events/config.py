@@ -0,0 +1,68 @@
+from decouple import config as decouple_config
+
+
+# pages read_events reports on when the request names none
+DEFAULT_LOOKUP_PAGES = [
+    "/", "/about", "/pricing", "/contact",
+    "/blog", "/products", "/login", "/signup",
+    "/dashboard", "/settings",
+]
+
+# max number of events accepted by POST /api/events/batch
+EVENTS_BATCH_MAX_SIZE = decouple_config("EVENTS_BATCH_MAX_SIZE", cast=int, default=5000)
+# and its max body size, checked before the body is read in full or parsed
+EVENTS_BATCH_MAX_BYTES = decouple_config("EVENTS_BATCH_MAX_BYTES", cast=int, default=10 * 1024 * 1024)
+
+# write-behind mode: POST /api/events/ returns 202 and rows are flushed in bulk
+EVENTS_WRITE_BEHIND = decouple_config("EVENTS_WRITE_BEHIND", cast=bool, default=False)
+EVENTS_BUFFER_FLUSH_ROWS = decouple_config("EVENTS_BUFFER_FLUSH_ROWS", cast=int, default=1000)
+EVENTS_BUFFER_FLUSH_MS = decouple_config("EVENTS_BUFFER_FLUSH_MS", cast=int, default=500)
+EVENTS_BUFFER_MAX_ROWS = decouple_config("EVENTS_BUFFER_MAX_ROWS", cast=int, default=50000)
+
+# distinct user-agent strings kept in the classifier's LRU cache
+USER_AGENT_CACHE_SIZE = decouple_config("USER_AGENT_CACHE_SIZE", cast=int, default=4096)
+
+# read_events time windows: default span (in buckets) and hard cap
+EVENTS_DEFAULT_BUCKETS = decouple_config("EVENTS_DEFAULT_BUCKETS", cast=int, default=30)
+EVENTS_MAX_BUCKETS = decouple_config("EVENTS_MAX_BUCKETS", cast=int, default=2000)
+
+# string -> id entries kept per dimension (page, user agent, referrer)
+DIMENSION_CACHE_SIZE = decouple_config("DIMENSION_CACHE_SIZE", cast=int, default=10000)
+# entries in the host-wide dimension id table shared by workers (with SHM_DIR)
+DIMENSION_SHARED_SIZE = decouple_config("DIMENSION_SHARED_SIZE", cast=int, default=32768)
+
+# rows fetched per server-side cursor round trip by GET /api/events/export
+EVENTS_EXPORT_BATCH_SIZE = decouple_config("EVENTS_EXPORT_BATCH_SIZE", cast=int, default=5000)
+
+# POST /api/events/funnel: window when neither start nor since is given, max steps
+EVENTS_FUNNEL_DEFAULT_WINDOW = decouple_config("EVENTS_FUNNEL_DEFAULT_WINDOW", default="7 days")
+EVENTS_FUNNEL_MAX_STEPS = decouple_config("EVENTS_FUNNEL_MAX_STEPS", cast=int, default=20)
+
+# GET /api/events/live: bucket the pushed counts cover, min ms between
+# updates (events in between coalesce) and seconds between SSE keepalives
+EVENTS_LIVE_BUCKET = decouple_config("EVENTS_LIVE_BUCKET", default="1 minute")
+EVENTS_LIVE_INTERVAL_MS = decouple_config("EVENTS_LIVE_INTERVAL_MS", cast=int, default=1000)
+EVENTS_LIVE_KEEPALIVE_S = decouple_config("EVENTS_LIVE_KEEPALIVE_S", cast=float, default=15)
+# distinct pages per bucket the host-wide live table holds (with SHM_DIR)
+EVENTS_LIVE_SHARED_PAGES = decouple_config("EVENTS_LIVE_SHARED_PAGES", cast=int, default=4096)
+
+# read_events answers windows inside the last EVENTS_RECENT_SLOTS slots of
+# EVENTS_RECENT_SLOT from this process's memory. Off (0) by default: the
+# counts only hold what this process ingested, so enable it only when one
+# process takes every event (e.g. 60 for the last hour); with SHM_DIR set,
+# other workers on the host are detected and turn it off while they run
+EVENTS_RECENT_SLOT = decouple_config("EVENTS_RECENT_SLOT", default="1 minute")
+EVENTS_RECENT_SLOTS = decouple_config("EVENTS_RECENT_SLOTS", cast=int, default=0)
+
+# spool mode: with a directory set, ingest routes append events to local
+# segment files and answer 202; a replayer drains them into the hypertable
+EVENTS_SPOOL_DIR = decouple_config("EVENTS_SPOOL_DIR", default="")
+# rotate the segment being written past this size; refuse events past max
+EVENTS_SPOOL_SEGMENT_BYTES = decouple_config("EVENTS_SPOOL_SEGMENT_BYTES", cast=int, default=64 * 1024 * 1024)
+EVENTS_SPOOL_MAX_BYTES = decouple_config("EVENTS_SPOOL_MAX_BYTES", cast=int, default=4 * 1024 ** 3)
+# ms between batched fsyncs (0 syncs every append), between replay passes,
+# and rows per replayed insert; seconds to back off after a failed replay
+EVENTS_SPOOL_FSYNC_MS = decouple_config("EVENTS_SPOOL_FSYNC_MS", cast=int, default=50)
+EVENTS_SPOOL_REPLAY_MS = decouple_config("EVENTS_SPOOL_REPLAY_MS", cast=int, default=1000)
+EVENTS_SPOOL_REPLAY_ROWS = decouple_config("EVENTS_SPOOL_REPLAY_ROWS", cast=int, default=5000)
+EVENTS_SPOOL_RETRY_S = decouple_config("EVENTS_SPOOL_RETRY_S", cast=float, default=10)
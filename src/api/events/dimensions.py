@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Type
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.api.shm import SharedTable, shared_table
+
+from .config import DIMENSION_CACHE_SIZE, DIMENSION_SHARED_SIZE
+from .models import PageDimension, ReferrerDimension, UserAgentDimension
+
+
+class DimensionCache:
+    """
+    LRU map from a dimension's string values to their surrogate ids.
+
+    Hits cost a dict lookup. With a `shared` table, local misses are
+    looked up there next, so an id one worker resolved is known to every
+    worker on the host. All remaining misses of a batch are resolved with
+    one INSERT ... ON CONFLICT ... RETURNING, which creates new values
+    and returns ids for existing ones in the same round trip.
+    """
+
+    def __init__(
+            self,
+            model: Type[SQLModel],
+            max_size: int = DIMENSION_CACHE_SIZE,
+            shared: Optional[SharedTable] = None):
+        self.model = model
+        self.max_size = max_size
+        self.shared = shared
+        self._ids: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def get(self, value: str) -> Optional[int]:
+        id = self._ids.get(value)
+        if id is not None:
+            self._ids.move_to_end(value)
+        return id
+
+    def put(self, value: str, id: int) -> None:
+        self._ids[value] = id
+        self._ids.move_to_end(value)
+        if len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def _shared_key(self, value: str) -> str:
+        return f"{self.model.__tablename__}:{value}"
+
+    async def resolve(self, session: AsyncSession, values: Iterable[str]) -> Dict[str, int]:
+        ids = {}
+        missing = set()
+        for value in values:
+            id = self.get(value)
+            if id is None and self.shared is not None:
+                id = self.shared.get(self._shared_key(value))
+                if id is not None:
+                    self.put(value, id)
+            if id is None:
+                missing.add(value)
+            else:
+                ids[value] = id
+        if not missing:
+            return ids
+        # sorted so concurrent upserts lock rows in the same order
+        stmt = pg_insert(self.model).values([{"value": value} for value in sorted(missing)])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["value"],
+            set_={"value": stmt.excluded.value},
+        ).returning(self.model.id, self.model.value)
+        result = await session.exec(stmt)
+        rows = result.all()
+        # committed on its own so cached ids never point at rolled-back rows
+        await session.commit()
+        for id, value in rows:
+            self.put(value, id)
+            if self.shared is not None:
+                self.shared.set(self._shared_key(value), id)
+            ids[value] = id
+        return ids
+
+
+# one host-wide table for all three (None without SHM_DIR); user agents
+# longer than the key size only get cached per process
+shared_dimension_ids = shared_table("dimension_ids", DIMENSION_SHARED_SIZE, key_size=248)
+page_dimension = DimensionCache(PageDimension, shared=shared_dimension_ids)
+user_agent_dimension = DimensionCache(UserAgentDimension, shared=shared_dimension_ids)
+referrer_dimension = DimensionCache(ReferrerDimension, shared=shared_dimension_ids)
+
+# (text field, id column, cache)
+DIMENSIONS = [
+    ("page", "page_id", page_dimension),
+    ("user_agent", "user_agent_id", user_agent_dimension),
+    ("referrer", "referrer_id", referrer_dimension),
+]
+
+
+async def encode_rows(session: AsyncSession, rows: List[Dict]) -> List[Dict]:
+    """
+    Return copies of `rows` with the text dimension fields swapped for ids,
+    ready to insert into EventModel.
+    """
+    encoded = [dict(row) for row in rows]
+    for field, id_field, cache in DIMENSIONS:
+        values = {row[field] for row in encoded if row.get(field) is not None}
+        ids = await cache.resolve(session, values)
+        for row in encoded:
+            value = row.pop(field, None)
+            row[id_field] = ids.get(value) if value is not None else None
+    return encoded
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence
+
+from sqlalchemy import Select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.api.db.replicas import get_read_engine
+
+from .config import EVENTS_EXPORT_BATCH_SIZE
+from .metrics import EVENTS_EXPORTED
+from .models import EventModel, EventReadSchema, PageDimension, ReferrerDimension, UserAgentDimension
+
+EXPORT_COLUMNS = list(EventReadSchema.model_fields)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def export_session() -> AsyncSession:
+    # the request's session is closed before a streamed body is sent,
+    # so the export opens (and closes) its own, on a replica if there is one
+    return AsyncSession(get_read_engine(), expire_on_commit=False)
+
+
+def export_query(start: datetime, end: datetime, pages: Optional[List[str]] = None) -> Select:
+    """
+    Raw events in [start, end) in time order, dimension ids decoded
+    """
+    decoded = {
+        "page": PageDimension.value,
+        "user_agent": UserAgentDimension.value,
+        "referrer": ReferrerDimension.value,
+    }
+    columns = [
+        (decoded[name] if name in decoded else getattr(EventModel, name)).label(name)
+        for name in EXPORT_COLUMNS
+    ]
+    query = (
+        select(*columns)
+        .select_from(EventModel)
+        .join(PageDimension, PageDimension.id == EventModel.page_id)
+        .outerjoin(UserAgentDimension, UserAgentDimension.id == EventModel.user_agent_id)
+        .outerjoin(ReferrerDimension, ReferrerDimension.id == EventModel.referrer_id)
+        .where(EventModel.time >= start, EventModel.time < end)
+        .order_by(EventModel.time)
+    )
+    if pages:
+        query = query.where(PageDimension.value.in_(pages))
+    return query
+
+
+def ndjson_chunk(rows: Sequence) -> str:
+    lines = []
+    for row in rows:
+        data = row._asdict()
+        data["time"] = data["time"].isoformat()
+        lines.append(json.dumps(data))
+    return "\n".join(lines) + "\n"
+
+
+def csv_chunk(rows: Sequence, header: bool = False) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+async def stream_export(
+        query: Select,
+        format: str = "ndjson",
+        batch_size: int = EVENTS_EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    """
+    Stream the query's rows as NDJSON or CSV text, one chunk per
+    `batch_size` rows fetched from a server-side cursor.
+    """
+    if format == "csv":
+        yield csv_chunk([], header=True)
+    async with export_session() as session:
+        result = await session.stream(query, execution_options={"yield_per": batch_size})
+        async for rows in result.partitions():
+            EVENTS_EXPORTED.labels(format).inc(len(rows))
+            yield csv_chunk(rows) if format == "csv" else ndjson_chunk(rows)
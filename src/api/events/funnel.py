@@ -0,0 +1,127 @@
+"""
+Ordered funnels over sessions.
+
+`funnel_progress` is a small Postgres aggregate: a state machine fed one
+session's events in time order, whose state is the number of funnel
+steps reached so far. A funnel is one pass over the window grouped by
+session_id (ordered by (session_id, time), which the session index
+provides), then a count per final state. No self-joins per step.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import sqlalchemy
+from sqlalchemy import Integer, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlmodel import Session
+
+from .config import DEFAULT_LOOKUP_PAGES, EVENTS_FUNNEL_DEFAULT_WINDOW
+from .models import EventFunnelStepSchema, EventModel, get_utc_now
+from .timeranges import as_utc, parse_interval
+
+# the default lookup pages on the way to sign-up, in their listed order
+FUNNEL_PATH = {"/", "/pricing", "/signup", "/dashboard"}
+DEFAULT_FUNNEL_PAGES = [page for page in DEFAULT_LOOKUP_PAGES if page in FUNNEL_PATH]
+
+FUNNEL_DDL = [
+    # state = steps reached; advance when the event is the next step's page
+    """
+    CREATE OR REPLACE FUNCTION funnel_step(state integer, page_id integer, steps integer[])
+    RETURNS integer LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT CASE
+            WHEN state < cardinality(steps) AND steps[state + 1] = page_id THEN state + 1
+            ELSE state
+        END
+    $$
+    """,
+    """
+    CREATE OR REPLACE AGGREGATE funnel_progress(integer, integer[]) (
+        SFUNC = funnel_step,
+        STYPE = integer,
+        INITCOND = '0'
+    )
+    """,
+]
+
+
+def sync_funnel_aggregate(session: Session) -> None:
+    for statement in FUNNEL_DDL:
+        session.exec(text(statement))
+    session.commit()
+
+
+def resolve_funnel_window(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        since: Optional[str] = None,
+        default_window: str = EVENTS_FUNNEL_DEFAULT_WINDOW) -> Tuple[datetime, datetime]:
+    """
+    [start, end) for a funnel; raises ValueError like resolve_time_window
+    """
+    if start is not None and since is not None:
+        raise ValueError("Use either start or since, not both")
+    end = as_utc(end) if end is not None else get_utc_now()
+    if start is None:
+        span = parse_interval(since or default_window, calendar=True)
+        if not span:
+            raise ValueError(f"Unsupported since: {since!r}")
+        start = end - span
+    else:
+        start = as_utc(start)
+    if start >= end:
+        raise ValueError("start must be before end")
+    return start, end
+
+
+def funnel_query(
+        step_ids: Sequence[int],
+        start: datetime,
+        end: datetime,
+        events: sqlalchemy.Table = EventModel.__table__):
+    """
+    (progress, sessions) rows: how many sessions stopped after each
+    number of steps. Only sessions that reached step 1 are returned.
+    """
+    steps = sqlalchemy.literal(list(step_ids), type_=ARRAY(Integer))
+    progress = func.funnel_progress(
+        events.c.page_id,
+        aggregate_order_by(steps, events.c.time),
+    )
+    per_session = (
+        select(progress.label("progress"))
+        .where(
+            events.c.time >= start,
+            events.c.time < end,
+            events.c.session_id.is_not(None),
+            # other pages can't move the state machine
+            events.c.page_id.in_(set(step_ids)),
+        )
+        .group_by(events.c.session_id)
+        .subquery()
+    )
+    return (
+        select(per_session.c.progress, func.count().label("sessions"))
+        .where(per_session.c.progress > 0)
+        .group_by(per_session.c.progress)
+    )
+
+
+def funnel_steps(pages: List[str], rows: Sequence[Tuple[int, int]]) -> List[EventFunnelStepSchema]:
+    """
+    Sessions that stopped at step k -> sessions that reached each step.
+    """
+    stopped: Dict[int, int] = {progress: sessions for progress, sessions in rows}
+    steps = []
+    reached = sum(stopped.values())
+    first = reached
+    previous = None
+    for number, page in enumerate(pages, start=1):
+        steps.append(EventFunnelStepSchema(
+            page=page,
+            sessions=reached,
+            conversion=round(reached / previous, 4) if previous else None,
+            rate=round(reached / first, 4) if first else None,
+        ))
+        previous = reached
+        reached -= stopped.get(number, 0)
+    return steps
@@ -0,0 +1,114 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .dimensions import encode_rows
+from .models import (
+    EventModel,
+    EventBatchItemSchema,
+    EventCreateSchema,
+    get_utc_now
+)
+from .user_agents import classify_user_agent
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+
+
+def parse_batch_body(body: bytes, content_type: str = "") -> List[Any]:
+    """
+    Turn a batch request body into a list of raw items.
+
+    Accepts either a JSON array or NDJSON (one JSON object per line).
+    Raises ValueError when the body can't be decoded.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in NDJSON_CONTENT_TYPES:
+        items = []
+        for line_no, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_no}: {e.msg}")
+        return items
+    try:
+        items = json.loads(body or b"[]")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e.msg}")
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of events")
+    return items
+
+
+def event_row(payload: EventCreateSchema) -> Dict:
+    """
+    Build the insertable row for a validated payload: stamp the ingest
+    time and the fields derived from the user agent.
+    """
+    row = payload.model_dump()
+    row["time"] = get_utc_now()
+    row.update(classify_user_agent(payload.user_agent)._asdict())
+    return row
+
+
+def validate_batch(items: List[Any]) -> Tuple[List[Dict], List[EventBatchItemSchema]]:
+    """
+    Validate each item on its own so one bad event doesn't sink the batch.
+
+    Returns the insertable rows and one result per input item
+    (in input order). Valid items are marked "pending" until inserted.
+    """
+    rows = []
+    results = []
+    for index, item in enumerate(items):
+        try:
+            payload = EventCreateSchema.model_validate(item)
+        except ValidationError as e:
+            errors = [
+                {"loc": list(err["loc"]), "msg": err["msg"]}
+                for err in e.errors()
+            ]
+            results.append(EventBatchItemSchema(index=index, status="invalid", errors=errors))
+            continue
+        rows.append(event_row(payload))
+        results.append(EventBatchItemSchema(index=index, status="pending"))
+    return rows, results
+
+
+async def insert_event(session: AsyncSession, row: Dict) -> Tuple[int, datetime]:
+    """
+    Insert one event and return its (id, time).
+
+    A single INSERT ... RETURNING: no ORM object, no refresh SELECT after
+    the commit. `row` is a text-valued dict from `event_row`.
+    """
+    encoded = (await encode_rows(session, [row]))[0]
+    stmt = insert(EventModel).values(**encoded).returning(EventModel.id, EventModel.time)
+    result = await session.exec(stmt)
+    event_id, time = result.one()
+    await session.commit()
+    return event_id, time
+
+
+async def bulk_insert_events(session: AsyncSession, rows: List[Dict]) -> List[int]:
+    """
+    Insert many events in one statement and return their ids in input order.
+
+    SQLAlchemy renders this as multi-row INSERT ... VALUES ... RETURNING
+    ("insertmanyvalues"), so the whole batch costs one round trip per
+    page of rows instead of one INSERT + SELECT per event. Rows are the
+    text-valued dicts from `event_row`; dimension ids are filled in here.
+    """
+    if not rows:
+        return []
+    rows = await encode_rows(session, rows)
+    stmt = insert(EventModel).returning(EventModel.id, sort_by_parameter_order=True)
+    result = await session.exec(stmt, params=rows)
+    ids = result.scalars().all()
+    await session.commit()
+    return list(ids)
@@ -0,0 +1,192 @@
+"""
+Live per-page counts for the current bucket, pushed to dashboards.
+
+The ingest routes `record` accepted events into one in-process
+LiveCounts. A single broadcaster task publishes at most one snapshot
+per interval, serialized once and shared by every subscriber, so a
+subscriber costs a wakeup and a socket write and never queries the
+database. Counts are per process unless SHM_DIR is set, in which case
+every worker on the host adds to and streams one shared table.
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from src.api.shm import SharedCounters, SharedTable, shared_counters, shared_table
+
+from .config import (
+    EVENTS_LIVE_BUCKET,
+    EVENTS_LIVE_INTERVAL_MS,
+    EVENTS_LIVE_KEEPALIVE_S,
+    EVENTS_LIVE_SHARED_PAGES,
+)
+from .metrics import LIVE_SUBSCRIBERS
+from .models import get_utc_now
+from .timeranges import BUCKET_ORIGIN, align_to_bucket, as_utc, parse_interval
+
+# SSE comment line, keeps proxies from closing an idle stream
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+class LiveSnapshot(NamedTuple):
+    payload: str  # JSON, sent as is over WebSocket
+    frame: bytes  # the same, framed as a Server-Sent Event
+
+
+class LiveCounts:
+    """
+    Event counts per page for the current `bucket`, reset when it rolls.
+
+    `record` is called from the event loop by the ingest routes and only
+    bumps a dict entry. `publish` turns the counts into a LiveSnapshot
+    when they changed since the last one; the broadcaster task calls it
+    every `interval_ms`, so bursts of events coalesce into one update.
+
+    With a `shared` table (one epoch per bucket) and `shared_events`
+    counter, counts are also added host-wide and snapshots are built from
+    the table, which is only scanned when the event counter moved.
+    """
+
+    def __init__(
+            self,
+            bucket: str = EVENTS_LIVE_BUCKET,
+            interval_ms: int = EVENTS_LIVE_INTERVAL_MS,
+            keepalive_s: float = EVENTS_LIVE_KEEPALIVE_S,
+            shared: Optional[SharedTable] = None,
+            shared_events: Optional[SharedCounters] = None):
+        width = parse_interval(bucket)
+        if not width:
+            raise ValueError(f"Unsupported live bucket: {bucket!r}")
+        self.width = width
+        self.interval = interval_ms / 1000
+        self.keepalive = keepalive_s
+        self.shared = shared
+        self.shared_events = shared_events
+        self.bucket: Optional[datetime] = None
+        self.counts: Dict[str, int] = {}
+        self.version = 0
+        self.snapshot: Optional[LiveSnapshot] = None
+        self.subscribers = 0
+        self._published_version = -1
+        self._published: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def _roll(self, bucket: datetime) -> None:
+        if self.bucket is None or bucket > self.bucket:
+            self.bucket = bucket
+            self.counts = {}
+            self.version += 1
+
+    def record(self, page: str, time: Optional[datetime] = None) -> None:
+        bucket = align_to_bucket(as_utc(time) if time else get_utc_now(), self.width)
+        self._roll(bucket)
+        # late events for an older bucket are past what dashboards show
+        if bucket == self.bucket:
+            self.counts[page] = self.counts.get(page, 0) + 1
+            self.version += 1
+            if self.shared is not None:
+                self.shared.add(page, epoch=self._epoch(bucket))
+                self.shared_events.add(0)
+
+    def record_rows(self, rows: Iterable[Dict]) -> None:
+        for row in rows:
+            self.record(row["page"], row["time"])
+
+    def _epoch(self, bucket: datetime) -> int:
+        return (bucket - BUCKET_ORIGIN) // self.width
+
+    def _current(self) -> Tuple[object, Optional[Dict[str, int]]]:
+        """
+        (version, counts) of this process or, when shared, of the host.
+        Counts are None when the version is the published one.
+        """
+        if self.shared is None:
+            return self.version, self.counts
+        epoch = self._epoch(self.bucket)
+        version = (epoch, self.shared_events.value(0))
+        if version == self._published_version:
+            return version, None
+        return version, dict(self.shared.items()) if self.shared.epoch == epoch else {}
+
+    def publish(self) -> bool:
+        """
+        Snapshot the counts if they changed and wake every subscriber.
+        Returns whether a new snapshot was published.
+        """
+        # an empty bucket once the current one is over
+        self._roll(align_to_bucket(get_utc_now(), self.width))
+        version, counts = self._current()
+        if version == self._published_version:
+            return False
+        payload = json.dumps({
+            "bucket": self.bucket.isoformat(),
+            "width_seconds": self.width.total_seconds(),
+            "counts": counts,
+            "total": sum(counts.values()),
+        })
+        self.snapshot = LiveSnapshot(payload, f"data: {payload}\n\n".encode())
+        self._published_version = version
+        if self._published is not None:
+            # waiters hold the old event; later waiters get a fresh one
+            published, self._published = self._published, asyncio.Event()
+            published.set()
+        return True
+
+    async def subscribe(self) -> AsyncIterator[Optional[LiveSnapshot]]:
+        """
+        The current snapshot, then each newly published one. A subscriber
+        that falls behind skips straight to the latest. Yields None when
+        nothing was published for `keepalive` seconds.
+        """
+        if self._task is None:
+            await self.start()
+        self.subscribers += 1
+        LIVE_SUBSCRIBERS.inc()
+        try:
+            self.publish()
+            yield self.snapshot
+            while not self._stopping:
+                published = self._published
+                try:
+                    async with asyncio.timeout(self.keepalive):
+                        await published.wait()
+                except TimeoutError:
+                    yield None
+                    continue
+                if not self._stopping:
+                    yield self.snapshot
+        finally:
+            self.subscribers -= 1
+            LIVE_SUBSCRIBERS.dec()
+
+    async def _run(self):
+        while not self._stopping:
+            await asyncio.sleep(self.interval)
+            if self.subscribers:
+                self.publish()
+
+    async def start(self):
+        self._published = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # end the broadcaster and every open stream
+        if self._task is not None:
+            self._stopping = True
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._published.set()
+            self._published = None
+
+
+live_counts = LiveCounts(
+    shared=shared_table("live_counts", EVENTS_LIVE_SHARED_PAGES),
+    shared_events=shared_counters("live_events", 1),
+)
@@ -0,0 +1,23 @@
+from src.api.metrics import REGISTRY
+from src.api.metrics.registry import COUNT_BUCKETS
+
+EVENTS_INGESTED = REGISTRY.counter(
+    "events_ingested_total",
+    "Events accepted for storage.",
+    ("mode",),
+)
+READ_EVENTS_ROWS = REGISTRY.histogram(
+    "read_events_rows",
+    "Bucket rows returned by read_events.",
+    ("source",),
+    buckets=COUNT_BUCKETS,
+)
+EVENTS_EXPORTED = REGISTRY.counter(
+    "events_exported_total",
+    "Raw events streamed by the export endpoint.",
+    ("format",),
+)
+LIVE_SUBSCRIBERS = REGISTRY.gauge(
+    "events_live_subscribers",
+    "Open live event streams (SSE and WebSocket).",
+)
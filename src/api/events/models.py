@@ -1,24 +1,172 @@
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import List, Optional
 # from pydantic import BaseModel, Field
+import sqlalchemy
 import sqlmodel
 from sqlmodel import SQLModel, Field
 from timescaledb import TimescaleModel
 from timescaledb.utils import get_utc_now
 
+# dictionary tables for the repetitive strings on every event,
+# EventModel stores their integer ids instead of the text
+
+class PageDimension(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    value: str = Field(unique=True) # /about, /contact, # pricing
+
+
+class UserAgentDimension(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    value: str = Field(unique=True)
+
+
+class ReferrerDimension(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    value: str = Field(unique=True)
+
+
 # page visits at any given time
 
 class EventModel(TimescaleModel, table=True):
-    page: str = Field(index=True) # /about, /contact, # pricing
-    user_agent: Optional[str] = Field(default="", index=True) # browser
-    ip_address: Optional[str] = Field(default="", index=True)
-    referrer: Optional[str] = Field(default="", index=True) 
-    session_id: Optional[str] = Field(index=True)
+    # ids are handed out by the dimension caches (no FK checks on ingest)
+    page_id: int # PageDimension
+    user_agent_id: Optional[int] = Field(default=None) # UserAgentDimension
+    ip_address: Optional[str] = Field(default="")
+    referrer_id: Optional[int] = Field(default=None) # ReferrerDimension
+    session_id: Optional[str]
     duration: Optional[int] = Field(default=0) 
+    # derived from user_agent at ingest
+    operating_system: Optional[str] = Field(default="")
+    browser: Optional[str] = Field(default="")
+    device_type: Optional[str] = Field(default="")
 
     __chunk_time_interval__ = "INTERVAL 1 day"
     __drop_after__ = "INTERVAL 3 months"
 
+    # columnar compression for chunks past the hourly rollup's refresh
+    # window (3 days), one segment per page, rows in time order within it
+    __enable_compression__ = True
+    __compress_segmentby__ = "page_id"
+    __compress_orderby__ = "time DESC"
+    __compress_after__ = "INTERVAL 7 days"
+
+    # only index the access paths we query, every index is paid for on insert
+    # time alone is covered by the hypertable's own (time DESC) index
+    __table_args__ = (
+        # read_events: pages over a time window
+        sqlalchemy.Index("ix_eventmodel_page_id_time", "page_id", sqlalchemy.text("time DESC")),
+        # a visit's events in order; page_id included so funnels scan
+        # sessions in order from the index alone
+        sqlalchemy.Index(
+            "ix_eventmodel_session_id_time_page_id",
+            "session_id",
+            "time",
+            postgresql_include=["page_id"],
+        ),
+    )
+
+
+# single-column indexes from before the composite layout
+LEGACY_EVENT_INDEXES = [
+    "ix_eventmodel_page",
+    "ix_eventmodel_page_id",
+    "ix_eventmodel_user_agent",
+    "ix_eventmodel_user_agent_id",
+    "ix_eventmodel_ip_address",
+    "ix_eventmodel_referrer",
+    "ix_eventmodel_referrer_id",
+    "ix_eventmodel_session_id",
+    "ix_eventmodel_session_id_time",
+    "ix_eventmodel_operating_system",
+]
+
+
+# continuous aggregates (materialized views) over EventModel
+# not SQLModel tables, so they live on their own metadata
+rollup_metadata = sqlalchemy.MetaData()
+
+# HyperLogLog registers per session sketch (timescaledb_toolkit), ~1.6%
+# standard error; every rollup must agree so sketches stay mergeable
+SESSION_HLL_BUCKETS = 4096
+
+
+class HyperLogLog(sqlalchemy.types.UserDefinedType):
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "hyperloglog"
+
+
+# duration quantile sketch (UDDSketch), same parameters in every rollup
+# so sketches merge. A bucket spans a factor of (1 + e) / (1 - e), so
+# 8192 buckets at e = 0.1% hold durations across a ~1.3e7x range (1 to
+# 13 million) at 0.1% relative error on any percentile; a sketch with a
+# wider spread merges neighbouring buckets and doubles its error each time
+DURATION_SKETCH_BUCKETS = 8192
+DURATION_SKETCH_MAX_ERROR = 0.001
+DURATION_PERCENTILES = (50, 90, 99)
+
+
+class UddSketch(sqlalchemy.types.UserDefinedType):
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "uddsketch"
+
+
+def rollup_table(name: str) -> sqlalchemy.Table:
+    return sqlalchemy.Table(
+        name,
+        rollup_metadata,
+        sqlalchemy.Column("bucket", sqlalchemy.DateTime(timezone=True)),
+        sqlalchemy.Column("page_id", sqlalchemy.Integer),
+        sqlalchemy.Column("operating_system", sqlalchemy.String),
+        sqlalchemy.Column("count", sqlalchemy.BigInteger),
+        sqlalchemy.Column("sum_duration", sqlalchemy.Numeric),
+        # distinct session_id sketch, merge with rollup() then distinct_count()
+        sqlalchemy.Column("sessions", HyperLogLog),
+        # duration sketch, merge with rollup() then approx_percentile()
+        sqlalchemy.Column("duration_sketch", UddSketch),
+    )
+
+
+@dataclass(frozen=True)
+class EventRollup:
+    table: sqlalchemy.Table
+    bucket_width: str
+    # refresh policy
+    start_offset: str
+    end_offset: str
+    schedule_interval: str
+    # roll up from another rollup instead of raw events
+    source: Optional["EventRollup"] = None
+
+    @property
+    def name(self) -> str:
+        return self.table.name
+
+
+HOURLY_EVENT_ROLLUP = EventRollup(
+    table=rollup_table("event_rollup_hourly"),
+    bucket_width="1 hour",
+    start_offset="3 days",
+    end_offset="1 hour",
+    schedule_interval="30 minutes",
+)
+
+DAILY_EVENT_ROLLUP = EventRollup(
+    table=rollup_table("event_rollup_daily"),
+    bucket_width="1 day",
+    start_offset="7 days",
+    end_offset="1 day",
+    schedule_interval="1 hour",
+    source=HOURLY_EVENT_ROLLUP,
+)
+
+# finest first
+EVENT_ROLLUPS = [HOURLY_EVENT_ROLLUP, DAILY_EVENT_ROLLUP]
+
 
 class EventCreateSchema(SQLModel):
     page: str
@@ -29,6 +177,21 @@ class EventCreateSchema(SQLModel):
     duration: Optional[int] = Field(default=0) 
 
 
+class EventReadSchema(SQLModel):
+    # an EventModel row with its dimension ids decoded
+    id: Optional[int] = None
+    time: datetime
+    page: str
+    user_agent: Optional[str] = ""
+    ip_address: Optional[str] = ""
+    referrer: Optional[str] = ""
+    session_id: Optional[str] = None
+    duration: Optional[int] = 0
+    operating_system: Optional[str] = ""
+    browser: Optional[str] = ""
+    device_type: Optional[str] = ""
+
+
 # class EventUpdateSchema(SQLModel):
 #     description: str
 
@@ -40,10 +203,52 @@ class EventListSchema(SQLModel):
     count: int
 
 
+class EventBatchItemSchema(SQLModel):
+    index: int
+    status: str # created, accepted (spooled), invalid
+    id: Optional[int] = None
+    errors: Optional[List[dict]] = None
+
+
+class EventBatchResultSchema(SQLModel):
+    results: List[EventBatchItemSchema]
+    created: int
+    failed: int
+
+
+class EventFunnelSchema(SQLModel):
+    # ordered steps, defaults to DEFAULT_FUNNEL_PAGES
+    pages: Optional[List[str]] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    # "7 days" -> [end - 7 days, end), instead of start
+    since: Optional[str] = None
+
+
+class EventFunnelStepSchema(SQLModel):
+    page: str
+    sessions: int
+    # of the sessions that reached the previous step / the first step
+    conversion: Optional[float] = None
+    rate: Optional[float] = None
+
+
+class EventFunnelResultSchema(SQLModel):
+    start: datetime
+    end: datetime
+    steps: List[EventFunnelStepSchema]
+
+
 class EventBucketSchema(SQLModel):
     bucket: datetime
     page: str
     ua: Optional[str] = ""
     operating_system: Optional[str] = ""
     avg_duration: Optional[float] = 0.0
-    count: int
\ No newline at end of file
+    count: int
+    # approximate distinct session_id (HyperLogLog)
+    unique_sessions: Optional[int] = None
+    # approximate duration percentiles (UDDSketch)
+    p50_duration: Optional[float] = None
+    p90_duration: Optional[float] = None
+    p99_duration: Optional[float] = None
\ No newline at end of file
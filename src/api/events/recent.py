@@ -0,0 +1,246 @@
+"""
+In-memory sliding window of recent traffic for read_events.
+
+A ring of `slots` fixed-width slots (1 minute by default) holds, per
+(page, operating system), the event count, duration sum, distinct
+sessions and a duration histogram. The ingest routes `record` into it
+and read_events answers windows it fully covers from here instead of
+Postgres.
+
+The ring only holds what this process ingested since it started, so it
+is off unless EVENTS_RECENT_SLOTS is set, which is only right when this
+process is the one ingester. It starts cold, with no boot-time query:
+only slots that begin after startup are covered. With SHM_DIR set each
+worker registers in a host-wide counters file, and while any other
+worker is attached read_events goes to the database; once it is alone
+again only slots starting after that are served.
+"""
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from src.api.shm import SharedCounters, shared_counters
+
+from .config import EVENTS_RECENT_SLOT, EVENTS_RECENT_SLOTS
+from .models import DURATION_PERCENTILES, DURATION_SKETCH_MAX_ERROR, get_utc_now
+from .timeranges import BUCKET_ORIGIN, align_to_bucket, as_utc, parse_interval
+
+logger = logging.getLogger(__name__)
+
+# relative-error log buckets, the error bound the UDDSketch rollups keep
+# over their range (this histogram never merges buckets, so at any range)
+GAMMA = (1 + DURATION_SKETCH_MAX_ERROR) / (1 - DURATION_SKETCH_MAX_ERROR)
+LOG_GAMMA = math.log(GAMMA)
+# histogram key for zero (and negative) durations
+ZERO_INDEX = -(2 ** 31)
+
+
+def duration_index(duration: float) -> int:
+    if duration <= 0:
+        return ZERO_INDEX
+    return math.ceil(math.log(duration) / LOG_GAMMA)
+
+
+def index_value(index: int) -> float:
+    if index == ZERO_INDEX:
+        return 0.0
+    # midpoint of (gamma^(i-1), gamma^i], within the relative error
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+def histogram_percentiles(histogram: Dict[int, int], total: int) -> List[Optional[float]]:
+    if not total:
+        return [None for _ in DURATION_PERCENTILES]
+    indexes = sorted(histogram)
+    values = []
+    for percentile in DURATION_PERCENTILES:
+        rank = percentile / 100 * (total - 1)
+        seen = 0
+        for index in indexes:
+            seen += histogram[index]
+            if seen > rank:
+                values.append(index_value(index))
+                break
+    return values
+
+
+class SlotStats:
+    __slots__ = ("count", "duration_sum", "sessions", "durations")
+
+    def __init__(self):
+        self.count = 0
+        self.duration_sum = 0
+        self.sessions: Set[str] = set()
+        self.durations: Dict[int, int] = {}
+
+    def add(self, session_id: Optional[str], duration: Optional[int]) -> None:
+        duration = duration or 0
+        self.count += 1
+        self.duration_sum += duration
+        if session_id is not None:
+            self.sessions.add(session_id)
+        index = duration_index(duration)
+        self.durations[index] = self.durations.get(index, 0) + 1
+
+    def merge(self, other: "SlotStats") -> None:
+        self.count += other.count
+        self.duration_sum += other.duration_sum
+        self.sessions |= other.sessions
+        for index, count in other.durations.items():
+            self.durations[index] = self.durations.get(index, 0) + count
+
+
+class BucketRow(NamedTuple):
+    # read_events' select list, in order (see columnar.BUCKET_COLUMNS)
+    bucket: datetime
+    operating_system: str
+    page: str
+    avg_duration: Optional[float]
+    count: int
+    unique_sessions: int
+    p50_duration: Optional[float]
+    p90_duration: Optional[float]
+    p99_duration: Optional[float]
+
+
+class RecentCounters:
+    """
+    Ring buffer of per-slot stats keyed by (page, operating_system).
+
+    Slot n covers [BUCKET_ORIGIN + n * slot, + slot) and lives at index
+    n % slots, so recording never prunes: a stale slot is recognised by
+    its number and reused. `covered_since` is the earliest time every
+    event is known to be counted (None until started).
+    """
+
+    def __init__(
+            self,
+            slot: str = EVENTS_RECENT_SLOT,
+            slots: int = EVENTS_RECENT_SLOTS,
+            ingesters: Optional[SharedCounters] = None):
+        width = parse_interval(slot)
+        if not width:
+            raise ValueError(f"Unsupported recent slot: {slot!r}")
+        self.slot = width
+        self.size = slots
+        # one row per worker on the host, to tell whether we're alone
+        self.ingesters = ingesters
+        self.covered_since: Optional[datetime] = None
+        self._ring: List[Optional[Tuple[int, Dict[Tuple[str, str], SlotStats]]]] = [None] * slots
+        self._latest = 0
+
+    def slot_number(self, ts: datetime) -> int:
+        return (as_utc(ts) - BUCKET_ORIGIN) // self.slot
+
+    def slot_start(self, number: int) -> datetime:
+        return BUCKET_ORIGIN + number * self.slot
+
+    def is_aligned(self, ts: datetime) -> bool:
+        return (as_utc(ts) - BUCKET_ORIGIN) % self.slot == timedelta(0)
+
+    def record(
+            self,
+            page: str,
+            operating_system: str,
+            session_id: Optional[str],
+            duration: Optional[int],
+            time: datetime) -> None:
+        if not self.size:
+            return
+        number = self.slot_number(time)
+        if number <= self._latest - self.size:
+            return  # older than the ring
+        self._latest = max(self._latest, number)
+        position = number % self.size
+        entry = self._ring[position]
+        if entry is None or entry[0] != number:
+            entry = self._ring[position] = (number, {})
+        key = (page, operating_system or "")
+        stats = entry[1].get(key)
+        if stats is None:
+            stats = entry[1][key] = SlotStats()
+        stats.add(session_id, duration)
+
+    def record_row(self, row: Dict) -> None:
+        # a text-valued row from ingest.event_row
+        self.record(row["page"], row["operating_system"], row["session_id"], row["duration"], row["time"])
+
+    def record_rows(self, rows: Iterable[Dict]) -> None:
+        for row in rows:
+            self.record_row(row)
+
+    def covers(self, start: datetime, end: datetime, now: Optional[datetime] = None) -> bool:
+        """
+        Whether [start, end) can be answered from memory: it starts on a
+        slot boundary still in the ring and after `covered_since`, and
+        ends on a slot boundary or in (or after) the current slot.
+        """
+        if not self.size or self.covered_since is None:
+            return False
+        current = self.slot_number(now or get_utc_now())
+        if self.ingesters is not None and self.ingesters.attached() > 1:
+            # other workers take events this ring never sees
+            self.covered_since = max(self.covered_since, self.slot_start(current + 1))
+            return False
+        return (
+            self.is_aligned(start)
+            and start >= self.covered_since
+            and self.slot_number(start) > current - self.size
+            and (self.is_aligned(end) or self.slot_number(end) >= current)
+        )
+
+    def query(self, start: datetime, end: datetime, width: timedelta, pages: Iterable[str]) -> List[BucketRow]:
+        """
+        read_events rows for [start, end) in buckets of `width` (a
+        multiple of the slot), ordered like the database query.
+        """
+        pages = set(pages)
+        groups: Dict[Tuple[datetime, str, str], SlotStats] = {}
+        first = self.slot_number(start)
+        last = self.slot_number(end) - (1 if self.is_aligned(end) else 0)
+        # nothing is recorded past the newest slot: an `end` in the future
+        # mustn't move the window off the slots that hold data
+        last = min(last, self._latest)
+        for number in range(max(first, last - self.size + 1), last + 1):
+            entry = self._ring[number % self.size]
+            if entry is None or entry[0] != number:
+                continue
+            slot_start = self.slot_start(number)
+            bucket = align_to_bucket(slot_start, width)
+            for (page, operating_system), stats in entry[1].items():
+                if page not in pages:
+                    continue
+                key = (bucket, operating_system, page)
+                merged = groups.get(key)
+                if merged is None:
+                    merged = groups[key] = SlotStats()
+                merged.merge(stats)
+        return [
+            BucketRow(
+                bucket, operating_system, page,
+                stats.duration_sum / stats.count if stats.count else None,
+                stats.count,
+                len(stats.sessions),
+                *histogram_percentiles(stats.durations, stats.count)
+            )
+            for (bucket, operating_system, page), stats in sorted(groups.items())
+        ]
+
+    async def start(self) -> None:
+        """
+        Start cold: events before now were never recorded here, so only
+        slots that begin after now are covered.
+        """
+        if not self.size:
+            return
+        if self.ingesters is not None:
+            # claim this worker's row, so the others see it
+            self.ingesters.attached()
+        self.covered_since = self.slot_start(self.slot_number(get_utc_now()) + 1)
+        logger.info("Recent counters cover %s onwards", self.covered_since.isoformat())
+
+
+recent_counters = RecentCounters(
+    ingesters=shared_counters("recent_ingesters", 1) if EVENTS_RECENT_SLOTS else None
+)
@@ -0,0 +1,175 @@
+import logging
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.functions import Function
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session
+from timescaledb.hyperfunctions import time_bucket
+
+from .models import (
+    DURATION_PERCENTILES,
+    DURATION_SKETCH_BUCKETS,
+    DURATION_SKETCH_MAX_ERROR,
+    EVENT_ROLLUPS,
+    SESSION_HLL_BUCKETS,
+    EventModel,
+    EventRollup,
+)
+from .timeranges import is_calendar_interval, parse_interval
+
+logger = logging.getLogger(__name__)
+
+
+def rollup_for(duration: str, rollups: List[EventRollup] = EVENT_ROLLUPS) -> Optional[EventRollup]:
+    """
+    Pick the coarsest rollup whose buckets fit evenly inside `duration`.
+
+    Returns None when the buckets are finer than (or don't line up with)
+    every rollup, meaning the query has to run on raw events.
+    """
+    if is_calendar_interval(duration):
+        return rollups[-1] if parse_interval(duration, calendar=True) else None
+    requested = parse_interval(duration)
+    if not requested:
+        return None
+    for rollup in reversed(rollups):
+        width = parse_interval(rollup.bucket_width)
+        if requested >= width and requested % width == timedelta(0):
+            return rollup
+    return None
+
+
+def rollup_sketch(column):
+    # toolkit's rollup() aggregate merges sketches; func.rollup would
+    # render the GROUP BY ROLLUP construct instead
+    return Function("rollup", column)
+
+
+def duration_sketch(column):
+    return func.uddsketch(DURATION_SKETCH_BUCKETS, DURATION_SKETCH_MAX_ERROR, column)
+
+
+def duration_percentiles(sketch) -> list:
+    """
+    p50/p90/p99_duration columns read from a (merged) duration sketch
+    """
+    return [
+        func.approx_percentile(pct / 100, sketch).label(f"p{pct}_duration")
+        for pct in DURATION_PERCENTILES
+    ]
+
+
+def rollup_select(rollup: EventRollup):
+    if rollup.source is None:
+        bucket = time_bucket(rollup.bucket_width, EventModel.time)
+        return (
+            select(
+                bucket.label("bucket"),
+                EventModel.page_id,
+                EventModel.operating_system,
+                func.count().label("count"),
+                func.sum(EventModel.duration).label("sum_duration"),
+                func.hyperloglog(SESSION_HLL_BUCKETS, EventModel.session_id).label("sessions"),
+                duration_sketch(EventModel.duration).label("duration_sketch"),
+            )
+            .group_by(bucket, EventModel.page_id, EventModel.operating_system)
+        )
+    source = rollup.source.table.c
+    bucket = time_bucket(rollup.bucket_width, source.bucket)
+    return (
+        select(
+            bucket.label("bucket"),
+            source.page_id,
+            source.operating_system,
+            func.sum(source.count).label("count"),
+            func.sum(source.sum_duration).label("sum_duration"),
+            rollup_sketch(source.sessions).label("sessions"),
+            rollup_sketch(source.duration_sketch).label("duration_sketch"),
+        )
+        .group_by(bucket, source.page_id, source.operating_system)
+    )
+
+
+def rollup_ddl(rollup: EventRollup) -> List[str]:
+    """
+    Statements that create `rollup` and its refresh policy (idempotent).
+
+    Real-time aggregation (materialized_only = false) is turned on so reads
+    union the materialized buckets with raw rows past the refresh watermark.
+    """
+    query = rollup_select(rollup).compile(
+        dialect=postgresql.dialect(paramstyle="named"),
+        compile_kwargs={"literal_binds": True}
+    )
+    return [
+        f"CREATE MATERIALIZED VIEW IF NOT EXISTS {rollup.name} "
+        f"WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS "
+        f"{query} WITH NO DATA",
+        f"SELECT add_continuous_aggregate_policy('{rollup.name}', "
+        f"start_offset => INTERVAL '{rollup.start_offset}', "
+        f"end_offset => INTERVAL '{rollup.end_offset}', "
+        f"schedule_interval => INTERVAL '{rollup.schedule_interval}', "
+        f"if_not_exists => true)",
+    ]
+
+
+def rollup_is_stale(session: Session, rollup: EventRollup) -> bool:
+    """
+    True when the view exists but lacks columns declared on its table, or
+    sketches durations with another bucket count (CREATE ... IF NOT
+    EXISTS would keep the old definition).
+    """
+    existing = set(session.exec(
+        text("SELECT column_name FROM information_schema.columns WHERE table_name = :name")
+        .bindparams(name=rollup.name)
+    ).scalars().all())
+    if not existing:
+        return False
+    if not set(rollup.table.c.keys()) <= existing:
+        return True
+    if rollup.source is not None:
+        # merges its source's sketches, rebuilt along with it
+        return False
+    definition = session.exec(
+        text("SELECT view_definition FROM timescaledb_information.continuous_aggregates "
+             "WHERE view_name = :name")
+        .bindparams(name=rollup.name)
+    ).scalar()
+    return definition is not None and f"uddsketch({DURATION_SKETCH_BUCKETS}," not in definition
+
+
+def sync_event_rollups(session: Session, rollups: List[EventRollup] = EVENT_ROLLUPS) -> List[EventRollup]:
+    """
+    Create the rollups, rebuilding outdated ones. Returns the rollups that
+    were rebuilt (empty, WITH NO DATA), to pass to refresh_event_rollups.
+    """
+    # hyperloglog() and friends
+    session.exec(text("CREATE EXTENSION IF NOT EXISTS timescaledb_toolkit"))
+    rebuilt = []
+    # in order: hierarchical rollups need their source to exist
+    for rollup in rollups:
+        if rollup_is_stale(session, rollup):
+            logger.warning(f"Rebuilding outdated rollup {rollup.name}")
+            session.exec(text(f"DROP MATERIALIZED VIEW {rollup.name} CASCADE"))
+            rebuilt.append(rollup)
+        elif rollup.source in rebuilt:
+            # dropped by the CASCADE above, recreated here
+            rebuilt.append(rollup)
+        for statement in rollup_ddl(rollup):
+            session.exec(text(statement))
+    session.commit()
+    return rebuilt
+
+
+def refresh_event_rollups(engine: Engine, rollups: List[EventRollup] = EVENT_ROLLUPS) -> None:
+    """
+    Materialize `rollups` over all of history, in order (a rollup built
+    on another reads what that one has materialized).
+    """
+    # refresh_continuous_aggregate can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for rollup in rollups:
+            conn.execute(text(f"CALL refresh_continuous_aggregate('{rollup.name}', NULL, NULL)"))
@@ -1,94 +1,408 @@
 import os
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
-from sqlalchemy import case, func
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import BigInteger, cast, func
 from timescaledb.hyperfunctions import time_bucket
 from datetime import datetime, timedelta, timezone
-from src.api.db.session import get_session
+from src.api.db.replicas import get_read_session, remember_write
+from src.api.db.session import get_write_session
 
+from .buffer import BufferFullError, event_buffer
+from .columnar import arrow_response, columnar_response, wants_arrow
+from .config import (
+    DEFAULT_LOOKUP_PAGES,
+    EVENTS_BATCH_MAX_BYTES,
+    EVENTS_BATCH_MAX_SIZE,
+    EVENTS_FUNNEL_MAX_STEPS,
+    EVENTS_WRITE_BEHIND,
+)
+from .export import EXPORT_FORMATS, export_query, stream_export
+from .funnel import DEFAULT_FUNNEL_PAGES, funnel_query, funnel_steps, resolve_funnel_window
+from .ingest import bulk_insert_events, event_row, insert_event, parse_batch_body, validate_batch
+from .live import KEEPALIVE_FRAME, live_counts
+from .metrics import EVENTS_INGESTED, READ_EVENTS_ROWS
 from .models import (
     EventModel, 
+    EventBatchResultSchema,
     EventBucketSchema, 
     EventCreateSchema,
+    EventFunnelResultSchema,
+    EventFunnelSchema,
+    EventReadSchema,
+    PageDimension,
+    ReferrerDimension,
+    SESSION_HLL_BUCKETS,
+    UserAgentDimension,
     get_utc_now
 )
+from .recent import recent_counters
+from .rollups import duration_percentiles, duration_sketch, rollup_for, rollup_sketch
+from .spool import SpoolFullError, event_spool
+from .timeranges import as_utc, is_calendar_interval, parse_interval, resolve_time_window
 router = APIRouter()
 
-DEFAULT_LOOKUP_PAGES = [
-        "/", "/about", "/pricing", "/contact", 
-        "/blog", "/products", "/login", "/signup",
-        "/dashboard", "/settings"
-    ]
-
 # Get data here
 # List View
 # GET /api/events/
 @router.get("/", response_model=List[EventBucketSchema])
-def read_events(
+async def read_events(
         duration: str = Query(default="1 day"),
         pages: List = Query(default=None),
-        session: Session = Depends(get_session)
+        start: Optional[datetime] = Query(default=None),
+        end: Optional[datetime] = Query(default=None),
+        since: Optional[str] = Query(default=None),
+        format: str = Query(default="rows"),
+        accept: Optional[str] = Header(default=None),
+        session: AsyncSession = Depends(get_read_session)
     ):
     # a bunch of items in a table
-    os_case = case(
-        (EventModel.user_agent.ilike('%windows%'), 'Windows'),
-        (EventModel.user_agent.ilike('%macintosh%'), 'MacOS'),
-        (EventModel.user_agent.ilike('%iphone%'), 'iOS'),
-        (EventModel.user_agent.ilike('%android%'), 'Android'),
-        (EventModel.user_agent.ilike('%linux%'), 'Linux'),
-        else_='Other'
-    ).label('operating_system')
-
-    bucket = time_bucket(duration, EventModel.time)
+    # format=columnar (parallel JSON arrays) or Accept: Arrow IPC skip
+    # building an EventBucketSchema per row
+    if format not in ("rows", "columnar"):
+        raise HTTPException(status_code=400, detail=f"Unknown format {format!r}, expected rows or columnar")
+    try:
+        window_start, window_end = resolve_time_window(duration, start, end, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     lookup_pages = pages if isinstance(pages, list) and len(pages) > 0 else DEFAULT_LOOKUP_PAGES
-    query = (
-        select(
-            bucket.label('bucket'),
-            os_case,
-            EventModel.page.label('page'),
-            func.avg(EventModel.duration).label("avg_duration"),
-            func.count().label('count')
+    width = None if is_calendar_interval(duration) else parse_interval(duration)
+    if (width and width % recent_counters.slot == timedelta(0)
+            and recent_counters.covers(window_start, window_end)):
+        # recent window, answered from the in-memory counters
+        results = recent_counters.query(window_start, window_end, width, lookup_pages)
+        return bucket_response(results, "memory", format, accept)
+    lookup_page_ids = select(PageDimension.id).where(PageDimension.value.in_(lookup_pages))
+    rollup = rollup_for(duration)
+    if rollup is not None:
+        # buckets line up with a continuous aggregate, re-bucket that
+        source = rollup.table.c
+        bucket = time_bucket(duration, source.bucket)
+        total = func.sum(source.count)
+        aggregated = (
+            select(
+                bucket.label('bucket'),
+                source.operating_system,
+                source.page_id,
+                (func.sum(source.sum_duration) / func.nullif(total, 0)).label("avg_duration"),
+                # sum(bigint) is numeric (a Decimal), count() is bigint
+                cast(total, BigInteger).label('count'),
+                # merged sketches: no rescan of raw events for wide buckets
+                func.distinct_count(rollup_sketch(source.sessions)).label('unique_sessions'),
+                # percentiles from merged digests, no sort of raw rows
+                *duration_percentiles(rollup_sketch(source.duration_sketch))
+            )
+            .where(
+                source.bucket >= window_start,
+                source.bucket < window_end,
+                source.page_id.in_(lookup_page_ids)
+            )
+            .group_by(
+                bucket,
+                source.operating_system,
+                source.page_id,
+            )
         )
-        .where(
-            EventModel.page.in_(lookup_pages)
+        source_name = rollup.name
+    else:
+        # finer than any rollup, aggregate raw events
+        bucket = time_bucket(duration, EventModel.time)
+        aggregated = (
+            select(
+                bucket.label('bucket'),
+                EventModel.operating_system,
+                EventModel.page_id,
+                func.avg(EventModel.duration).label("avg_duration"),
+                func.count().label('count'),
+                # same sketch as the rollups so both paths agree
+                func.distinct_count(
+                    func.hyperloglog(SESSION_HLL_BUCKETS, EventModel.session_id)
+                ).label('unique_sessions'),
+                *duration_percentiles(duration_sketch(EventModel.duration))
+            )
+            .where(
+                # bounds on the time column let chunk exclusion skip old chunks
+                EventModel.time >= window_start,
+                EventModel.time < window_end,
+                EventModel.page_id.in_(lookup_page_ids)
+            )
+            .group_by(
+                bucket,
+                EventModel.operating_system,
+                EventModel.page_id,
+            )
         )
-        .group_by(
-            bucket,
-            os_case,
-            EventModel.page,
+        source_name = "raw"
+    # page ids -> page paths, only for the aggregated rows
+    aggregated = aggregated.subquery()
+    query = (
+        select(
+            aggregated.c.bucket,
+            aggregated.c.operating_system,
+            PageDimension.value.label('page'),
+            aggregated.c.avg_duration,
+            aggregated.c.count,
+            aggregated.c.unique_sessions,
+            aggregated.c.p50_duration,
+            aggregated.c.p90_duration,
+            aggregated.c.p99_duration
         )
+        .join(PageDimension, PageDimension.id == aggregated.c.page_id)
         .order_by(
-            bucket,
-            os_case,
-            EventModel.page,
+            aggregated.c.bucket,
+            aggregated.c.operating_system,
+            PageDimension.value,
         )
     )
-    results = session.exec(query).fetchall()
+    results = (await session.exec(query)).fetchall()
+    return bucket_response(results, source_name, format, accept)
+
+
+def bucket_response(results, source_name: str, format: str, accept: Optional[str]):
+    READ_EVENTS_ROWS.labels(source_name).observe(len(results))
+    if wants_arrow(accept):
+        try:
+            return arrow_response(results)
+        except ImportError:
+            raise HTTPException(status_code=406, detail="Arrow responses need pyarrow installed")
+    if format == "columnar":
+        return columnar_response(results)
     return results
 
 # SEND DATA HERE
 # create view
 # POST /api/events/
-@router.post("/", response_model=EventModel)
-def create_event(
+@router.post("/", response_model=EventReadSchema)
+async def create_event(
         payload:EventCreateSchema, 
-        session: Session = Depends(get_session)):
+        session: AsyncSession = Depends(get_write_session)):
     # a bunch of items in a table
-    data = payload.model_dump() # payload -> dict -> pydantic
-    obj = EventModel.model_validate(data)
-    session.add(obj)
-    session.commit()
-    session.refresh(obj)
-    return obj
+    data = event_row(payload) # payload -> dict -> pydantic
+    if event_spool is not None:
+        # append to the local spool, the replayer inserts it in bulk
+        await spool_rows([data])
+        EVENTS_INGESTED.labels("spooled").inc()
+        live_counts.record(data["page"], data["time"])
+        recent_counters.record_row(data)
+        return JSONResponse(status_code=202, content={"status": "accepted"})
+    if EVENTS_WRITE_BEHIND:
+        # queue it, the buffer flushes in bulk from the background
+        try:
+            event_buffer.put(data)
+        except BufferFullError:
+            raise HTTPException(
+                status_code=503,
+                detail="Event buffer is full, retry later",
+                headers={"Retry-After": "1"}
+            )
+        EVENTS_INGESTED.labels("buffered").inc()
+        live_counts.record(data["page"], data["time"])
+        recent_counters.record_row(data)
+        return JSONResponse(status_code=202, content={"status": "accepted"})
+    event_id, time = await insert_event(session, data)
+    EVENTS_INGESTED.labels("single").inc()
+    live_counts.record(data["page"], data["time"])
+    recent_counters.record_row(data)
+    # validated once here, not again by response_model
+    event = EventReadSchema(**data | {"id": event_id, "time": time})
+    response = Response(content=event.model_dump_json(), media_type="application/json")
+    # a get_event right after this reads the primary, not a lagging replica
+    remember_write(response)
+    return response
+
+
+async def spool_rows(rows: List) -> None:
+    try:
+        await event_spool.write(rows)
+    except (SpoolFullError, OSError):
+        # full, or the disk failed under it
+        raise HTTPException(
+            status_code=503,
+            detail="Event spool is unavailable, retry later",
+            headers={"Retry-After": "1"}
+        )
+
+
+def body_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Batch body too large (max {EVENTS_BATCH_MAX_BYTES} bytes)"
+    )
+
+
+async def read_capped_body(request: Request) -> bytes:
+    # refuse on the declared length, and stop reading a chunked (or
+    # understated) body as soon as it passes the cap
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > EVENTS_BATCH_MAX_BYTES:
+        raise body_too_large()
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > EVENTS_BATCH_MAX_BYTES:
+            raise body_too_large()
+    return bytes(body)
+
+
+async def get_batch_items(request: Request) -> List:
+    # JSON array or NDJSON body -> list of raw (unvalidated) items
+    body = await read_capped_body(request)
+    try:
+        items = parse_batch_body(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(items) > EVENTS_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {EVENTS_BATCH_MAX_SIZE} events)"
+        )
+    return items
+
+
+# SEND MANY EVENTS HERE
+# POST /api/events/batch
+@router.post("/batch", response_model=EventBatchResultSchema)
+async def create_events_batch(
+        response: Response,
+        items: List = Depends(get_batch_items),
+        session: AsyncSession = Depends(get_write_session)):
+    # one multi-row insert for every valid item in the batch
+    rows, results = validate_batch(items)
+    if event_spool is not None:
+        # spooled rows have no id until the replayer inserts them
+        await spool_rows(rows)
+        status, ids, mode = "accepted", iter(()), "spooled"
+        response.status_code = 202
+    else:
+        status, ids, mode = "created", iter(await bulk_insert_events(session, rows)), "batch"
+    for result in results:
+        if result.status == "pending":
+            result.status = status
+            result.id = next(ids, None)
+    created = len(rows)
+    EVENTS_INGESTED.labels(mode).inc(created)
+    live_counts.record_rows(rows)
+    recent_counters.record_rows(rows)
+    remember_write(response)
+    return EventBatchResultSchema(
+        results=results,
+        created=created,
+        failed=len(results) - created
+    )
+
+
+# SESSIONS THROUGH ORDERED PAGES
+# POST /api/events/funnel {"pages": ["/", "/pricing", "/signup"], "since": "7 days"}
+@router.post("/funnel", response_model=EventFunnelResultSchema)
+async def read_funnel(
+        payload: Optional[EventFunnelSchema] = None,
+        session: AsyncSession = Depends(get_read_session)):
+    # one pass over the window, grouped by session (see funnel.py)
+    payload = payload or EventFunnelSchema()
+    pages = payload.pages or DEFAULT_FUNNEL_PAGES
+    if len(pages) > EVENTS_FUNNEL_MAX_STEPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many steps (max {EVENTS_FUNNEL_MAX_STEPS})"
+        )
+    try:
+        window_start, window_end = resolve_funnel_window(payload.start, payload.end, payload.since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    ids = dict((await session.exec(
+        select(PageDimension.value, PageDimension.id).where(PageDimension.value.in_(pages))
+    )).all())
+    # never-seen pages get id 0, which no event has
+    step_ids = [ids.get(page, 0) for page in pages]
+    rows = (await session.exec(funnel_query(step_ids, window_start, window_end))).all()
+    return EventFunnelResultSchema(
+        start=window_start,
+        end=window_end,
+        steps=funnel_steps(pages, rows)
+    )
+
+
+# PUSH CURRENT-BUCKET COUNTS
+# GET /api/events/live (text/event-stream)
+async def live_frames():
+    async for snapshot in live_counts.subscribe():
+        yield KEEPALIVE_FRAME if snapshot is None else snapshot.frame
+
+
+@router.get("/live")
+async def stream_live_events():
+    # fed by the ingest routes above, no query per subscriber (see live.py)
+    return StreamingResponse(
+        live_frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# WS /api/events/live/ws, same JSON payloads as the SSE stream
+@router.websocket("/live/ws")
+async def stream_live_events_ws(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        async for snapshot in live_counts.subscribe():
+            if snapshot is not None:
+                await websocket.send_text(snapshot.payload)
+    except WebSocketDisconnect:
+        pass
+
+
+# STREAM RAW EVENTS
+# GET /api/events/export?start=...&format=csv
+# (registered before /{event_id} so "export" isn't parsed as an id)
+@router.get("/export")
+async def export_events(
+        start: datetime = Query(),
+        end: Optional[datetime] = Query(default=None),
+        pages: List = Query(default=None),
+        format: str = Query(default="ndjson")):
+    # rows are streamed from a server-side cursor, nothing is buffered
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown format {format!r}, expected one of {', '.join(EXPORT_FORMATS)}"
+        )
+    window_start = as_utc(start)
+    window_end = as_utc(end) if end is not None else get_utc_now()
+    if window_end <= window_start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    query = export_query(window_start, window_end, pages)
+    return StreamingResponse(
+        stream_export(query, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="events.{format}"'}
+    )
 
 
 # GET /api/events/12
-@router.get("/{event_id}", response_model=EventModel)
-def get_event(event_id:int, session: Session = Depends(get_session)):
+@router.get("/{event_id}", response_model=EventReadSchema)
+async def get_event(event_id:int, session: AsyncSession = Depends(get_read_session)):
     # a single row
-    query = select(EventModel).where(EventModel.id == event_id)
-    result = session.exec(query).first()
+    query = (
+        select(
+            EventModel,
+            PageDimension.value,
+            UserAgentDimension.value,
+            ReferrerDimension.value,
+        )
+        .join(PageDimension, PageDimension.id == EventModel.page_id)
+        .outerjoin(UserAgentDimension, UserAgentDimension.id == EventModel.user_agent_id)
+        .outerjoin(ReferrerDimension, ReferrerDimension.id == EventModel.referrer_id)
+        .where(EventModel.id == event_id)
+    )
+    result = (await session.exec(query)).first()
     if not result:
         raise HTTPException(status_code=404, detail="Event not found")
-    return result
+    event, page, user_agent, referrer = result
+    return EventReadSchema(
+        **event.model_dump(exclude={"page_id", "user_agent_id", "referrer_id"}),
+        page=page,
+        user_agent=user_agent,
+        referrer=referrer,
+    )
@@ -0,0 +1,459 @@
+"""
+Durable local spool for ingestion, for when the database is slow or down.
+
+With EVENTS_SPOOL_DIR set, the ingest routes append each accepted event
+to a segment file there and answer 202 without touching the database.
+A segment is append-only: one record per event, a 4-byte length and a
+CRC32 ahead of the row as JSON, so a torn write at the tail (a crash
+mid-append) is detected and skipped. Appends go to the page cache and
+are fsynced in batches every EVENTS_SPOOL_FSYNC_MS.
+
+Each worker writes its own segment, held under an flock taken before
+the file gets its ".spool" name (so a replayer never sees it unlocked),
+and rotates it when it grows past EVENTS_SPOOL_SEGMENT_BYTES or a
+replay pass comes round. A failed append is cut back off the segment
+before the request gets its 503, so a segment only ever holds whole
+records. With EVENTS_SPOOL_FSYNC_MS=0 each request waits for its own
+fsync, run in a thread off the event loop.
+
+The replayer mmaps closed segments (any worker's, including ones left
+by a crashed process) and bulk-inserts their rows. It records how far
+it got in an ".offset" file next to the segment and deletes both once
+everything is in. Rows are delivered at least once: a crash between a
+commit and the offset write replays that batch again. A segment that
+can't be read to its end is renamed aside with a ".corrupt" suffix
+rather than deleted, and one whose insert fails is retried after
+EVENTS_SPOOL_RETRY_S without holding up the others.
+"""
+import asyncio
+import errno
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .buffer import write_rows
+from .config import (
+    EVENTS_SPOOL_DIR,
+    EVENTS_SPOOL_FSYNC_MS,
+    EVENTS_SPOOL_MAX_BYTES,
+    EVENTS_SPOOL_REPLAY_MS,
+    EVENTS_SPOOL_REPLAY_ROWS,
+    EVENTS_SPOOL_RETRY_S,
+    EVENTS_SPOOL_SEGMENT_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+# payload length, CRC32 of the payload
+RECORD_HEADER = struct.Struct("!II")
+SEGMENT_SUFFIX = ".spool"
+OFFSET_SUFFIX = ".offset"
+# a segment with a bad record before its end, kept for an operator
+CORRUPT_SUFFIX = ".corrupt"
+# a segment until it is locked and renamed into place, and how old an
+# unrenamed one must be to count as left behind by a dead worker
+NEW_SUFFIX = ".new"
+ABANDONED_AFTER_S = 60
+
+
+class SpoolFullError(Exception):
+    """Raised when the spool directory holds EVENTS_SPOOL_MAX_BYTES already"""
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_record(row: Dict) -> bytes:
+    payload = json.dumps(row, default=_json_default, separators=(",", ":")).encode()
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(buffer, offset: int = 0) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (end offset, row) for each complete record from `offset`,
+    stopping at the end or at a torn or corrupt record.
+    """
+    size = len(buffer)
+    while offset + RECORD_HEADER.size <= size:
+        length, crc = RECORD_HEADER.unpack_from(buffer, offset)
+        start = offset + RECORD_HEADER.size
+        payload = buffer[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            logger.warning("Spool record at offset %s is torn or corrupt, skipping the rest", offset)
+            return
+        row = json.loads(payload)
+        if row.get("time"):
+            row["time"] = datetime.fromisoformat(row["time"])
+        offset = start + length
+        yield offset, row
+
+
+class EventSpool:
+    """
+    Append-only segment files under `directory`, drained by a replayer.
+
+    The ingest routes `await write(rows)`, which appends to the current
+    segment (and with `fsync_ms` 0, waits for an fsync in a thread).
+    `start` runs two background tasks: one fsyncs pending appends every
+    `fsync_ms`, the other rotates the current segment and replays closed
+    ones every `replay_ms`, leaving a segment alone for `retry_s` after
+    a failed insert.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            segment_bytes: int = EVENTS_SPOOL_SEGMENT_BYTES,
+            max_bytes: int = EVENTS_SPOOL_MAX_BYTES,
+            fsync_ms: int = EVENTS_SPOOL_FSYNC_MS,
+            replay_ms: int = EVENTS_SPOOL_REPLAY_MS,
+            replay_rows: int = EVENTS_SPOOL_REPLAY_ROWS,
+            retry_s: float = EVENTS_SPOOL_RETRY_S,
+            writer: Callable[[List[Dict]], Awaitable[None]] = write_rows):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_ms / 1000
+        self.replay_interval = replay_ms / 1000
+        self.replay_rows = replay_rows
+        self.retry_s = retry_s
+        self.writer = writer
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._path: Optional[str] = None
+        self._written = 0
+        self._dirty = False
+        # a segment was named since the last sync, fsync the directory too
+        self._dir_dirty = False
+        # bytes in the directory as of the last scan, plus appends since
+        self._pending_bytes: Optional[int] = None
+        # segment path -> time.monotonic() before which it isn't retried
+        self._retry_at: Dict[str, float] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def segments(self) -> List[str]:
+        """Segment paths, oldest first."""
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names]
+
+    def depth(self) -> Dict:
+        """Segments and bytes waiting to be replayed, and the oldest one's age."""
+        segments, size, oldest = 0, 0, None
+        for path in self.segments():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            segments += 1
+            size += stat.st_size
+            oldest = stat.st_mtime if oldest is None else min(oldest, stat.st_mtime)
+        self._pending_bytes = size
+        return {
+            "segments": segments,
+            "bytes": size,
+            "oldest_s": round(time.time() - oldest, 3) if oldest is not None else None,
+        }
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # names sort by creation time, the pid keeps workers apart
+        name = f"{time.time_ns():020d}-{os.getpid()}{SEGMENT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        fd = os.open(path + NEW_SUFFIX, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o600)
+        # locked before it has a name replayers look at, and held while
+        # this worker writes it: a replayer can't take it for an empty,
+        # abandoned segment and unlink it under us
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.rename(path + NEW_SUFFIX, path)
+        self._fd, self._path = fd, path
+        self._pid = os.getpid()
+        self._written = 0
+        self._dir_dirty = True
+
+    def _close_segment(self) -> None:
+        # after a fork the segment (and its lock) stays the parent's, the
+        # child only drops its copy of the fd
+        try:
+            if self._dirty and self._pid == os.getpid():
+                os.fsync(self._fd)
+        finally:
+            os.close(self._fd)
+        self._dirty = False
+        self._fd = self._pid = self._path = None
+
+    def append_rows(self, rows: Iterable[Dict]) -> int:
+        """Spool `rows`; returns the number of bytes written."""
+        data = b"".join(encode_record(row) for row in rows)
+        if not data:
+            return 0
+        if self._pending_bytes is None:
+            self.depth()
+        if self._pending_bytes + len(data) > self.max_bytes:
+            raise SpoolFullError(f"{self._pending_bytes} bytes spooled")
+        with self._lock:
+            if self._fd is not None and (self._pid != os.getpid() or self._written >= self.segment_bytes):
+                self._close_segment()
+            if self._fd is None:
+                self._open_segment()
+            try:
+                self._write_all(data)
+            except OSError:
+                self._abort_append()
+                raise
+            self._written += len(data)
+            self._pending_bytes += len(data)
+            self._dirty = True
+        return len(data)
+
+    def _write_all(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            if not written:
+                raise OSError(errno.ENOSPC, "no bytes written to the spool segment")
+            view = view[written:]
+
+    def _abort_append(self) -> None:
+        # drop whatever part of the failed append made it to the segment,
+        # so later records don't land after a torn one, and move on to a
+        # new segment next time
+        try:
+            os.ftruncate(self._fd, self._written)
+        except OSError:
+            logger.exception("Could not cut a failed append off spool segment %s", self._path)
+        try:
+            self._close_segment()
+        except OSError:
+            logger.exception("Closing spool segment %s after a failed append failed", self._path)
+            self._dirty = False
+            self._fd = self._pid = self._path = None
+
+    def append(self, row: Dict) -> int:
+        return self.append_rows([row])
+
+    async def write(self, rows: Iterable[Dict]) -> int:
+        """
+        Spool `rows` from the event loop. With `fsync_ms` 0 this returns
+        once they're on disk; the fsync runs in a thread.
+        """
+        written = self.append_rows(rows)
+        if written and self.fsync_interval <= 0:
+            await asyncio.to_thread(self.sync, True)
+        return written
+
+    def sync(self, force: bool = False) -> None:
+        """
+        fsync appends since the last sync, without blocking appends.
+        `force` syncs even if another caller's sync already took the
+        dirty flag: that one may still be running, and a caller waiting
+        for its own rows can't return before they're on disk.
+        """
+        with self._lock:
+            if self._fd is None or self._pid != os.getpid() or not (self._dirty or force):
+                return
+            fd = os.dup(self._fd)
+            sync_dir = self._dir_dirty
+            self._dirty = self._dir_dirty = False
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if sync_dir:
+            # the segment's name, not just its contents
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def rotate(self) -> None:
+        """Close the current segment (if it has anything) so it can be replayed."""
+        with self._lock:
+            if self._fd is not None and (self._written or self._pid != os.getpid()):
+                self._close_segment()
+
+    def _read_offset(self, path: str) -> int:
+        try:
+            with open(path + OFFSET_SUFFIX) as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_offset(self, path: str, offset: int) -> None:
+        tmp = f"{path}{OFFSET_SUFFIX}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp, path + OFFSET_SUFFIX)
+
+    def _remove(self, path: str) -> None:
+        for name in (path, path + OFFSET_SUFFIX):
+            try:
+                os.unlink(name)
+            except FileNotFoundError:
+                pass
+
+    def _quarantine(self, path: str, offset: int, size: int) -> None:
+        corrupt = path + CORRUPT_SUFFIX
+        os.rename(path, corrupt)
+        # where the readable records end, everything before is inserted
+        self._write_offset(corrupt, offset)
+        try:
+            os.unlink(path + OFFSET_SUFFIX)
+        except FileNotFoundError:
+            pass
+        logger.error(
+            "Spool segment %s has a torn or corrupt record at offset %s of %s, moved to %s",
+            path, offset, size, corrupt,
+        )
+
+    async def replay_segment(self, path: str) -> int:
+        """
+        Insert a closed segment's rows in batches of `replay_rows` and
+        delete it (or set it aside if it can't be read to its end);
+        returns the rows inserted. A segment being written or replayed
+        elsewhere is skipped. Raises when an insert fails, with the
+        progress so far saved.
+        """
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return 0
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+            if not os.path.exists(path):
+                # replayed and removed while we waited to open it
+                return 0
+            if os.fstat(fd).st_size == 0:
+                self._remove(path)
+                return 0
+            replayed = 0
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as buffer:
+                size = len(buffer)
+                batch, end = [], self._read_offset(path)
+                for end, row in read_records(buffer, end):
+                    batch.append(row)
+                    if len(batch) >= self.replay_rows:
+                        await self.writer(batch)
+                        self._write_offset(path, end)
+                        replayed += len(batch)
+                        batch = []
+                if batch:
+                    await self.writer(batch)
+                    replayed += len(batch)
+            if end < size:
+                self._quarantine(path, end, size)
+            else:
+                self._remove(path)
+            return replayed
+        finally:
+            os.close(fd)
+
+    def _remove_abandoned(self) -> None:
+        # a ".new" file is created and renamed while locked, before any
+        # write: one left behind by a dead worker is empty
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(NEW_SUFFIX)]
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # being created right now
+            else:
+                stat = os.fstat(fd)
+                # a fresh one may be between its creation and its flock
+                abandoned = time.time() - stat.st_mtime > ABANDONED_AFTER_S
+                if abandoned and stat.st_size == 0 and os.path.exists(path):
+                    os.unlink(path)
+            finally:
+                os.close(fd)
+
+    async def replay(self) -> int:
+        """
+        Rotate, then replay every closed segment; returns the rows
+        inserted. A segment whose insert fails is logged and skipped
+        until `retry_s` has passed, the rest are still replayed.
+        """
+        # closing fsyncs, so off the event loop
+        await asyncio.to_thread(self.rotate)
+        self._remove_abandoned()
+        replayed = 0
+        paths = [path for path in self.segments() if path != self._path]
+        self._retry_at = {path: at for path, at in self._retry_at.items() if path in paths}
+        for path in paths:
+            if self._retry_at.get(path, 0) > time.monotonic():
+                continue
+            try:
+                replayed += await self.replay_segment(path)
+            except Exception:
+                logger.exception("Replaying spool segment %s failed, retrying it in %ss", path, self.retry_s)
+                self._retry_at[path] = time.monotonic() + self.retry_s
+            else:
+                self._retry_at.pop(path, None)
+        self.depth()
+        return replayed
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            await asyncio.to_thread(self.sync)
+
+    async def _replay_loop(self):
+        while True:
+            try:
+                replayed = await self.replay()
+            except Exception:
+                logger.exception("Replaying the event spool failed, retrying in %ss", self.retry_s)
+                await asyncio.sleep(self.retry_s)
+                continue
+            if replayed:
+                logger.info("Replayed %s spooled events", replayed)
+            await asyncio.sleep(self.replay_interval)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._replay_loop()))
+        if self.fsync_interval > 0:
+            self._tasks.append(asyncio.create_task(self._sync_loop()))
+
+    async def stop(self):
+        # whatever is left is replayed by the next worker to start
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        with self._lock:
+            if self._fd is not None:
+                self._close_segment()
+
+
+event_spool = EventSpool(EVENTS_SPOOL_DIR) if EVENTS_SPOOL_DIR else None
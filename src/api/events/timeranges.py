@@ -0,0 +1,101 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from .config import EVENTS_DEFAULT_BUCKETS, EVENTS_MAX_BUCKETS
+from .models import get_utc_now
+
+INTERVAL_UNITS = {
+    "second": timedelta(seconds=1),
+    "sec": timedelta(seconds=1),
+    "minute": timedelta(minutes=1),
+    "min": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+# calendar units vary in length, these are only good for sizing windows
+CALENDAR_UNITS = {
+    "month": timedelta(days=30),
+    "mon": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+INTERVAL_RE = re.compile(r"^\s*(\d+)\s*([a-z]+?)s?\s*$")
+
+# time_bucket's default origin for sub-month buckets (a Monday)
+BUCKET_ORIGIN = datetime(2000, 1, 3, tzinfo=timezone.utc)
+
+
+def is_calendar_interval(value: str) -> bool:
+    match = INTERVAL_RE.match(value.lower())
+    return match is not None and match.group(2) in CALENDAR_UNITS
+
+
+def parse_interval(value: str, calendar: bool = False) -> Optional[timedelta]:
+    """
+    Parse simple Postgres intervals such as "1 day" or "15 minutes".
+
+    Calendar units (months, years) only parse with `calendar=True`, and
+    then only approximately. Returns None for anything else.
+    """
+    match = INTERVAL_RE.match(value.lower())
+    if match is None:
+        return None
+    amount, unit = match.groups()
+    units = {**INTERVAL_UNITS, **CALENDAR_UNITS} if calendar else INTERVAL_UNITS
+    if unit not in units:
+        return None
+    return int(amount) * units[unit]
+
+
+def align_to_bucket(ts: datetime, width: timedelta) -> datetime:
+    """Floor `ts` to the start of its time_bucket(width, ...) bucket."""
+    return ts - (ts - BUCKET_ORIGIN) % width
+
+
+def as_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+def resolve_time_window(
+        duration: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        since: Optional[str] = None,
+        default_buckets: int = EVENTS_DEFAULT_BUCKETS,
+        max_buckets: int = EVENTS_MAX_BUCKETS) -> Tuple[datetime, datetime]:
+    """
+    Turn the read_events query parameters into a bounded [start, end) window.
+
+    Without `start`/`since` the window covers the last `default_buckets`
+    buckets, aligned so the first bucket is complete. Raises ValueError
+    for unknown intervals, empty windows or more than `max_buckets` buckets.
+    """
+    width = parse_interval(duration, calendar=True)
+    if not width:
+        raise ValueError(f"Unsupported duration: {duration!r}")
+    if start is not None and since is not None:
+        raise ValueError("Use either start or since, not both")
+    end = as_utc(end) if end is not None else get_utc_now()
+    if since is not None:
+        span = parse_interval(since, calendar=True)
+        if not span:
+            raise ValueError(f"Unsupported since: {since!r}")
+        start = end - span
+    elif start is not None:
+        start = as_utc(start)
+    else:
+        start = end - width * default_buckets
+        if not is_calendar_interval(duration):
+            start = align_to_bucket(start, width)
+    if start >= end:
+        raise ValueError("start must be before end")
+    buckets = (end - start) / width
+    if buckets > max_buckets:
+        raise ValueError(
+            f"Window spans {int(buckets)} buckets of {duration}, max is {max_buckets}"
+        )
+    return start, end
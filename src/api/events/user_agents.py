@@ -0,0 +1,68 @@
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from .config import USER_AGENT_CACHE_SIZE
+
+# first match wins, so more specific tokens come first
+# (android UAs also say "linux", edge/opera UAs also say "chrome", ...)
+OPERATING_SYSTEMS = [
+    ("windows", "Windows"),
+    ("iphone", "iOS"),
+    ("ipad", "iOS"),
+    ("macintosh", "MacOS"),
+    ("android", "Android"),
+    ("cros", "ChromeOS"),
+    ("linux", "Linux"),
+]
+
+BROWSERS = [
+    ("edg/", "Edge"),
+    ("edge/", "Edge"),
+    ("opr/", "Opera"),
+    ("opera", "Opera"),
+    ("samsungbrowser", "Samsung Internet"),
+    ("crios", "Chrome"),
+    ("chrome/", "Chrome"),
+    ("fxios", "Firefox"),
+    ("firefox/", "Firefox"),
+    ("safari/", "Safari"),
+]
+
+BOT_TOKENS = ("bot", "crawler", "spider", "slurp", "curl/", "python-requests")
+
+
+class UserAgentInfo(NamedTuple):
+    operating_system: str
+    browser: str
+    device_type: str
+
+
+def _first_match(ua: str, table) -> Optional[str]:
+    for token, label in table:
+        if token in ua:
+            return label
+    return None
+
+
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
+def classify_user_agent(user_agent: Optional[str]) -> UserAgentInfo:
+    """
+    Map a raw User-Agent header to (operating_system, browser, device_type).
+
+    Runs once per distinct UA string; repeats are served from the LRU cache,
+    which is what makes it cheap enough to call on every ingested event.
+    """
+    ua = (user_agent or "").lower()
+    operating_system = _first_match(ua, OPERATING_SYSTEMS) or "Other"
+    browser = _first_match(ua, BROWSERS) or "Other"
+    if any(token in ua for token in BOT_TOKENS):
+        device_type = "Bot"
+    elif "ipad" in ua or "tablet" in ua or (operating_system == "Android" and "mobile" not in ua):
+        device_type = "Tablet"
+    elif "mobi" in ua or operating_system == "iOS":
+        device_type = "Mobile"
+    elif operating_system != "Other":
+        device_type = "Desktop"
+    else:
+        device_type = "Other"
+    return UserAgentInfo(operating_system, browser, device_type)
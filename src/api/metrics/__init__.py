@@ -0,0 +1,5 @@
+from .middleware import MetricsMiddleware
+from .registry import CONTENT_TYPE, REGISTRY
+from .sql import instrument_engine
+
+__all__ = ['CONTENT_TYPE', 'REGISTRY', 'MetricsMiddleware', 'instrument_engine']
@@ -0,0 +1,80 @@
+import time
+
+from .registry import REGISTRY, SIZE_BUCKETS
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ("method", "route"),
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total",
+    "HTTP requests handled.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled.",
+)
+HTTP_RESPONSE_SIZE = REGISTRY.histogram(
+    "http_response_size_bytes",
+    "Size of HTTP response bodies.",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware) recording latency,
+    status, response size and in-flight requests per route template,
+    e.g. "/api/events/{event_id}" rather than every event id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = HTTP_REQUESTS_IN_FLIGHT.labels()
+        # (method, route, status) -> metric children, one lookup per request
+        self._children = {}
+
+    def _children_for(self, key):
+        children = self._children.get(key)
+        if children is None:
+            method, path, status = key
+            children = self._children[key] = (
+                HTTP_REQUEST_DURATION.labels(method, path),
+                HTTP_RESPONSE_SIZE.labels(method, path),
+                HTTP_REQUESTS.labels(method, path, str(status)),
+            )
+        return children
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            duration, response_size, requests = self._children_for(
+                (scope["method"], path, status)
+            )
+            duration.observe(elapsed)
+            response_size.observe(size)
+            requests.inc()
@@ -0,0 +1,46 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .registry import REGISTRY
+
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "Time spent executing SQL statements.",
+    ("engine", "statement"),
+)
+DB_QUERY_ERRORS = REGISTRY.counter(
+    "db_query_errors_total",
+    "SQL statements that raised an error.",
+    ("engine", "statement"),
+)
+
+STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "CREATE", "ALTER", "COPY"}
+
+
+def statement_type(statement: str) -> str:
+    words = statement.split(None, 1)
+    keyword = words[0].upper() if words else ""
+    return keyword if keyword in STATEMENT_TYPES else "OTHER"
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """
+    Time every statement on `engine` (for async engines pass
+    `async_engine.sync_engine`) into db_query_duration_seconds.
+    """
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        DB_QUERY_DURATION.labels(name, statement_type(statement)).observe(elapsed)
+
+    def handle_error(exception_context):
+        statement = exception_context.statement or ""
+        DB_QUERY_ERRORS.labels(name, statement_type(statement)).inc()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
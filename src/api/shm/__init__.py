@@ -0,0 +1,24 @@
+import os
+from typing import Optional
+
+from .config import SHM_DIR, SHM_MAX_WORKERS
+from .store import SharedCounters, SharedMemoryFullError, SharedTable
+
+
+def shared_counters(name: str, size: int) -> Optional[SharedCounters]:
+    """Host-wide counters called `name`, or None when SHM_DIR is unset."""
+    if not SHM_DIR:
+        return None
+    return SharedCounters(os.path.join(SHM_DIR, f"{name}.shm"), size, workers=SHM_MAX_WORKERS)
+
+
+def shared_table(name: str, capacity: int, key_size: int = 120) -> Optional[SharedTable]:
+    """Host-wide hash table called `name`, or None when SHM_DIR is unset."""
+    if not SHM_DIR:
+        return None
+    return SharedTable(os.path.join(SHM_DIR, f"{name}.shm"), capacity, key_size=key_size)
+
+
+__all__ = [
+    'SharedCounters', 'SharedMemoryFullError', 'SharedTable', 'shared_counters', 'shared_table',
+]
@@ -0,0 +1,9 @@
+from decouple import config as decouple_config
+
+
+# directory (ideally tmpfs, e.g. /dev/shm/analytics-api) holding the
+# shared-memory files every worker on the host attaches to; empty keeps
+# all state per process
+SHM_DIR = decouple_config("SHM_DIR", default="")
+# most worker processes that can attach to one SharedCounters file
+SHM_MAX_WORKERS = decouple_config("SHM_MAX_WORKERS", cast=int, default=64)
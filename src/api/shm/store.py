@@ -0,0 +1,273 @@
+"""
+Counters and a hash table in shared memory, for every worker on a host.
+
+Each structure is a fixed-layout file (under SHM_DIR, a tmpfs such as
+/dev/shm) that every gunicorn worker mmaps on first use, so workers
+read and write the same pages with no network round trip. Files are
+attached lazily and again after a fork, and a file whose header doesn't
+match the requested layout is reinitialised.
+
+Cross-process locking uses fcntl byte-range locks on a companion
+".lock" file; those don't exclude threads of one process, so each lock
+is paired with a threading.Lock.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+MAGIC = b"LWSHM001"
+# magic, kind, then up to six layout/state words
+HEADER = struct.Struct("<8s8s6q")
+HEADER_SIZE = 64
+
+
+class SharedMemoryFullError(Exception):
+    """Raised when every worker row of a SharedCounters file is taken"""
+
+
+class SharedFile:
+    kind = b""
+
+    def __init__(self, path: str, size: int, layout: Tuple[int, ...]):
+        self.path = path
+        self.size = HEADER_SIZE + size
+        self.layout = layout
+        self._pid: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._lock_fd: Optional[int] = None
+        self._attach_lock = threading.Lock()
+
+    def _attach(self) -> mmap.mmap:
+        if self._pid == os.getpid():
+            return self._map
+        with self._attach_lock:
+            if self._pid != os.getpid():
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                # fcntl locks and mapped fds aren't worth sharing with a parent
+                self._lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    with self._file_lock(0):
+                        if os.fstat(fd).st_size < self.size:
+                            os.ftruncate(fd, self.size)
+                        self._map = mmap.mmap(fd, self.size)
+                        self._check_header()
+                finally:
+                    os.close(fd)
+                self._pid = os.getpid()
+                self._attached()
+        return self._map
+
+    def _check_header(self) -> None:
+        magic, kind, *words = HEADER.unpack_from(self._map, 0)
+        layout = tuple(words[:len(self.layout)])
+        if magic != MAGIC or kind.rstrip(b"\0") != self.kind or layout != self.layout:
+            self._map[:] = bytes(self.size)
+            words = list(self.layout) + [0] * (6 - len(self.layout))
+            HEADER.pack_into(self._map, 0, MAGIC, self.kind, *words)
+
+    def _attached(self) -> None:
+        pass
+
+    @contextmanager
+    def _file_lock(self, offset: int, blocking: bool = True):
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        fcntl.lockf(self._lock_fd, flags, 1, offset)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, offset)
+
+
+class SharedCounters(SharedFile):
+    """
+    `size` int64 counters summed over up to `workers` processes.
+
+    Every process claims a row of its own (an fcntl lock it holds until
+    exit) and only ever writes that row, so increments take no
+    cross-process lock; reads sum a column. A row freed by a dead worker
+    keeps its counts and is picked up by the next one.
+    """
+    kind = b"counters"
+
+    def __init__(self, path: str, size: int, workers: int = 64):
+        super().__init__(path, workers * size * 8, (size, workers))
+        self.counters = size
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._view = None
+        self._row = 0
+
+    def _attached(self) -> None:
+        self._view = memoryview(self._map)[HEADER_SIZE:].cast("q")
+        for row in range(self.workers):
+            try:
+                # byte 0 guards the header, rows start at 1
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, row + 1)
+            except OSError:
+                continue
+            self._row = row * self.counters
+            return
+        self._pid = None
+        raise SharedMemoryFullError(f"All {self.workers} rows of {self.path} are in use")
+
+    def add(self, index: int, amount: int = 1) -> None:
+        self._attach()
+        with self._lock:
+            self._view[self._row + index] += amount
+
+    def value(self, index: int) -> int:
+        self._attach()
+        return sum(self._view[index::self.counters])
+
+    def values(self) -> List[int]:
+        self._attach()
+        return [sum(self._view[index::self.counters]) for index in range(self.counters)]
+
+    def attached(self) -> int:
+        """
+        Live processes holding a row, this one included. Probes the
+        other rows' locks, so keep one instance per file per process
+        (fcntl locks are per process: probing a row another instance
+        here holds would release it).
+        """
+        self._attach()
+        own = self._row // self.counters
+        count = 1
+        for row in range(self.workers):
+            if row == own:
+                continue
+            try:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, row + 1)
+            except OSError:
+                count += 1
+            else:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, row + 1)
+        return count
+
+
+def key_hash(key: bytes) -> int:
+    # stable across processes, unlike hash(); 0 marks an empty entry
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+
+
+class SharedTable(SharedFile):
+    """
+    Fixed-capacity str -> int64 hash table, split into `stripes`.
+
+    A key hashes to one stripe and probes linearly inside it, so a
+    stripe lock covers every write that can touch its entries. Reads
+    take no lock: an entry's hash is written last, after its key and
+    value. Keys longer than `key_size` bytes or landing in a full stripe
+    can't be stored, and writes return None so callers can fall back to
+    process-local state. There is no delete; `epoch` clears the whole
+    table instead, for per-bucket aggregates.
+    """
+    kind = b"table"
+
+    def __init__(self, path: str, capacity: int = 4096, stripes: int = 64, key_size: int = 120):
+        if capacity % stripes:
+            raise ValueError(f"capacity {capacity} isn't a multiple of {stripes} stripes")
+        self.entry = struct.Struct(f"<QqI{key_size}s")
+        self.entry_size = -(-self.entry.size // 8) * 8
+        super().__init__(path, capacity * self.entry_size, (capacity, stripes, key_size))
+        self.capacity = capacity
+        self.stripes = stripes
+        self.key_size = key_size
+        self.per_stripe = capacity // stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    # epoch lives in the header word after the layout
+    EPOCH_OFFSET = HEADER_SIZE - 8 * 3
+
+    @property
+    def epoch(self) -> int:
+        return struct.unpack_from("<q", self._attach(), self.EPOCH_OFFSET)[0]
+
+    @contextmanager
+    def _stripe(self, stripe: int):
+        with self._locks[stripe], self._file_lock(1 + stripe):
+            yield
+
+    def _offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * self.entry_size
+
+    def _find(self, key: bytes, hashed: int, insert: bool = False) -> Optional[int]:
+        """Offset of `key`'s entry, or of the empty entry it would take."""
+        stripe = hashed % self.stripes
+        start = (hashed // self.stripes) % self.per_stripe
+        table = self._map
+        for probe in range(self.per_stripe):
+            offset = self._offset(stripe * self.per_stripe + (start + probe) % self.per_stripe)
+            entry_hash, _, length, entry_key = self.entry.unpack_from(table, offset)
+            if entry_hash == 0:
+                return offset if insert else None
+            if entry_hash == hashed and entry_key[:length] == key:
+                return offset
+        return None
+
+    def get(self, key: str) -> Optional[int]:
+        encoded = key.encode()
+        if len(encoded) > self.key_size:
+            return None
+        self._attach()
+        offset = self._find(encoded, key_hash(encoded))
+        if offset is None:
+            return None
+        return struct.unpack_from("<q", self._map, offset + 8)[0]
+
+    def _write(self, key: str, value: int, add: bool, epoch: Optional[int]) -> Optional[int]:
+        encoded = key.encode()
+        if len(encoded) > self.key_size:
+            return None
+        self._attach()
+        if epoch is not None and epoch > self.epoch:
+            self.advance(epoch)
+        hashed = key_hash(encoded)
+        with self._stripe(hashed % self.stripes):
+            if epoch is not None and epoch != self.epoch:
+                return None  # a newer epoch started, this write is stale
+            offset = self._find(encoded, hashed, insert=True)
+            if offset is None:
+                return None
+            entry_hash, current, _, _ = self.entry.unpack_from(self._map, offset)
+            if entry_hash == 0:
+                self.entry.pack_into(self._map, offset, 0, value, len(encoded), encoded)
+                struct.pack_into("<Q", self._map, offset, hashed)
+                return value
+            value = current + value if add else value
+            struct.pack_into("<q", self._map, offset + 8, value)
+            return value
+
+    def set(self, key: str, value: int, epoch: Optional[int] = None) -> Optional[int]:
+        return self._write(key, value, add=False, epoch=epoch)
+
+    def add(self, key: str, amount: int = 1, epoch: Optional[int] = None) -> Optional[int]:
+        return self._write(key, amount, add=True, epoch=epoch)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        table = self._attach()
+        for slot in range(self.capacity):
+            entry_hash, value, length, key = self.entry.unpack_from(table, self._offset(slot))
+            if entry_hash:
+                yield key[:length].decode(), value
+
+    def advance(self, epoch: int) -> None:
+        """Empty the table and move it to `epoch`, if that's newer."""
+        self._attach()
+        for stripe in range(self.stripes):
+            self._locks[stripe].acquire()
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, 1 + stripe)
+        try:
+            if epoch > self.epoch:
+                self._map[HEADER_SIZE:self.size] = bytes(self.size - HEADER_SIZE)
+                struct.pack_into("<q", self._map, self.EPOCH_OFFSET, epoch)
+        finally:
+            for stripe in reversed(range(self.stripes)):
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, 1 + stripe)
+                self._locks[stripe].release()
@@ -1,20 +1,45 @@
+import hmac
 from contextlib import asynccontextmanager
 from typing import Union
 
-from fastapi import FastAPI
-from src.api.db.session import init_db
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import Response
+from src.api.db.config import ADMIN_TOKEN
+from src.api.db.pool import pool_status, update_pool_metrics
+from src.api.db.replicas import replicas
+from src.api.db.session import sync_engines
+from src.api.db.slowlog import slow_query_log
 from src.api.events import router as event_router
+from src.api.events.buffer import event_buffer
+from src.api.events.config import EVENTS_WRITE_BEHIND
+from src.api.events.live import live_counts
+from src.api.events.recent import recent_counters
+from src.api.events.spool import event_spool
+from src.api.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # before app startup up
-    init_db()
+    # before app startup up (the schema is set up by src.api.db.migrate)
+    # recent-traffic counters for read_events (when enabled), cold: no query
+    await recent_counters.start()
+    await replicas.start()
+    if EVENTS_WRITE_BEHIND:
+        await event_buffer.start()
+    if event_spool is not None:
+        await event_spool.start()
     yield
     # clean up
+    await live_counts.stop()
+    await replicas.stop()
+    if EVENTS_WRITE_BEHIND:
+        await event_buffer.stop()
+    if event_spool is not None:
+        await event_spool.stop()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 app.include_router(event_router, prefix='/api/events')
 # /api/events
 
@@ -31,4 +56,36 @@ def read_item(item_id: int, q: Union[str, None] = None):
 
 @app.get("/healthz")
 def read_api_health():
-    return {"status": "ok"}
\ No newline at end of file
+    if event_spool is None:
+        return {"status": "ok"}
+    # events accepted but not in the database yet
+    return {"status": "ok", "spool": event_spool.depth()}
+
+
+@app.get("/metrics")
+def read_metrics():
+    # only engines in use: a scrape never creates one (or needs DATABASE_URL)
+    update_pool_metrics({**sync_engines(), **replicas.sync_engines()})
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/healthz/pool")
+def read_pool_health():
+    engines = {**sync_engines(), **replicas.sync_engines()}
+    return {name: pool_status(engine) for name, engine in engines.items()}
+
+
+@app.get("/admin/slow-queries")
+def read_slow_queries(limit: int = 50, x_admin_token: str = Header(default="")):
+    # entries carry bound parameters (IPs, session ids): without an
+    # ADMIN_TOKEN configured the endpoint doesn't exist
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return {
+        "enabled": slow_query_log.enabled,
+        "threshold_ms": slow_query_log.threshold_ms,
+        "explain_sample": slow_query_log.explain_sample,
+        "queries": slow_query_log.recent(max(limit, 0)),
+    }
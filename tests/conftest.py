@@ -3,8 +3,9 @@ Pytest configuration and fixtures for API testing
 """
 import sys
 import os
+from datetime import datetime, timezone
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 
 # Add the project root directory to the Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -40,8 +41,18 @@ def patch_init_db():
 def mock_db():
     """
     Create a mock database session
+
+    The routes use an AsyncSession, so the methods they await are AsyncMocks
+    that resolve to plain MagicMock results.
     """
-    return MagicMock()
+    db = MagicMock()
+    db.exec = AsyncMock(return_value=MagicMock())
+    # the (id, time) an INSERT ... RETURNING hands back
+    db.exec.return_value.one.return_value = (1, datetime(2025, 1, 1, tzinfo=timezone.utc))
+    db.commit = AsyncMock()
+    db.refresh = AsyncMock()
+    db.rollback = AsyncMock()
+    return db
 
 
 # Add a test_db fixture that's used in the tests
@@ -82,10 +93,11 @@ def test_client(override_get_session):
     Create a test client for the FastAPI application with mocked dependencies
     """
     from src.main import app
-    from src.api.db.session import get_session
+    from src.api.db.session import get_async_session, get_session
     
-    # Override the get_session dependency with our mock
+    # Override the session dependencies with our mock
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_async_session] = override_get_session
     
     with TestClient(app) as client:
         yield client
@@ -0,0 +1,98 @@
+"""
+Tests for the load-testing suite in benchmarks/
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.events import EventFactory
+from benchmarks.loadgen import run_load
+from benchmarks.run import check_thresholds
+from benchmarks.scenarios import SCENARIOS, SkipScenario
+from src.api.events.models import EventCreateSchema
+from src.api.events.spool import EventSpool
+
+
+def test_event_factory_is_seeded():
+    """
+    Test the same seed produces the same valid events
+    """
+    first = EventFactory(seed=7).events(20)
+
+    assert first == EventFactory(seed=7).events(20)
+    assert first != EventFactory(seed=8).events(20)
+    for event in first:
+        EventCreateSchema.model_validate(event)
+
+
+def test_run_load_counts_errors():
+    """
+    Test failures are counted and latency percentiles are reported
+    """
+    async def request(number):
+        if number % 4 == 0:
+            raise RuntimeError("boom")
+        return 2
+
+    result = asyncio.run(run_load(request, total=100, concurrency=8))
+
+    assert result["requests"] == 100
+    assert result["errors"] == 25
+    assert result["error_rate"] == 0.25
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+
+def test_check_thresholds():
+    """
+    Test _ms and error_rate limits are maxima, the rest minima
+    """
+    results = {"ingest_batch": {"items_per_sec": 900.0, "p99_ms": 120.0, "error_rate": 0.0}}
+    thresholds = {
+        "ingest_batch": {"items_per_sec": 1000, "p99_ms": 100, "error_rate": 0},
+        "get_event": {"p99_ms": 1},
+    }
+
+    assert check_thresholds(results, thresholds) == [
+        "ingest_batch: items_per_sec 900.0 < 1000",
+        "ingest_batch: p99_ms 120.0 > 100",
+    ]
+
+
+def test_ingest_scenario_against_app(test_client):
+    """
+    Test a scenario end to end against the app (mocked database)
+    """
+    async def run():
+        transport = httpx.ASGITransport(app=test_client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            request = await SCENARIOS["ingest_single"].prepare(client, EventFactory(), {"batch_size": 10})
+            return await run_load(request, total=20, concurrency=4)
+
+    result = asyncio.run(run())
+
+    assert result["requests"] == 20
+    assert result["errors"] == 0
+
+
+def test_scenarios_accept_spooled_ingests(test_client, monkeypatch, tmp_path):
+    """
+    Test ingest scenarios count 202s and get_event skips when the seeded
+    events have no ids yet (spool mode)
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=0)
+    monkeypatch.setattr("src.api.events.routing.event_spool", spool)
+
+    async def run():
+        transport = httpx.ASGITransport(app=test_client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            request = await SCENARIOS["ingest_batch"].prepare(client, EventFactory(), {"batch_size": 10})
+            result = await run_load(request, total=4, concurrency=2)
+            with pytest.raises(SkipScenario, match="no event ids"):
+                await SCENARIOS["get_event"].prepare(client, EventFactory(), {"batch_size": 10})
+            return result
+
+    result = asyncio.run(run())
+
+    assert result["requests"] == 4
+    assert result["errors"] == 0
@@ -0,0 +1,89 @@
+"""
+Tests for the idempotent hypertable compression sync
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from src.api.db import compression
+from src.api.db.compression import declared_settings, parse_orderby, sync_compression
+from src.api.events.models import EventModel
+
+
+def setting(attname, segmentby=None, orderby=None, asc=None):
+    return SimpleNamespace(
+        attname=attname, segmentby_column_index=segmentby,
+        orderby_column_index=orderby, orderby_asc=asc,
+    )
+
+
+def fake_session(settings, policy_up_to_date):
+    """Answers the settings and policy lookups, records everything else"""
+    session = MagicMock()
+    executed = []
+
+    def execute(statement, params=None):
+        result = MagicMock()
+        if statement is compression.CURRENT_SETTINGS_SQL:
+            result.all.return_value = settings
+        elif statement is compression.CURRENT_POLICY_SQL:
+            result.scalar.return_value = policy_up_to_date
+        else:
+            executed.append(str(statement))
+        return result
+
+    session.execute.side_effect = execute
+    return session, executed
+
+
+def test_event_model_settings():
+    """
+    Test EventModel segments by page and orders by time
+    """
+    assert declared_settings(EventModel) == (["page_id"], [("time", False)])
+    assert parse_orderby("time DESC, page_id") == [("time", False), ("page_id", True)]
+
+
+def test_first_sync_enables_compression_and_policy():
+    """
+    Test a fresh hypertable gets the ALTER TABLE and the policy
+    """
+    session, executed = fake_session(settings=[], policy_up_to_date=None)
+
+    sync_compression(session, EventModel)
+
+    assert len(executed) == 2
+    assert "timescaledb.compress" in executed[0]
+    assert "add_compression_policy" in executed[1]
+    session.commit.assert_called_once()
+
+
+def test_resync_is_a_no_op():
+    """
+    Test matching settings and policy are left alone
+    """
+    settings = [
+        setting("page_id", segmentby=1),
+        setting("time", orderby=1, asc=False),
+    ]
+    session, executed = fake_session(settings, policy_up_to_date=True)
+
+    sync_compression(session, EventModel)
+
+    assert executed == []
+
+
+def test_changed_interval_replaces_policy():
+    """
+    Test a different compress_after removes the old policy first
+    """
+    settings = [
+        setting("page_id", segmentby=1),
+        setting("time", orderby=1, asc=False),
+    ]
+    session, executed = fake_session(settings, policy_up_to_date=False)
+
+    sync_compression(session, EventModel)
+
+    assert len(executed) == 2
+    assert "remove_compression_policy" in executed[0]
+    assert "add_compression_policy" in executed[1]
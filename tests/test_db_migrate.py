@@ -0,0 +1,31 @@
+"""
+Tests for the schema migration entry point
+"""
+import pytest
+import sqlalchemy
+from sqlalchemy import text
+
+from src.api.db.migrate import LegacySchemaError, migrate, missing_event_columns
+
+
+def test_new_database_has_nothing_missing():
+    """
+    Test a database without an events table isn't treated as legacy
+    """
+    assert missing_event_columns(sqlalchemy.create_engine("sqlite://")) == []
+
+
+def test_legacy_events_table_stops_migrate():
+    """
+    Test migrate asks for the backfill before touching an old table
+    """
+    engine = sqlalchemy.create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE eventmodel (id INTEGER, time TIMESTAMP, page VARCHAR, "
+            "user_agent VARCHAR, referrer VARCHAR, session_id VARCHAR, duration INTEGER)"
+        ))
+
+    assert "page_id" in missing_event_columns(engine)
+    with pytest.raises(LegacySchemaError, match="backfill"):
+        migrate(engine)
@@ -0,0 +1,72 @@
+"""
+Tests for the instrumented connection pool and /healthz/pool
+"""
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.api.db import session
+from src.api.db.pool import InstrumentedQueuePool
+
+
+@pytest.fixture
+def pool():
+    """A one-connection pool backed by SQLite"""
+    return InstrumentedQueuePool(
+        lambda: sqlite3.connect(":memory:", check_same_thread=False),
+        pool_size=1,
+        max_overflow=0,
+        timeout=0.05,
+    )
+
+
+def test_checkouts_are_timed(pool):
+    """
+    Test successful checkouts are counted
+    """
+    conn = pool.connect()
+    conn.close()
+    conn = pool.connect()
+    conn.close()
+
+    stats = pool.wait_stats
+    assert stats.checkouts == 2
+    assert stats.waiting == 0
+    assert stats.wait_seconds_total >= 0
+
+
+def test_pool_timeouts_are_counted(pool):
+    """
+    Test a starved pool records the timeout and the time spent waiting
+    """
+    held = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    held.close()
+
+    stats = pool.wait_stats
+    assert stats.timeouts == 1
+    assert stats.waiting == 0
+    assert stats.wait_seconds_max >= 0.05
+
+
+def test_pool_health_endpoint(test_client, monkeypatch):
+    """
+    Test /healthz/pool reports the engines in use, without creating any
+    """
+    monkeypatch.setattr(session, "_engines", {})
+    monkeypatch.setattr(session, "DATABASE_URL", "")
+
+    response = test_client.get("/healthz/pool")
+
+    assert response.status_code == 200
+    assert response.json() == {}
+    assert session._engines == {}
+
+    monkeypatch.setattr(session, "DATABASE_URL", "postgresql+psycopg://user:pw@localhost/db")
+    session.get_engine()
+    session.get_async_engine()
+    data = test_client.get("/healthz/pool").json()
+    for name in ("sync", "async"):
+        assert {"size", "checked_out", "overflow", "waiting", "timeouts"} <= set(data[name])
@@ -0,0 +1,121 @@
+"""
+Tests for read-replica routing
+"""
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.requests import Request
+
+from src.api.db import replicas as replicas_module
+from src.api.db.replicas import (
+    READ_PRIMARY_COOKIE,
+    READ_YOUR_WRITES_HEADER,
+    ReplicaSet,
+    get_read_session,
+    reads_own_writes,
+)
+
+
+class FakeEngine:
+    def __init__(self, url, name, reachable=True):
+        self.url = url
+        self.name = name
+        self.reachable = reachable
+
+
+def make_request(headers=None):
+    raw = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    return Request({"type": "http", "headers": raw})
+
+
+def read_session(request, primary):
+    async def first():
+        dependency = get_read_session(request, primary)
+        session = await dependency.__anext__()
+        await dependency.aclose()
+        return session
+
+    return asyncio.run(first())
+
+
+def test_candidates_rotate_and_skip_down_replicas():
+    """
+    Test replicas are handed out in turn and a down replica is skipped
+    """
+    replica_set = ReplicaSet(["a", "b", "c"], engine_factory=FakeEngine)
+
+    assert replica_set.candidates() == [0, 1, 2]
+    assert replica_set.candidates() == [1, 2, 0]
+
+    replica_set.mark_down(2)
+    assert replica_set.candidates() == [0, 1]
+
+    replica_set.mark_up(2)
+    assert replica_set.candidates() == [0, 1, 2]
+
+
+def test_down_replica_is_retried_after_retry_window():
+    """
+    Test a replica marked down comes back once retry_s has passed
+    """
+    replica_set = ReplicaSet(["a"], retry_s=0, engine_factory=FakeEngine)
+
+    replica_set.mark_down(0)
+
+    assert replica_set.candidates() == [0]
+
+
+def test_reads_own_writes_header_and_cookie():
+    """
+    Test the header and an unexpired cookie send reads to the primary
+    """
+    future = str(time.time() + 60)
+    past = str(time.time() - 60)
+
+    assert not reads_own_writes(make_request())
+    assert reads_own_writes(make_request({READ_YOUR_WRITES_HEADER: "1"}))
+    assert not reads_own_writes(make_request({READ_YOUR_WRITES_HEADER: "false"}))
+    assert reads_own_writes(make_request({"cookie": f"{READ_PRIMARY_COOKIE}={future}"}))
+    assert not reads_own_writes(make_request({"cookie": f"{READ_PRIMARY_COOKIE}={past}"}))
+    assert not reads_own_writes(make_request({"cookie": f"{READ_PRIMARY_COOKIE}=junk"}))
+
+
+def test_read_session_without_replicas_uses_primary(monkeypatch):
+    """
+    Test reads go to the primary session when no replica is configured
+    """
+    monkeypatch.setattr(replicas_module, "replicas", ReplicaSet([]))
+    primary = object()
+
+    assert read_session(make_request(), primary) is primary
+
+
+def test_read_session_falls_back_to_primary(monkeypatch):
+    """
+    Test an unreachable replica is marked down and the primary is used
+    """
+    # nothing listens on port 1, so connecting is refused straight away
+    replica_set = ReplicaSet(
+        ["postgresql+psycopg://user:pw@127.0.0.1:1/db"],
+        engine_factory=lambda url, name: create_async_engine(url),
+    )
+    monkeypatch.setattr(replicas_module, "replicas", replica_set)
+    primary = object()
+
+    assert read_session(make_request(), primary) is primary
+    assert replica_set.candidates() == []
+
+
+def test_read_your_writes_skips_replicas(monkeypatch):
+    """
+    Test a request asking to read its own writes never touches a replica
+    """
+    def no_engine(url, name):
+        raise AssertionError("replica engine created")
+
+    monkeypatch.setattr(replicas_module, "replicas", ReplicaSet(["a"], engine_factory=no_engine))
+    primary = object()
+
+    request = make_request({READ_YOUR_WRITES_HEADER: "1"})
+    assert read_session(request, primary) is primary
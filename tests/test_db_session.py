@@ -0,0 +1,75 @@
+"""
+Tests for lazy engine creation
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.api.db import session
+
+
+def test_app_imports_without_database_url():
+    """
+    Test importing the app creates no engine and needs no DATABASE_URL
+    """
+    env = {key: value for key, value in os.environ.items() if key != "DATABASE_URL"}
+    code = "import src.main, src.api.db.session as s; assert not s._engines"
+
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parent.parent, env=env, capture_output=True, text=True
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_engines_are_created_once(monkeypatch):
+    """
+    Test each engine is built on first use and then reused
+    """
+    monkeypatch.setattr(session, "_engines", {})
+    monkeypatch.setattr(session, "DATABASE_URL", "postgresql+psycopg://user:pw@localhost/db")
+
+    engine = session.get_engine()
+
+    assert session.get_engine() is engine
+    assert session.engine is engine
+    assert session.get_async_engine() is session.get_async_engine()
+
+
+def test_missing_database_url_fails_on_use(monkeypatch):
+    """
+    Test the DATABASE_URL check happens when an engine is first needed
+    """
+    monkeypatch.setattr(session, "_engines", {})
+    monkeypatch.setattr(session, "DATABASE_URL", "")
+
+    with pytest.raises(NotImplementedError):
+        session.get_engine()
+
+
+def test_statement_timeout_skips_maintenance_engine(monkeypatch):
+    """
+    Test the request timeout applies to the async engines only, so
+    migrate and backfill aren't cut off by it
+    """
+    monkeypatch.setattr(session, "_engines", {})
+    monkeypatch.setattr(session, "DATABASE_URL", "postgresql+psycopg://user:pw@localhost/db")
+    monkeypatch.setattr(session, "DB_STATEMENT_TIMEOUT_MS", 2000)
+    monkeypatch.setattr(session, "DB_MAINTENANCE_STATEMENT_TIMEOUT_MS", 0)
+
+    created = {}
+    real_create_engine = session.sqlalchemy.create_engine
+
+    def create_engine(url, **kwargs):
+        created.update(kwargs)
+        return real_create_engine(url, **kwargs)
+
+    monkeypatch.setattr(session.sqlalchemy, "create_engine", create_engine)
+    session.get_engine()
+
+    assert "statement_timeout=2000" in session.engine_kwargs()["connect_args"]["options"]
+    assert "statement_timeout" not in created["connect_args"]["options"]
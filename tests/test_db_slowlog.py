@@ -0,0 +1,149 @@
+"""
+Tests for the slow-query log
+"""
+import time
+
+import sqlalchemy
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import src.main
+from src.api.db.slowlog import SlowQueryLog
+from src.main import app
+
+
+def sqlite_engine():
+    return sqlalchemy.create_engine("sqlite://")
+
+
+def test_disabled_log_installs_no_hook():
+    """
+    Test a zero threshold leaves the engine untouched
+    """
+    engine = sqlite_engine()
+    log = SlowQueryLog(threshold_ms=0)
+
+    log.instrument(engine, "sync")
+
+    assert not engine.dispatch.after_cursor_execute
+
+
+def test_slow_statements_are_recorded_with_parameters():
+    """
+    Test statements over the threshold land in the ring, newest first
+    """
+    engine = sqlite_engine()
+    log = SlowQueryLog(threshold_ms=1e-9, explain_sample=0, size=2)
+    log.instrument(engine, "sync")
+
+    with engine.connect() as conn:
+        for value in (1, 2, 3):
+            conn.execute(text("SELECT :value"), {"value": value})
+
+    queries = log.recent()
+    assert len(queries) == 2
+    assert [query["parameters"] for query in queries] == [(3,), (2,)]
+    assert queries[0]["engine"] == "sync"
+    assert queries[0]["duration_ms"] >= 0
+    assert queries[0]["explain"] is None
+
+
+def test_fast_statements_are_not_recorded():
+    """
+    Test statements under the threshold are skipped
+    """
+    engine = sqlite_engine()
+    log = SlowQueryLog(threshold_ms=60_000)
+    log.instrument(engine, "sync")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert log.recent() == []
+
+
+def test_sampled_explain_runs_in_background_and_is_not_logged():
+    """
+    Test a sampled SELECT gets an EXPLAIN attempt, whose failure is kept
+    on the entry, and the EXPLAIN itself isn't logged
+    """
+    engine = sqlite_engine()
+    log = SlowQueryLog(threshold_ms=1e-9, explain_sample=1, sample=lambda: 0.0)
+    log.instrument(engine, "sync")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    deadline = time.monotonic() + 5
+    while log._explaining and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    queries = log.recent()
+    # sqlite has no EXPLAIN (ANALYZE, BUFFERS)
+    assert len(queries) == 1
+    assert queries[0]["explain_error"]
+    assert not log._explaining
+
+
+def test_only_single_selects_are_explained():
+    """
+    Test writes and executemany batches are never re-run
+    """
+    log = SlowQueryLog(threshold_ms=1, explain_sample=1, sample=lambda: 0.0)
+
+    insert = log.record("sync", "INSERT INTO t VALUES (?)", (1,), 5)
+    batch = log.record("sync", "SELECT ?", [(1,), (2,)], 5, executemany=True)
+
+    assert not log.should_explain(insert)
+    assert not log.should_explain(batch)
+    assert batch.executemany_rows == 2
+    assert batch.parameters == (1,)
+
+
+def test_one_explain_at_a_time():
+    """
+    Test a second sample is skipped while an EXPLAIN is running
+    """
+    log = SlowQueryLog(threshold_ms=1, explain_sample=1, sample=lambda: 0.0)
+    first = log.record("sync", "SELECT 1", (), 5)
+    second = log.record("sync", "SELECT 2", (), 5)
+
+    assert log.should_explain(first)
+    assert not log.should_explain(second)
+    log._done_explaining(first, [("Result",)])
+    assert first.explain == "Result"
+    assert log.should_explain(second)
+
+
+def test_admin_endpoint(monkeypatch):
+    """
+    Test the endpoint lists entries and checks ADMIN_TOKEN when set
+    """
+    log = SlowQueryLog(threshold_ms=100)
+    log.record("async", "SELECT 1", {"p": 1}, 150)
+    monkeypatch.setattr(src.main, "slow_query_log", log)
+    monkeypatch.setattr(src.main, "ADMIN_TOKEN", "secret")
+    client = TestClient(app)
+
+    assert client.get("/admin/slow-queries").status_code == 403
+
+    response = client.get("/admin/slow-queries", headers={"x-admin-token": "secret"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["enabled"] is True
+    assert body["queries"][0]["statement"] == "SELECT 1"
+    assert body["queries"][0]["parameters"] == {"p": 1}
+
+
+def test_admin_endpoint_off_without_token(monkeypatch):
+    """
+    Test the entries aren't served at all when no ADMIN_TOKEN is set
+    """
+    log = SlowQueryLog(threshold_ms=100)
+    log.record("async", "SELECT 1", {"ip_address": "10.0.0.1"}, 150)
+    monkeypatch.setattr(src.main, "slow_query_log", log)
+    monkeypatch.setattr(src.main, "ADMIN_TOKEN", "")
+    client = TestClient(app)
+
+    assert client.get("/admin/slow-queries").status_code == 404
+    assert client.get("/admin/slow-queries", headers={"x-admin-token": ""}).status_code == 404
@@ -0,0 +1,167 @@
+"""
+Tests for event ingestion (POST /api/events/ and POST /api/events/batch)
+"""
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api.events.ingest import parse_batch_body, validate_batch
+
+
+@pytest.fixture
+def batch_db(mock_db):
+    """Mock session whose bulk insert hands back sequential ids"""
+    def exec_side_effect(statement, params=None, **kwargs):
+        result = MagicMock()
+        # dimension upserts return no rows, the event insert returns ids
+        result.all.return_value = []
+        result.scalars.return_value.all.return_value = list(range(1, len(params or []) + 1))
+        return result
+    mock_db.exec.side_effect = exec_side_effect
+    return mock_db
+
+
+def insert_calls(db):
+    return [call for call in db.exec.call_args_list if call.kwargs.get("params")]
+
+
+def test_create_events_batch(test_client, batch_db):
+    """
+    Test a JSON array batch is written with a single insert
+    """
+    # Arrange
+    events = [
+        {"page": "/", "user_agent": "Windows test-agent", "session_id": "s1", "duration": 30},
+        {"page": "/about", "user_agent": "MacOS test-agent", "session_id": "s2", "duration": 60},
+    ]
+
+    # Act
+    response = test_client.post("/api/events/batch", json=events)
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 0
+    assert [item["status"] for item in data["results"]] == ["created", "created"]
+    assert [item["id"] for item in data["results"]] == [1, 2]
+    assert len(insert_calls(batch_db)) == 1
+    assert "INSERT INTO eventmodel" in str(insert_calls(batch_db)[0].args[0])
+
+
+def test_create_events_batch_ndjson(test_client, batch_db):
+    """
+    Test an NDJSON body is accepted
+    """
+    # Arrange
+    body = "\n".join(json.dumps({"page": f"/page-{i}", "session_id": None}) for i in range(3))
+
+    # Act
+    response = test_client.post(
+        "/api/events/batch",
+        content=body,
+        headers={"content-type": "application/x-ndjson"}
+    )
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json()["created"] == 3
+
+
+def test_create_events_batch_per_item_status(test_client, batch_db):
+    """
+    Test invalid items are reported without rejecting the whole batch
+    """
+    # Arrange
+    events = [
+        {"page": "/", "session_id": "s1"},
+        {"user_agent": "missing page", "session_id": "s1"},
+        {"page": "/pricing", "session_id": "s1", "duration": "not-a-number"},
+        {"page": "/contact", "session_id": "s1"},
+    ]
+
+    # Act
+    response = test_client.post("/api/events/batch", json=events)
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 2
+    statuses = [(item["index"], item["status"]) for item in data["results"]]
+    assert statuses == [(0, "created"), (1, "invalid"), (2, "invalid"), (3, "created")]
+    assert data["results"][1]["errors"][0]["loc"] == ["page"]
+
+
+def test_create_events_batch_malformed_body(test_client, mock_db):
+    """
+    Test a body that isn't a JSON array is rejected
+    """
+    response = test_client.post("/api/events/batch", json={"page": "/"})
+    assert response.status_code == 400
+    mock_db.exec.assert_not_called()
+
+
+def test_create_events_batch_too_large(test_client, mock_db, monkeypatch):
+    """
+    Test oversized batches are rejected before touching the database
+    """
+    monkeypatch.setattr("src.api.events.routing.EVENTS_BATCH_MAX_SIZE", 2)
+    response = test_client.post("/api/events/batch", json=[{"page": "/"}] * 3)
+    assert response.status_code == 413
+    mock_db.exec.assert_not_called()
+
+
+def test_create_events_batch_body_too_large(test_client, mock_db, monkeypatch):
+    """
+    Test a body over the byte cap is rejected without being parsed
+    """
+    monkeypatch.setattr("src.api.events.routing.EVENTS_BATCH_MAX_BYTES", 10)
+
+    def parse(*args):
+        raise AssertionError("parsed an oversized body")
+
+    monkeypatch.setattr("src.api.events.routing.parse_batch_body", parse)
+    response = test_client.post("/api/events/batch", json=[{"page": "/"}] * 3)
+    assert response.status_code == 413
+    assert "bytes" in response.json()["detail"]
+
+    chunked = test_client.post("/api/events/batch", content=iter([b'[{"page": "/"},', b' {"page": "/"}]']))
+    assert chunked.status_code == 413
+    mock_db.exec.assert_not_called()
+
+
+def test_parse_batch_body_skips_blank_ndjson_lines():
+    """
+    Test blank lines in NDJSON are ignored
+    """
+    body = b'{"page": "/"}\n\n{"page": "/about"}\n'
+    items = parse_batch_body(body, "application/x-ndjson; charset=utf-8")
+    assert items == [{"page": "/"}, {"page": "/about"}]
+
+
+def test_validate_batch_stamps_time():
+    """
+    Test valid rows get an ingest time so they can be inserted directly
+    """
+    rows, results = validate_batch([{"page": "/", "session_id": "s1"}])
+    assert rows[0]["page"] == "/"
+    assert rows[0]["time"] is not None
+    assert results[0].status == "pending"
+
+
+def test_create_event_is_one_insert_returning(test_client, mock_db):
+    """
+    Test a single event is written and read back by one statement
+    """
+    response = test_client.post("/api/events/", json={"page": "/", "session_id": "s1"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["id"] == 1
+    assert data["time"] == "2025-01-01T00:00:00Z"
+    inserts = [c.args[0] for c in mock_db.exec.call_args_list if "eventmodel" in str(c.args[0])]
+    assert len(inserts) == 1
+    assert str(inserts[0]).endswith("RETURNING eventmodel.id, eventmodel.time")
+    mock_db.refresh.assert_not_called()
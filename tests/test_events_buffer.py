@@ -0,0 +1,118 @@
+"""
+Tests for the write-behind ingestion buffer
+"""
+import asyncio
+
+import pytest
+
+from src.api.events.buffer import BufferFullError, EventBuffer
+
+
+class RecordingWriter:
+    """Collects flushed batches instead of writing to the database"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, rows):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.batches.append(rows)
+
+
+def test_flush_writes_pending_rows_in_one_batch():
+    """
+    Test a flush hands every pending row to the writer at once
+    """
+    writer = RecordingWriter()
+    buffer = EventBuffer(flush_rows=100, flush_ms=1000, max_rows=100, writer=writer)
+    for i in range(3):
+        buffer.put({"page": f"/{i}"})
+
+    written = asyncio.run(buffer.flush())
+
+    assert written == 3
+    assert len(writer.batches) == 1
+    assert [row["page"] for row in writer.batches[0]] == ["/0", "/1", "/2"]
+    assert len(buffer) == 0
+
+
+def test_put_rejects_when_full():
+    """
+    Test backpressure once max_rows are pending
+    """
+    buffer = EventBuffer(flush_rows=10, flush_ms=1000, max_rows=2, writer=RecordingWriter())
+    buffer.put({"page": "/"})
+    buffer.put({"page": "/"})
+    with pytest.raises(BufferFullError):
+        buffer.put({"page": "/"})
+
+
+def test_failed_flush_keeps_rows():
+    """
+    Test rows survive a failed flush so the next one can retry them
+    """
+    writer = RecordingWriter(fail=True)
+    buffer = EventBuffer(flush_rows=10, flush_ms=1000, max_rows=10, writer=writer)
+    buffer.put({"page": "/"})
+
+    assert asyncio.run(buffer.flush()) == 0
+    assert len(buffer) == 1
+
+    writer.fail = False
+    assert asyncio.run(buffer.flush()) == 1
+    assert len(buffer) == 0
+
+
+def test_size_triggered_flush_and_flush_on_stop():
+    """
+    Test the background task flushes at flush_rows and stop drains the rest
+    """
+    writer = RecordingWriter()
+    buffer = EventBuffer(flush_rows=2, flush_ms=60_000, max_rows=10, writer=writer)
+
+    async def scenario():
+        await buffer.start()
+        buffer.put({"page": "/a"})
+        buffer.put({"page": "/b"})
+        for _ in range(100):
+            if writer.batches:
+                break
+            await asyncio.sleep(0.01)
+        flushed_by_size = len(writer.batches)
+        buffer.put({"page": "/c"})
+        await buffer.stop()
+        return flushed_by_size
+
+    assert asyncio.run(scenario()) == 1
+    assert [len(batch) for batch in writer.batches] == [2, 1]
+
+
+def test_create_event_write_behind(test_client, mock_db, monkeypatch):
+    """
+    Test create_event queues the event and returns 202 in write-behind mode
+    """
+    buffer = EventBuffer(flush_rows=10, flush_ms=1000, max_rows=10, writer=RecordingWriter())
+    monkeypatch.setattr("src.api.events.routing.EVENTS_WRITE_BEHIND", True)
+    monkeypatch.setattr("src.api.events.routing.event_buffer", buffer)
+
+    response = test_client.post("/api/events/", json={"page": "/", "session_id": "s1"})
+
+    assert response.status_code == 202
+    assert len(buffer) == 1
+    mock_db.add.assert_not_called()
+
+
+def test_create_event_write_behind_full(test_client, mock_db, monkeypatch):
+    """
+    Test create_event sheds load with 503 when the buffer is full
+    """
+    buffer = EventBuffer(flush_rows=10, flush_ms=1000, max_rows=0, writer=RecordingWriter())
+    monkeypatch.setattr("src.api.events.routing.EVENTS_WRITE_BEHIND", True)
+    monkeypatch.setattr("src.api.events.routing.event_buffer", buffer)
+
+    response = test_client.post("/api/events/", json={"page": "/", "session_id": "s1"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,114 @@
+"""
+Tests for the columnar and Arrow encodings of read_events
+"""
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from src.api.events.columnar import ARROW_MEDIA_TYPE, to_columns
+
+BUCKET = datetime(2025, 1, 1, tzinfo=timezone.utc)
+ROWS = [
+    (BUCKET, "Windows", "/", Decimal("45.5"), 10, 4, 30.0, 90.0, 120.0),
+    (BUCKET, "macOS", "/about", None, 5, 5, None, None, None),
+]
+# a rollup-backed row: sum() of counts is numeric, a Decimal
+ROLLUP_ROW = (BUCKET, "Linux", "/pricing", Decimal("12.25"), Decimal("8"), 3, 10.0, 20.0, 30.0)
+
+
+@pytest.fixture
+def bucket_rows(mock_db):
+    mock_db.exec.return_value.fetchall.return_value = ROWS
+    return ROWS
+
+
+def test_to_columns():
+    """
+    Test rows are transposed into parallel arrays
+    """
+    columns = to_columns(ROWS)
+
+    assert columns == {
+        "bucket": [BUCKET, BUCKET],
+        "operating_system": ["Windows", "macOS"],
+        "page": ["/", "/about"],
+        "avg_duration": [45.5, None],
+        "count": [10, 5],
+        "unique_sessions": [4, 5],
+        "p50_duration": [30.0, None],
+        "p90_duration": [90.0, None],
+        "p99_duration": [120.0, None],
+    }
+    assert to_columns([])["page"] == []
+
+
+def test_columnar_decimal_count(test_client, mock_db):
+    """
+    Test a Decimal count from the rollup path is encoded as an int
+    """
+    mock_db.exec.return_value.fetchall.return_value = [ROLLUP_ROW]
+
+    assert to_columns([ROLLUP_ROW])["count"] == [8]
+    response = test_client.get("/api/events/", params={"duration": "1 day", "format": "columnar"})
+
+    assert response.status_code == 200
+    assert response.json()["count"] == [8]
+
+
+def test_columnar_format(test_client, bucket_rows):
+    """
+    Test ?format=columnar returns one array per column
+    """
+    response = test_client.get("/api/events/", params={"duration": "15 minutes", "format": "columnar"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["page"] == ["/", "/about"]
+    assert data["bucket"] == ["2025-01-01T00:00:00+00:00"] * 2
+    assert data["count"] == [10, 5]
+    assert data["unique_sessions"] == [4, 5]
+
+
+def test_unknown_format(test_client):
+    """
+    Test unknown formats are rejected
+    """
+    response = test_client.get("/api/events/", params={"format": "xml"})
+
+    assert response.status_code == 400
+
+
+def test_arrow_stream(test_client, bucket_rows):
+    """
+    Test Accept: Arrow IPC returns a readable record batch stream
+    """
+    pa = pytest.importorskip("pyarrow")
+
+    response = test_client.get(
+        "/api/events/",
+        params={"duration": "15 minutes"},
+        headers={"Accept": ARROW_MEDIA_TYPE},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("page").to_pylist() == ["/", "/about"]
+    assert table.column("avg_duration").to_pylist() == [45.5, None]
+
+
+def test_arrow_without_pyarrow(test_client, bucket_rows, monkeypatch):
+    """
+    Test Arrow is refused with 406 when pyarrow isn't installed
+    """
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    response = test_client.get(
+        "/api/events/",
+        params={"duration": "15 minutes"},
+        headers={"Accept": ARROW_MEDIA_TYPE},
+    )
+
+    assert response.status_code == 406
@@ -0,0 +1,105 @@
+"""
+Tests for the dictionary-encoded dimension columns
+"""
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from src.api.events.dimensions import DimensionCache, encode_rows
+from src.api.events.models import EventModel, PageDimension
+
+
+def upsert_session(ids):
+    """Mock session answering dimension upserts from an {value: id} map"""
+    session = MagicMock()
+    session.commit = AsyncMock()
+
+    async def exec_side_effect(statement, **kwargs):
+        params = statement.compile(dialect=postgresql.dialect()).params
+        values = [v for k, v in params.items() if k.startswith("value")]
+        result = MagicMock()
+        result.all.return_value = [(ids[value], value) for value in values]
+        return result
+
+    session.exec = AsyncMock(side_effect=exec_side_effect)
+    return session
+
+
+def test_resolve_hits_skip_the_database():
+    """
+    Test cached values don't cause a round trip, misses cost one upsert
+    """
+    cache = DimensionCache(PageDimension, max_size=10)
+    session = upsert_session({"/": 1, "/about": 2})
+
+    first = asyncio.run(cache.resolve(session, ["/", "/about"]))
+    second = asyncio.run(cache.resolve(session, ["/", "/about"]))
+
+    assert first == second == {"/": 1, "/about": 2}
+    assert session.exec.call_count == 1
+    sql = str(session.exec.call_args[0][0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (value) DO UPDATE" in sql
+    assert "RETURNING pagedimension.id, pagedimension.value" in sql
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    Test the cache stays bounded
+    """
+    cache = DimensionCache(PageDimension, max_size=2)
+    cache.put("/a", 1)
+    cache.put("/b", 2)
+    cache.get("/a")
+    cache.put("/c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("/b") is None
+    assert cache.get("/a") == 1
+
+
+def test_encode_rows(monkeypatch):
+    """
+    Test text fields are swapped for ids without touching the input rows
+    """
+    for field in ("page", "user_agent", "referrer"):
+        monkeypatch.setattr(f"src.api.events.dimensions.{field}_dimension.max_size", 10)
+    session = upsert_session({"/": 1, "Mozilla/5.0": 7, "": 3})
+    rows = [{"page": "/", "user_agent": "Mozilla/5.0", "referrer": "", "duration": 5}]
+
+    encoded = asyncio.run(encode_rows(session, rows))
+
+    assert encoded == [{"page_id": 1, "user_agent_id": 7, "referrer_id": 3, "duration": 5}]
+    assert rows[0]["page"] == "/"
+
+
+def test_read_events_joins_pages_after_aggregating(test_client, mock_db):
+    """
+    Test read_events groups on page ids and decodes only the final rows
+    """
+    response = test_client.get("/api/events/", params={"duration": "15 minutes"})
+
+    assert response.status_code == 200
+    sql = str(mock_db.exec.call_args[0][0])
+    assert "GROUP BY" in sql and "eventmodel.page_id" in sql
+    assert "JOIN pagedimension" in sql
+
+
+def test_get_event_decodes_dimensions(test_client, mock_db):
+    """
+    Test get_event returns the text values, not the ids
+    """
+    event = EventModel(
+        id=12, time=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        page_id=1, user_agent_id=2, referrer_id=None, session_id="s1", duration=3,
+    )
+    mock_db.exec.return_value.first.return_value = (event, "/pricing", "Mozilla/5.0", None)
+
+    response = test_client.get("/api/events/12")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["page"] == "/pricing"
+    assert data["user_agent"] == "Mozilla/5.0"
+    assert "page_id" not in data
@@ -0,0 +1,126 @@
+"""
+Tests for the streaming raw-event export
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api.events import export
+from src.api.events.export import EXPORT_COLUMNS, export_query
+
+Row = namedtuple("Row", EXPORT_COLUMNS)
+
+
+def make_row(id, page="/"):
+    return Row(
+        id=id, time=datetime(2025, 1, 1, 12, id, tzinfo=timezone.utc), page=page,
+        user_agent="Mozilla/5.0", ip_address="10.0.0.1", referrer="", session_id="s1",
+        duration=5, operating_system="Windows", browser="Chrome", device_type="Desktop",
+    )
+
+
+class FakeStreamSession:
+    """Stands in for the export's own AsyncSession"""
+
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, query, execution_options=None):
+        self.calls.append((query, execution_options))
+        result = MagicMock()
+
+        async def partitions():
+            for rows in self.partitions:
+                yield rows
+
+        result.partitions = partitions
+        return result
+
+
+@pytest.fixture
+def stream_session(monkeypatch):
+    session = FakeStreamSession([[make_row(1), make_row(2)], [make_row(3, "/about")]])
+    monkeypatch.setattr(export, "export_session", lambda: session)
+    return session
+
+
+def test_export_ndjson(test_client, stream_session):
+    """
+    Test NDJSON export streams one object per event, batched by yield_per
+    """
+    response = test_client.get("/api/events/export", params={"start": "2025-01-01T00:00:00Z"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == [1, 2, 3]
+    assert lines[2]["page"] == "/about"
+    assert lines[0]["time"] == "2025-01-01T12:01:00+00:00"
+    _, options = stream_session.calls[0]
+    assert options == {"yield_per": export.EVENTS_EXPORT_BATCH_SIZE}
+
+
+def test_export_csv(test_client, stream_session):
+    """
+    Test CSV export starts with a header row
+    """
+    response = test_client.get(
+        "/api/events/export",
+        params={"start": "2025-01-01T00:00:00Z", "format": "csv"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == EXPORT_COLUMNS
+    assert [row[0] for row in rows[1:]] == ["1", "2", "3"]
+
+
+@pytest.mark.parametrize("params", [
+    {"start": "2025-01-01T00:00:00Z", "format": "xml"},
+    {"start": "2025-01-02T00:00:00Z", "end": "2025-01-01T00:00:00Z"},
+])
+def test_export_rejects_bad_params(test_client, params):
+    """
+    Test unknown formats and empty ranges are rejected up front
+    """
+    response = test_client.get("/api/events/export", params=params)
+
+    assert response.status_code == 400
+
+
+def test_export_is_not_an_event_id(test_client):
+    """
+    Test /export isn't routed to get_event
+    """
+    response = test_client.get("/api/events/export")
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["query", "start"]
+
+
+def test_export_query():
+    """
+    Test the export reads a time range in order, optionally by page
+    """
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    end = datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+    sql = str(export_query(start, end, ["/pricing"]))
+
+    assert "eventmodel.time >= :time_1 AND eventmodel.time < :time_2" in sql
+    assert "pagedimension.value IN" in sql
+    assert sql.endswith("ORDER BY eventmodel.time")
+    assert "pagedimension.value IN" not in str(export_query(start, end))
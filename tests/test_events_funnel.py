@@ -0,0 +1,104 @@
+"""
+Tests for POST /api/events/funnel
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.api.events.config import DEFAULT_LOOKUP_PAGES
+from src.api.events.funnel import (
+    DEFAULT_FUNNEL_PAGES,
+    funnel_query,
+    funnel_steps,
+    resolve_funnel_window,
+)
+
+END = datetime(2025, 1, 8, tzinfo=timezone.utc)
+
+
+def test_funnel_steps():
+    """
+    Test sessions that stopped at each step become counts per step reached
+    """
+    steps = funnel_steps(["/", "/pricing", "/signup"], [(1, 5), (2, 3), (3, 2)])
+
+    assert [step.sessions for step in steps] == [10, 5, 2]
+    assert [step.conversion for step in steps] == [None, 0.5, 0.4]
+    assert [step.rate for step in steps] == [1.0, 0.5, 0.2]
+    assert [step.sessions for step in funnel_steps(["/", "/pricing"], [])] == [0, 0]
+
+
+def test_resolve_funnel_window():
+    """
+    Test the window defaults to the last 7 days and rejects bad input
+    """
+    assert resolve_funnel_window(end=END) == (END - timedelta(days=7), END)
+    assert resolve_funnel_window(end=END, since="1 day") == (END - timedelta(days=1), END)
+    with pytest.raises(ValueError):
+        resolve_funnel_window(start=END, end=END)
+    with pytest.raises(ValueError):
+        resolve_funnel_window(start=END - timedelta(days=1), since="1 day")
+
+
+def test_funnel_query_is_one_pass():
+    """
+    Test the funnel is a single grouped scan, not a self-join per step
+    """
+    query = funnel_query([3, 5, 8], END - timedelta(days=7), END)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "funnel_progress(eventmodel.page_id, %(param_1)s::INTEGER[] ORDER BY eventmodel.time)" in sql
+    assert "GROUP BY eventmodel.session_id" in sql
+    assert "JOIN" not in sql
+    assert sql.count("FROM eventmodel") == 1
+
+
+@pytest.fixture
+def funnel_db(mock_db):
+    """Page lookup, then (progress, sessions) rows"""
+    pages = MagicMock()
+    pages.all.return_value = [("/", 1), ("/pricing", 2)]
+    progress = MagicMock()
+    progress.all.return_value = [(1, 6), (2, 4)]
+    mock_db.exec.side_effect = [pages, progress]
+    return mock_db
+
+
+def test_funnel_endpoint(test_client, funnel_db):
+    """
+    Test the endpoint resolves pages and counts sessions per step
+    """
+    response = test_client.post("/api/events/funnel", json={
+        "pages": ["/", "/pricing", "/never-seen"],
+        "since": "1 day",
+    })
+
+    assert response.status_code == 200
+    steps = response.json()["steps"]
+    assert [(step["page"], step["sessions"]) for step in steps] == [
+        ("/", 10), ("/pricing", 4), ("/never-seen", 0),
+    ]
+    steps_param = funnel_db.exec.call_args_list[1].args[0].compile().params["param_1"]
+    assert steps_param == [1, 2, 0]
+
+
+def test_funnel_defaults(test_client, funnel_db):
+    """
+    Test an empty body runs the default funnel
+    """
+    response = test_client.post("/api/events/funnel")
+
+    assert response.status_code == 200
+    assert [step["page"] for step in response.json()["steps"]] == DEFAULT_FUNNEL_PAGES
+    assert set(DEFAULT_FUNNEL_PAGES) <= set(DEFAULT_LOOKUP_PAGES)
+
+
+def test_funnel_rejects_bad_window(test_client):
+    """
+    Test an unparseable window is a 400
+    """
+    response = test_client.post("/api/events/funnel", json={"since": "a while"})
+
+    assert response.status_code == 400
@@ -0,0 +1,34 @@
+"""
+Tests for the EventModel index layout
+"""
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from src.api.events.models import LEGACY_EVENT_INDEXES, EventModel
+
+
+def index_sql():
+    return {
+        index.name: str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        for index in EventModel.__table__.indexes
+    }
+
+
+def test_only_composite_access_path_indexes():
+    """
+    Test inserts pay for the page + time and session + time indexes only
+    """
+    assert index_sql() == {
+        "ix_eventmodel_page_id_time": "CREATE INDEX ix_eventmodel_page_id_time ON eventmodel (page_id, time DESC)",
+        "ix_eventmodel_session_id_time_page_id": (
+            "CREATE INDEX ix_eventmodel_session_id_time_page_id ON eventmodel (session_id, time) INCLUDE (page_id)"
+        ),
+    }
+
+
+def test_no_single_column_indexes():
+    """
+    Test no column still carries index=True
+    """
+    assert not any(column.index for column in EventModel.__table__.columns)
+    assert not set(index_sql()) & set(LEGACY_EVENT_INDEXES)
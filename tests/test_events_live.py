@@ -0,0 +1,114 @@
+"""
+Tests for the live per-page counts behind GET /api/events/live
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+from src.api.events.live import LiveCounts, live_counts
+
+
+def test_record_counts_current_bucket():
+    """
+    Test counts reset when the bucket rolls and late events are ignored
+    """
+    live = LiveCounts(bucket="1 minute")
+    now = datetime(2025, 1, 1, 12, 0, 30, tzinfo=timezone.utc)
+    live.record("/", now)
+    live.record("/", now)
+    live.record("/pricing", now)
+    assert live.counts == {"/": 2, "/pricing": 1}
+
+    live.record("/", now + timedelta(minutes=1))
+    assert live.bucket == datetime(2025, 1, 1, 12, 1, tzinfo=timezone.utc)
+    assert live.counts == {"/": 1}
+
+    live.record("/late", now)
+    assert live.counts == {"/": 1}
+
+
+def test_publish_coalesces_updates():
+    """
+    Test a burst of events becomes one snapshot, and nothing new is
+    published until the counts change again
+    """
+    live = LiveCounts()
+    for _ in range(500):
+        live.record("/")
+
+    assert live.publish() is True
+    assert live.publish() is False
+    payload = json.loads(live.snapshot.payload)
+    assert payload["counts"] == {"/": 500}
+    assert payload["total"] == 500
+    assert live.snapshot.frame.startswith(b"data: ")
+    assert live.snapshot.frame.endswith(b"\n\n")
+
+
+def test_subscribers_share_one_snapshot():
+    """
+    Test every subscriber gets the same serialized snapshot object
+    """
+    live = LiveCounts(interval_ms=10_000, keepalive_s=5)
+
+    async def scenario():
+        streams = [live.subscribe() for _ in range(100)]
+        first = [await anext(stream) for stream in streams]
+        waiting = [asyncio.ensure_future(anext(stream)) for stream in streams]
+        await asyncio.sleep(0)
+        live.record("/signup")
+        live.record("/signup")
+        live.publish()
+        second = await asyncio.gather(*waiting)
+        assert live.subscribers == 100
+        for stream in streams:
+            await stream.aclose()
+        await live.stop()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert all(snapshot is first[0] for snapshot in first)
+    assert all(snapshot is second[0] for snapshot in second)
+    assert json.loads(second[0].payload)["counts"] == {"/signup": 2}
+    assert live.subscribers == 0
+
+
+def test_subscribe_keepalive():
+    """
+    Test an idle stream yields None so the route can send a keepalive
+    """
+    live = LiveCounts(interval_ms=10_000, keepalive_s=0.01)
+
+    async def scenario():
+        stream = live.subscribe()
+        await anext(stream)
+        idle = await anext(stream)
+        await stream.aclose()
+        await live.stop()
+        return idle
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_create_event_feeds_live_counts(test_client):
+    """
+    Test the ingest route records accepted events
+    """
+    before = live_counts.counts.get("/live-test", 0)
+    response = test_client.post("/api/events/", json={"page": "/live-test", "session_id": "s1"})
+
+    assert response.status_code == 200
+    assert live_counts.counts.get("/live-test", 0) == before + 1
+
+
+def test_live_websocket_sends_snapshot(test_client):
+    """
+    Test a WebSocket subscriber gets the current counts on connect
+    """
+    test_client.post("/api/events/", json={"page": "/live-ws", "session_id": "s1"})
+    with test_client.websocket_connect("/api/events/live/ws") as websocket:
+        payload = websocket.receive_json()
+
+    assert payload["counts"]["/live-ws"] >= 1
+    assert set(payload) == {"bucket", "width_seconds", "counts", "total"}
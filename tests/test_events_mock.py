@@ -2,19 +2,20 @@
 Tests for the events API with complete DB mocking
 """
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from fastapi.testclient import TestClient
+from sqlalchemy import literal_column
 
 from src.main import app
-from src.api.db.session import get_session
+from src.api.db.session import get_async_session
 
 
 @pytest.fixture
 def mock_time_bucket():
     """Mock the time_bucket function from timescaledb"""
     with patch('src.api.events.routing.time_bucket') as mock:
-        # Configure the mock to work in the query
-        mock.return_value.label.return_value = "bucket_column"
+        # Configure the mock to return a SQL expression the query can use
+        mock.return_value = literal_column("bucket_column")
         yield mock
 
 
@@ -44,23 +45,19 @@ def mock_session(mock_events_response):
     """Create a completely mocked database session"""
     session = MagicMock()
     
-    # Mock exec().fetchall() to return event data
+    # Mock (await exec()).fetchall() to return event data
     exec_mock = MagicMock()
     exec_mock.fetchall.return_value = mock_events_response
-    session.exec.return_value = exec_mock
+    session.exec = AsyncMock(return_value=exec_mock)
     
     # Mock add() method for event creation
     session.add = MagicMock()
     
     # Mock commit() method
-    session.commit = MagicMock()
+    session.commit = AsyncMock()
     
-    # Mock refresh() to simulate adding ID to created object
-    def refresh_side_effect(obj):
-        obj.id = 1
-        obj.time = "2023-06-01T12:00:00"
-    
-    session.refresh.side_effect = refresh_side_effect
+    # Mock the (id, time) row returned by INSERT ... RETURNING
+    exec_mock.one.return_value = (1, "2023-06-01T12:00:00")
     
     return session
 
@@ -69,12 +66,12 @@ def mock_session(mock_events_response):
 def client(mock_session, mock_time_bucket):
     """Create a FastAPI TestClient with mocked dependencies"""
     
-    # Mock the get_session dependency
+    # Mock the get_async_session dependency
     def override_get_session():
         yield mock_session
     
-    # Override the get_session dependency
-    app.dependency_overrides[get_session] = override_get_session
+    # Override the get_async_session dependency
+    app.dependency_overrides[get_async_session] = override_get_session
     
     # Create test client
     with TestClient(app) as test_client:
@@ -89,7 +86,11 @@ def test_read_events(client, mock_events_response):
     response = client.get("/api/events/")
     
     assert response.status_code == 200
-    assert response.json() == mock_events_response
+    # the response also carries the sketch columns, None in the mock rows
+    data = response.json()
+    assert len(data) == len(mock_events_response)
+    for item, expected in zip(data, mock_events_response):
+        assert {key: item[key] for key in expected} == expected
 
 
 def test_create_event(client):
@@ -0,0 +1,185 @@
+"""
+Tests for the in-memory recent-traffic counters behind read_events
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.api.events.recent import RecentCounters, recent_counters
+
+NOW = datetime(2025, 1, 1, 12, 30, 20, tzinfo=timezone.utc)
+MINUTE = timedelta(minutes=1)
+
+
+def counters(slots=60):
+    recent = RecentCounters(slot="1 minute", slots=slots)
+    recent.covered_since = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return recent
+
+
+def test_query_buckets_slots():
+    """
+    Test per-minute slots roll up into wider buckets per page and OS
+    """
+    recent = counters()
+    recent.record("/", "macOS", "a", 10, NOW - 6 * MINUTE)
+    recent.record("/", "macOS", "b", 20, NOW - 2 * MINUTE)
+    recent.record("/", "macOS", "a", 30, NOW)
+    recent.record("/pricing", "iOS", None, 0, NOW)
+    recent.record("/other", "iOS", "c", 5, NOW)
+
+    start = datetime(2025, 1, 1, 12, 20, tzinfo=timezone.utc)
+    rows = recent.query(start, NOW, timedelta(minutes=5), ["/", "/pricing"])
+
+    assert [(row.bucket.minute, row.operating_system, row.page, row.count) for row in rows] == [
+        (20, "macOS", "/", 1),
+        (25, "macOS", "/", 1),
+        (30, "iOS", "/pricing", 1),
+        (30, "macOS", "/", 1),
+    ]
+    assert rows[0].avg_duration == 10
+    assert rows[2].unique_sessions == 0
+    assert rows[2].p50_duration == 0.0
+
+
+def test_unique_sessions_and_percentiles():
+    """
+    Test sessions are distinct across slots and percentiles stay within
+    the sketch error
+    """
+    recent = counters()
+    for duration in range(1, 101):
+        recent.record("/", "Linux", f"s{duration % 10}", duration, NOW - (duration % 3) * MINUTE)
+
+    start = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    (row,) = recent.query(start, NOW, timedelta(hours=1), ["/"])
+
+    assert row.count == 100
+    assert row.unique_sessions == 10
+    assert row.avg_duration == pytest.approx(50.5)
+    assert row.p50_duration == pytest.approx(50, rel=0.01)
+    assert row.p90_duration == pytest.approx(90, rel=0.01)
+    assert row.p99_duration == pytest.approx(99, rel=0.01)
+
+
+def test_ring_reuses_stale_slots():
+    """
+    Test slots older than the ring are dropped, not counted
+    """
+    recent = counters(slots=5)
+    recent.record("/", "", "a", 1, NOW - 10 * MINUTE)
+    recent.record("/", "", "a", 1, NOW)
+    recent.record("/", "", "a", 1, NOW - 10 * MINUTE)
+
+    start = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    rows = recent.query(start, NOW, timedelta(hours=1), ["/"])
+
+    assert [row.count for row in rows] == [1]
+
+
+def test_query_with_future_end():
+    """
+    Test a window ending in the future is answered up to now, not
+    anchored on slots that haven't happened yet
+    """
+    recent = counters()
+    for minutes in range(31):
+        recent.record("/", "", "a", 1, NOW - minutes * MINUTE)
+
+    start = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    until_now = recent.query(start, NOW, MINUTE, ["/"])
+    future = datetime(2025, 1, 1, 15, 30, tzinfo=timezone.utc)
+
+    assert len(until_now) == 31
+    assert recent.covers(start, future, now=NOW)
+    assert recent.query(start, future, MINUTE, ["/"]) == until_now
+
+
+def test_covers():
+    """
+    Test only slot-aligned windows inside the ring and after warm-up
+    are answered from memory
+    """
+    recent = counters()
+    aligned = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+    assert recent.covers(aligned, NOW, now=NOW)
+    assert recent.covers(aligned, aligned + 10 * MINUTE, now=NOW)
+    assert not recent.covers(aligned + timedelta(seconds=5), NOW, now=NOW)
+    assert not recent.covers(aligned, aligned + timedelta(minutes=10, seconds=5), now=NOW)
+    assert not recent.covers(aligned - timedelta(hours=1), NOW, now=NOW)
+
+    recent.covered_since = aligned + MINUTE
+    assert not recent.covers(aligned, NOW, now=NOW)
+    assert not RecentCounters(slots=60).covers(aligned, NOW, now=NOW)
+
+
+def test_start_is_cold(monkeypatch):
+    """
+    Test starting only covers slots that begin afterwards, without a query
+    """
+    import src.api.events.recent as recent_module
+
+    monkeypatch.setattr(recent_module, "get_utc_now", lambda: NOW)
+    recent = RecentCounters(slot="1 minute", slots=60)
+
+    asyncio.run(recent.start())
+
+    assert recent.covered_since == datetime(2025, 1, 1, 12, 31, tzinfo=timezone.utc)
+
+
+def test_disabled_by_default():
+    """
+    Test read_events never answers from memory unless slots are configured
+    """
+    recent = RecentCounters(slot="1 minute", slots=0)
+    asyncio.run(recent.start())
+
+    assert recent_counters.size == 0
+    assert not recent.covers(NOW - MINUTE, NOW, now=NOW)
+
+
+class Ingesters:
+    def __init__(self, count):
+        self.count = count
+
+    def attached(self):
+        return self.count
+
+
+def test_other_workers_turn_memory_path_off():
+    """
+    Test the ring isn't used while another worker is attached, and once
+    alone again only covers slots starting after that
+    """
+    recent = counters()
+    recent.ingesters = Ingesters(2)
+    start = NOW.replace(second=0) - 10 * MINUTE
+
+    assert not recent.covers(start, NOW, now=NOW)
+    assert recent.covered_since == datetime(2025, 1, 1, 12, 31, tzinfo=timezone.utc)
+
+    recent.ingesters.count = 1
+    assert not recent.covers(start, NOW, now=NOW)
+    later = NOW + 5 * MINUTE
+    assert recent.covers(recent.covered_since, later, now=later)
+
+
+def test_read_events_from_memory(test_client, mock_db, monkeypatch):
+    """
+    Test a recent window is answered without querying the database
+    """
+    now = datetime.now(timezone.utc)
+    recent = counters()
+    recent.covered_since = now - timedelta(hours=2)
+    recent.record("/pricing", "macOS", "recent-test", 42, now)
+    monkeypatch.setattr("src.api.events.routing.recent_counters", recent)
+
+    response = test_client.get("/api/events/", params={"duration": "1 minute", "pages": ["/pricing"]})
+
+    assert response.status_code == 200
+    assert not mock_db.exec.called
+    latest = response.json()[-1]
+    assert latest["page"] == "/pricing"
+    assert latest["count"] >= 1
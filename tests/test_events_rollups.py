@@ -0,0 +1,154 @@
+"""
+Tests for the continuous-aggregate rollups behind GET /api/events/
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api.events.models import DAILY_EVENT_ROLLUP, HOURLY_EVENT_ROLLUP, SESSION_HLL_BUCKETS
+from src.api.events.rollups import rollup_ddl, rollup_for, sync_event_rollups
+from src.api.events.timeranges import parse_interval
+
+
+@pytest.mark.parametrize("duration,expected", [
+    ("1 hour", HOURLY_EVENT_ROLLUP),
+    ("60 minutes", HOURLY_EVENT_ROLLUP),
+    ("6 hours", HOURLY_EVENT_ROLLUP),
+    ("1 day", DAILY_EVENT_ROLLUP),
+    ("2 days", DAILY_EVENT_ROLLUP),
+    ("1 week", DAILY_EVENT_ROLLUP),
+    ("1 month", DAILY_EVENT_ROLLUP),
+    ("36 hours", HOURLY_EVENT_ROLLUP),
+    ("15 minutes", None),
+    ("90 minutes", None),
+    ("not an interval", None),
+])
+def test_rollup_for(duration, expected):
+    """
+    Test durations are routed to the coarsest rollup that lines up
+    """
+    assert rollup_for(duration) == expected
+
+
+def test_parse_interval():
+    """
+    Test simple interval strings are understood
+    """
+    assert parse_interval("15 minutes").total_seconds() == 900
+    assert parse_interval("2 Days").total_seconds() == 172800
+    assert parse_interval("1 fortnight") is None
+
+
+def test_rollup_ddl_is_idempotent():
+    """
+    Test the rollup DDL can run on every startup
+    """
+    create_view, add_policy = rollup_ddl(DAILY_EVENT_ROLLUP)
+    assert create_view.startswith("CREATE MATERIALIZED VIEW IF NOT EXISTS event_rollup_daily")
+    assert "timescaledb.continuous" in create_view
+    assert "FROM event_rollup_hourly" in create_view
+    assert create_view.endswith("WITH NO DATA")
+    assert "eventmodel.operating_system" in rollup_ddl(HOURLY_EVENT_ROLLUP)[0]
+    assert "if_not_exists => true" in add_policy
+
+
+def test_rollups_store_mergeable_session_sketches():
+    """
+    Test hourly rollups sketch session_id and daily ones merge the sketches
+    """
+    hourly = rollup_ddl(HOURLY_EVENT_ROLLUP)[0]
+    daily = rollup_ddl(DAILY_EVENT_ROLLUP)[0]
+
+    assert f"hyperloglog({SESSION_HLL_BUCKETS}, eventmodel.session_id) AS sessions" in hourly
+    assert "rollup(event_rollup_hourly.sessions) AS sessions" in daily
+
+
+def test_rollups_store_mergeable_duration_sketches():
+    """
+    Test hourly rollups keep a duration digest and daily ones merge them
+    """
+    hourly = rollup_ddl(HOURLY_EVENT_ROLLUP)[0]
+    daily = rollup_ddl(DAILY_EVENT_ROLLUP)[0]
+
+    assert "uddsketch(8192, 0.001, eventmodel.duration) AS duration_sketch" in hourly
+    assert "rollup(event_rollup_hourly.duration_sketch) AS duration_sketch" in daily
+
+
+def test_stale_rollup_is_rebuilt():
+    """
+    Test a rollup missing a declared column is dropped and recreated,
+    and reported for a refresh along with the rollups built on it
+    """
+    session = MagicMock()
+    session.exec.return_value.scalars.return_value.all.side_effect = [
+        ["bucket", "page_id", "operating_system", "count", "sum_duration"],
+        list(DAILY_EVENT_ROLLUP.table.c.keys()),
+    ]
+
+    rebuilt = sync_event_rollups(session, [HOURLY_EVENT_ROLLUP, DAILY_EVENT_ROLLUP])
+
+    assert rebuilt == [HOURLY_EVENT_ROLLUP, DAILY_EVENT_ROLLUP]
+
+    statements = [str(call.args[0]) for call in session.exec.call_args_list]
+    drop = statements.index("DROP MATERIALIZED VIEW event_rollup_hourly CASCADE")
+    create = next(i for i, sql in enumerate(statements) if sql.startswith("CREATE MATERIALIZED VIEW"))
+    assert drop < create
+
+
+def test_current_rollup_is_kept():
+    """
+    Test an up to date rollup isn't dropped
+    """
+    session = MagicMock()
+    session.exec.return_value.scalars.return_value.all.return_value = list(HOURLY_EVENT_ROLLUP.table.c.keys())
+    session.exec.return_value.scalar.return_value = (
+        " SELECT uddsketch(8192, (0.001)::double precision, (eventmodel.duration)::double precision)"
+    )
+
+    assert sync_event_rollups(session, [HOURLY_EVENT_ROLLUP]) == []
+
+    assert not any("DROP" in str(call.args[0]) for call in session.exec.call_args_list)
+
+
+def test_rollup_with_other_sketch_size_is_rebuilt():
+    """
+    Test a rollup sketching durations with an old bucket count is rebuilt
+    """
+    session = MagicMock()
+    session.exec.return_value.scalars.return_value.all.return_value = list(HOURLY_EVENT_ROLLUP.table.c.keys())
+    session.exec.return_value.scalar.return_value = (
+        " SELECT uddsketch(200, (0.001)::double precision, (eventmodel.duration)::double precision)"
+    )
+
+    assert sync_event_rollups(session, [HOURLY_EVENT_ROLLUP]) == [HOURLY_EVENT_ROLLUP]
+
+
+def test_read_events_uses_rollup(test_client, mock_db):
+    """
+    Test a bucket size that lines up with a rollup reads the rollup
+    """
+    mock_db.exec.return_value.fetchall.return_value = []
+
+    response = test_client.get("/api/events/", params={"duration": "1 hour"})
+
+    assert response.status_code == 200
+    query = str(mock_db.exec.call_args[0][0])
+    assert "FROM event_rollup_hourly" in query
+    assert "eventmodel" not in query
+    assert "distinct_count(rollup(event_rollup_hourly.sessions))" in query
+    assert "rollup(event_rollup_hourly.duration_sketch)) AS p99_duration" in query
+
+
+def test_read_events_falls_back_to_raw(test_client, mock_db):
+    """
+    Test finer buckets are aggregated from raw events
+    """
+    mock_db.exec.return_value.fetchall.return_value = []
+
+    response = test_client.get("/api/events/", params={"duration": "15 minutes"})
+
+    assert response.status_code == 200
+    query = str(mock_db.exec.call_args[0][0])
+    assert "FROM eventmodel" in query
+    assert "distinct_count(hyperloglog(" in query
+    assert "p90_duration" in query and "uddsketch(" in query
@@ -0,0 +1,306 @@
+"""
+Tests for the durable ingestion spool
+"""
+import asyncio
+import fcntl
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+import src.api.events.spool as spool_module
+from src.api.events.spool import EventSpool, SpoolFullError, read_records
+
+
+class RecordingWriter:
+    """Collects replayed batches, failing from the `fail_at`th call on"""
+
+    def __init__(self, fail_at=None):
+        self.batches = []
+        self.fail_at = fail_at
+
+    async def __call__(self, rows):
+        if self.fail_at is not None and len(self.batches) + 1 >= self.fail_at:
+            raise RuntimeError("database unavailable")
+        self.batches.append(rows)
+
+
+def make_rows(count):
+    time = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+    return [{"page": f"/{index}", "session_id": "s1", "time": time} for index in range(count)]
+
+
+def test_replay_inserts_rows_in_batches_and_removes_segments(tmp_path):
+    """
+    Test spooled rows come back intact, in order and in bulk
+    """
+    writer = RecordingWriter()
+    spool = EventSpool(str(tmp_path), fsync_ms=0, replay_rows=2, writer=writer)
+    rows = make_rows(5)
+    spool.append_rows(rows[:3])
+    spool.append_rows(rows[3:])
+
+    assert asyncio.run(spool.replay()) == 5
+
+    assert [len(batch) for batch in writer.batches] == [2, 2, 1]
+    assert [row for batch in writer.batches for row in batch] == rows
+    assert spool.segments() == []
+    assert spool.depth()["bytes"] == 0
+
+
+def test_torn_tail_is_skipped(tmp_path):
+    """
+    Test a record cut short by a crash is dropped, not misread
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=0)
+    spool.append_rows(make_rows(3))
+    path = spool._path
+    spool.rotate()
+    os.truncate(path, os.path.getsize(path) - 5)
+
+    with open(path, "rb") as f:
+        assert [row["page"] for _, row in read_records(f.read())] == ["/0", "/1"]
+
+
+def test_failed_replay_resumes_from_saved_offset(tmp_path):
+    """
+    Test a failed insert keeps the segment and the retry skips what
+    was already inserted
+    """
+    spool = EventSpool(
+        str(tmp_path), fsync_ms=0, replay_rows=2, retry_s=0, writer=RecordingWriter(fail_at=2)
+    )
+    spool.append_rows(make_rows(5))
+
+    assert asyncio.run(spool.replay()) == 0
+    assert len(spool.segments()) == 1
+
+    spool.writer = RecordingWriter()
+    assert asyncio.run(spool.replay()) == 3
+    assert [row["page"] for batch in spool.writer.batches for row in batch] == ["/2", "/3", "/4"]
+    assert spool.segments() == []
+
+
+def test_failed_segment_does_not_block_the_others(tmp_path):
+    """
+    Test a segment whose insert fails is backed off while later
+    segments are still replayed
+    """
+    inserted = []
+
+    async def writer(rows):
+        if rows[0]["page"] == "/bad":
+            raise RuntimeError("bad row")
+        inserted.extend(rows)
+
+    spool = EventSpool(str(tmp_path), fsync_ms=0, segment_bytes=1, retry_s=60, writer=writer)
+    spool.append_rows([{"page": "/bad", "session_id": "s1"}])
+    spool.append_rows(make_rows(2))
+
+    assert asyncio.run(spool.replay()) == 2
+    assert [row["page"] for row in inserted] == ["/0", "/1"]
+    assert len(spool.segments()) == 1
+    assert asyncio.run(spool.replay()) == 0
+
+
+def test_corrupt_segment_is_set_aside(tmp_path):
+    """
+    Test a segment with a bad record before its end is renamed aside,
+    not deleted, after the records ahead of it are inserted
+    """
+    writer = RecordingWriter()
+    spool = EventSpool(str(tmp_path), fsync_ms=0, writer=writer)
+    spool.append_rows(make_rows(3))
+    path = spool._path
+    spool.rotate()
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.seek(size * 2 // 3)
+        f.write(b"\xff")
+
+    assert asyncio.run(spool.replay()) == 2
+
+    assert spool.segments() == []
+    assert os.path.getsize(path + ".corrupt") == size
+    with open(path + ".corrupt.offset") as f:
+        assert 0 < int(f.read()) < size
+
+
+def test_failed_append_leaves_only_whole_records(tmp_path, monkeypatch):
+    """
+    Test a short write is cut off the segment and later appends go to a
+    new one, so every acknowledged row is replayed
+    """
+    real_write = os.write
+
+    def short_write(fd, data):
+        real_write(fd, bytes(data[:len(data) // 2]))
+        raise OSError(28, "No space left on device")
+
+    writer = RecordingWriter()
+    spool = EventSpool(str(tmp_path), fsync_ms=0, writer=writer)
+    spool.append_rows(make_rows(1))
+    monkeypatch.setattr(spool_module.os, "write", short_write)
+    with pytest.raises(OSError):
+        spool.append_rows(make_rows(2))
+    monkeypatch.setattr(spool_module.os, "write", real_write)
+    spool.append_rows(make_rows(1))
+
+    assert len(spool.segments()) == 2
+    assert asyncio.run(spool.replay()) == 2
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".corrupt")]
+
+
+def test_segment_being_written_is_not_replayed(tmp_path):
+    """
+    Test another worker's open segment is left alone until it rotates
+    """
+    writer = RecordingWriter()
+    other = EventSpool(str(tmp_path), fsync_ms=0)
+    other.append_rows(make_rows(2))
+    spool = EventSpool(str(tmp_path), fsync_ms=0, writer=writer)
+
+    assert asyncio.run(spool.replay()) == 0
+
+    other.rotate()
+    assert asyncio.run(spool.replay()) == 2
+
+
+def test_segments_rotate_by_size(tmp_path):
+    """
+    Test a new segment is started once the current one is full
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=0, segment_bytes=1)
+    spool.append_rows(make_rows(1))
+    spool.append_rows(make_rows(1))
+
+    assert len(spool.segments()) == 2
+
+
+def test_append_rejects_when_full(tmp_path):
+    """
+    Test the spool refuses events past max_bytes
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=0, max_bytes=10)
+
+    with pytest.raises(SpoolFullError):
+        spool.append_rows(make_rows(1))
+
+
+def test_batched_sync(tmp_path):
+    """
+    Test appends are marked dirty until the batched fsync runs
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=50)
+    spool.append_rows(make_rows(1))
+    assert spool._dirty
+
+    spool.sync()
+    assert not spool._dirty
+
+
+def test_segment_is_locked_before_it_is_visible(tmp_path):
+    """
+    Test a replayer can never lock (and so remove) a segment being written
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=0)
+    spool.append_rows(make_rows(1))
+
+    (path,) = spool.segments()
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".new")] == []
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        with pytest.raises(BlockingIOError):
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    finally:
+        os.close(fd)
+
+
+def test_abandoned_new_segments_are_removed(tmp_path):
+    """
+    Test an old, empty, unrenamed segment is cleaned up and a fresh one kept
+    """
+    stale = tmp_path / "1-1.spool.new"
+    fresh = tmp_path / "2-1.spool.new"
+    stale.touch()
+    fresh.touch()
+    old = time.time() - 2 * spool_module.ABANDONED_AFTER_S
+    os.utime(stale, (old, old))
+    spool = EventSpool(str(tmp_path), fsync_ms=0, writer=RecordingWriter())
+
+    asyncio.run(spool.replay())
+
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+def test_write_fsyncs_off_the_event_loop(tmp_path, monkeypatch):
+    """
+    Test per-append fsync (fsync_ms=0) runs in a thread before write returns
+    """
+    synced_in = []
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        synced_in.append(threading.current_thread())
+        real_fsync(fd)
+
+    monkeypatch.setattr(spool_module.os, "fsync", fsync)
+    spool = EventSpool(str(tmp_path), fsync_ms=0)
+
+    asyncio.run(spool.write(make_rows(2)))
+
+    assert synced_in
+    assert threading.main_thread() not in synced_in
+    assert not spool._dirty
+
+
+def test_create_event_spooled(test_client, mock_db, monkeypatch, tmp_path):
+    """
+    Test create_event spools the event and returns 202 in spool mode,
+    and /healthz reports the spool depth
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=0, writer=RecordingWriter())
+    monkeypatch.setattr("src.api.events.routing.event_spool", spool)
+    monkeypatch.setattr("src.main.event_spool", spool)
+
+    response = test_client.post("/api/events/", json={"page": "/", "session_id": "s1"})
+
+    assert response.status_code == 202
+    mock_db.exec.assert_not_called()
+    health = test_client.get("/healthz").json()
+    assert health["status"] == "ok"
+    assert health["spool"]["segments"] == 1
+    assert health["spool"]["bytes"] > 0
+
+
+def test_batch_spooled(test_client, mock_db, monkeypatch, tmp_path):
+    """
+    Test valid batch items are spooled and marked accepted
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=0, writer=RecordingWriter())
+    monkeypatch.setattr("src.api.events.routing.event_spool", spool)
+    items = [{"page": "/", "session_id": "s1"}, {"session_id": "s1"}]
+
+    response = test_client.post("/api/events/batch", json=items)
+
+    assert response.status_code == 202
+    body = response.json()
+    assert [result["status"] for result in body["results"]] == ["accepted", "invalid"]
+    assert body["created"] == 1
+    mock_db.exec.assert_not_called()
+
+
+def test_create_event_spool_full(test_client, mock_db, monkeypatch, tmp_path):
+    """
+    Test create_event sheds load with 503 when the spool is full
+    """
+    spool = EventSpool(str(tmp_path), fsync_ms=0, max_bytes=0, writer=RecordingWriter())
+    monkeypatch.setattr("src.api.events.routing.event_spool", spool)
+
+    response = test_client.post("/api/events/", json={"page": "/", "session_id": "s1"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,90 @@
+"""
+Tests for bounded time windows on GET /api/events/
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.api.events.timeranges import align_to_bucket, resolve_time_window
+
+
+END = datetime(2025, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def test_default_window_is_aligned():
+    """
+    Test the default window covers the default bucket count, first bucket complete
+    """
+    start, end = resolve_time_window("1 hour", end=END, default_buckets=24)
+    assert end == END
+    assert start == datetime(2025, 3, 9, 12, 0, tzinfo=timezone.utc)
+
+
+def test_since_window():
+    """
+    Test since is relative to the end of the window
+    """
+    start, end = resolve_time_window("1 hour", end=END, since="6 hours")
+    assert end - start == timedelta(hours=6)
+
+
+def test_naive_datetimes_are_utc():
+    """
+    Test naive query datetimes are treated as UTC
+    """
+    start, end = resolve_time_window("1 day", start=datetime(2025, 3, 1), end=datetime(2025, 3, 8))
+    assert start.tzinfo == timezone.utc
+    assert end - start == timedelta(days=7)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"duration": "1 minute", "since": "1 year"},
+    {"duration": "1 hour", "start": END, "end": END},
+    {"duration": "1 hour", "start": END - timedelta(days=1), "since": "1 day"},
+    {"duration": "1 day'; DROP TABLE eventmodel; --"},
+    {"duration": "1 hour", "since": "forever"},
+])
+def test_invalid_windows(kwargs):
+    """
+    Test invalid or oversized windows are rejected
+    """
+    with pytest.raises(ValueError):
+        resolve_time_window(end=kwargs.pop("end", END), max_buckets=2000, **kwargs)
+
+
+def test_align_to_bucket():
+    """
+    Test alignment matches time_bucket's Monday origin for weekly buckets
+    """
+    aligned = align_to_bucket(END, timedelta(weeks=1))
+    assert aligned == datetime(2025, 3, 10, tzinfo=timezone.utc)
+    assert aligned.weekday() == 0
+
+
+def test_read_events_bounds_time(test_client, mock_db):
+    """
+    Test read_events pushes the window into the WHERE clause
+    """
+    response = test_client.get("/api/events/", params={
+        "duration": "15 minutes",
+        "start": "2025-03-10T00:00:00Z",
+        "end": "2025-03-10T12:00:00Z",
+    })
+
+    assert response.status_code == 200
+    query = mock_db.exec.call_args[0][0]
+    sql = str(query)
+    assert "eventmodel.time >= " in sql
+    assert "eventmodel.time < " in sql
+    params = query.compile().params
+    assert datetime(2025, 3, 10, tzinfo=timezone.utc) in params.values()
+
+
+def test_read_events_too_many_buckets(test_client, mock_db):
+    """
+    Test a request producing too many buckets is rejected
+    """
+    response = test_client.get("/api/events/", params={"duration": "1 minute", "since": "3 months"})
+
+    assert response.status_code == 400
+    mock_db.exec.assert_not_called()
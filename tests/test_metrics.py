@@ -0,0 +1,121 @@
+"""
+Tests for the /metrics endpoint and the metrics registry
+"""
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.api.db import session
+from src.api.metrics.registry import Registry
+from src.api.metrics.sql import DB_QUERY_DURATION, instrument_engine, statement_type
+
+
+def test_histogram_render():
+    """
+    Test histograms render cumulative buckets, sum and count
+    """
+    registry = Registry()
+    latency = registry.histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    latency.labels("/").observe(0.05)
+    latency.labels("/").observe(0.5)
+    latency.labels("/").observe(5)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE demo_seconds histogram" in lines
+    assert 'demo_seconds_bucket{route="/",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/",le="+Inf"} 3' in lines
+    assert 'demo_seconds_sum{route="/"} 5.55' in lines
+    assert 'demo_seconds_count{route="/"} 3' in lines
+
+
+def test_counter_and_gauge_render():
+    """
+    Test counters, gauges and label escaping
+    """
+    registry = Registry()
+    counter = registry.counter("demo_total", "Demo.", ("path",))
+    gauge = registry.gauge("demo_in_flight", "Demo.")
+    counter.labels('a"b').inc(2)
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    text_output = registry.render()
+
+    assert 'demo_total{path="a\\"b"} 2' in text_output
+    assert "demo_in_flight 1" in text_output
+
+
+def test_duplicate_metric_names_rejected():
+    """
+    Test a metric name can only be registered once
+    """
+    registry = Registry()
+    registry.counter("demo_total", "Demo.")
+    with pytest.raises(ValueError):
+        registry.counter("demo_total", "Demo.")
+
+
+@pytest.mark.parametrize("statement,expected", [
+    ("SELECT 1", "SELECT"),
+    ("\n  insert into eventmodel ...", "INSERT"),
+    ("WITH x AS (SELECT 1) SELECT * FROM x", "WITH"),
+    ("SET statement_timeout = 0", "OTHER"),
+    ("", "OTHER"),
+])
+def test_statement_type(statement, expected):
+    """
+    Test SQL statements are labelled by their leading keyword
+    """
+    assert statement_type(statement) == expected
+
+
+def test_instrument_engine_times_queries():
+    """
+    Test engine events feed the query-duration histogram
+    """
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, "test")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert sum(DB_QUERY_DURATION.labels("test", "SELECT").counts) == 1
+
+
+def test_metrics_endpoint(test_client, monkeypatch):
+    """
+    Test /metrics exposes per-route request metrics in Prometheus text format
+    """
+    monkeypatch.setattr(session, "_engines", {})
+    monkeypatch.setattr(session, "DATABASE_URL", "postgresql+psycopg://user:pw@localhost/db")
+    session.get_engine()
+    test_client.get("/healthz")
+    test_client.get("/items/1")
+    test_client.get("/items/2")
+
+    response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/healthz"}' in body
+    # route templates, not raw paths
+    assert 'route="/items/{item_id}"' in body
+    assert 'route="/items/1"' not in body
+    assert "http_requests_in_flight" in body
+    assert 'db_pool_checked_out{engine="sync"}' in body
+
+
+def test_metrics_without_engines(test_client, monkeypatch):
+    """
+    Test a scrape creates no engine and works without DATABASE_URL
+    """
+    monkeypatch.setattr(session, "_engines", {})
+    monkeypatch.setattr(session, "DATABASE_URL", "")
+
+    response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert session._engines == {}
@@ -0,0 +1,192 @@
+"""
+Tests for the shared-memory counters and hash table
+"""
+import asyncio
+import json
+import multiprocessing
+
+import pytest
+
+from src.api.events.dimensions import DimensionCache
+from src.api.events.live import LiveCounts
+from src.api.events.models import PageDimension
+from src.api.shm import SharedCounters, SharedMemoryFullError, SharedTable
+
+# fork, so children attach to the files on their own like gunicorn workers
+fork = multiprocessing.get_context("fork")
+
+
+def add_counts(path, times):
+    counters = SharedCounters(path, 2, workers=8)
+    for _ in range(times):
+        counters.add(0)
+        counters.add(1, 2)
+
+
+def add_to_key(path, times):
+    table = SharedTable(path, capacity=64, stripes=4)
+    for _ in range(times):
+        table.add("/pricing")
+
+
+def run_workers(target, *args, workers=4):
+    processes = [fork.Process(target=target, args=args) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+
+def test_counters_sum_across_processes(tmp_path):
+    """
+    Test every worker writes its own row and reads see the total
+    """
+    path = str(tmp_path / "counters.shm")
+    run_workers(add_counts, path, 500)
+
+    counters = SharedCounters(path, 2, workers=8)
+    assert counters.values() == [2000, 4000]
+    assert counters.value(0) == 2000
+
+
+def test_counters_run_out_of_rows(tmp_path):
+    """
+    Test a process can't attach once every row is held by a live worker
+    """
+    path = str(tmp_path / "counters.shm")
+    ready = fork.Event()
+    done = fork.Event()
+
+    def hold():
+        SharedCounters(path, 1, workers=1).add(0)
+        ready.set()
+        done.wait(10)
+
+    holder = fork.Process(target=hold)
+    holder.start()
+    try:
+        assert ready.wait(10)
+        with pytest.raises(SharedMemoryFullError):
+            SharedCounters(path, 1, workers=1).add(0)
+    finally:
+        done.set()
+        holder.join()
+
+
+def test_counters_count_attached_processes(tmp_path):
+    """
+    Test attached() sees live workers and stops counting them on exit
+    """
+    path = str(tmp_path / "counters.shm")
+    ready = fork.Event()
+    done = fork.Event()
+
+    def hold():
+        SharedCounters(path, 1, workers=4).attached()
+        ready.set()
+        done.wait(10)
+
+    counters = SharedCounters(path, 1, workers=4)
+    assert counters.attached() == 1
+    holder = fork.Process(target=hold)
+    holder.start()
+    try:
+        assert ready.wait(10)
+        assert counters.attached() == 2
+        # probing doesn't take the other row away
+        assert counters.attached() == 2
+    finally:
+        done.set()
+        holder.join()
+    assert counters.attached() == 1
+
+
+def test_table_set_get_add(tmp_path):
+    """
+    Test basic reads and writes, and keys the table can't hold
+    """
+    table = SharedTable(str(tmp_path / "table.shm"), capacity=8, stripes=1, key_size=8)
+
+    assert table.get("/") is None
+    assert table.set("/", 7) == 7
+    assert table.add("/", 3) == 10
+    assert table.get("/") == 10
+    assert table.set("/toolong/", 1) is None
+    assert table.get("/toolong/") is None
+
+    for i in range(7):
+        table.set(f"/{i}", i)
+    assert table.set("/full", 1) is None
+    assert len(dict(table.items())) == 8
+
+
+def test_table_adds_across_processes(tmp_path):
+    """
+    Test stripe locks keep concurrent increments of one key exact
+    """
+    path = str(tmp_path / "table.shm")
+    run_workers(add_to_key, path, 500)
+
+    assert SharedTable(path, capacity=64, stripes=4).get("/pricing") == 2000
+
+
+def test_table_epochs(tmp_path):
+    """
+    Test a newer epoch clears the table and older writes are dropped
+    """
+    table = SharedTable(str(tmp_path / "table.shm"), capacity=8, stripes=2)
+    table.add("/", epoch=5)
+    table.add("/", epoch=5)
+    assert dict(table.items()) == {"/": 2}
+
+    table.add("/pricing", epoch=6)
+    assert table.epoch == 6
+    assert dict(table.items()) == {"/pricing": 1}
+    assert table.add("/", epoch=5) is None
+
+
+def test_table_layout_change_resets(tmp_path):
+    """
+    Test attaching with a different layout starts from an empty table
+    """
+    path = str(tmp_path / "table.shm")
+    SharedTable(path, capacity=8, stripes=2).set("/", 1)
+
+    assert SharedTable(path, capacity=16, stripes=2).get("/") is None
+
+
+def test_dimension_cache_uses_shared_ids(tmp_path, mock_db):
+    """
+    Test an id resolved by one worker's cache is reused by another's
+    without a database round trip
+    """
+    shared = SharedTable(str(tmp_path / "dimension_ids.shm"), capacity=64, stripes=4)
+    mock_db.exec.return_value.all.return_value = [(3, "/pricing")]
+    first = DimensionCache(PageDimension, shared=shared)
+    second = DimensionCache(PageDimension, shared=shared)
+
+    assert asyncio.run(first.resolve(mock_db, ["/pricing"])) == {"/pricing": 3}
+    mock_db.exec.reset_mock()
+    assert asyncio.run(second.resolve(mock_db, ["/pricing"])) == {"/pricing": 3}
+    assert not mock_db.exec.called
+
+
+def test_live_counts_shared_between_workers(tmp_path):
+    """
+    Test live snapshots count what every worker recorded
+    """
+    table = str(tmp_path / "live_counts.shm")
+    events = str(tmp_path / "live_events.shm")
+    workers = [
+        LiveCounts(shared=SharedTable(table, capacity=64, stripes=4),
+                   shared_events=SharedCounters(events, 1))
+        for _ in range(2)
+    ]
+    workers[0].record("/")
+    workers[1].record("/")
+    workers[1].record("/pricing")
+
+    assert workers[0].publish() is True
+    assert json.loads(workers[0].snapshot.payload)["counts"] == {"/": 2, "/pricing": 1}
+    assert workers[0].publish() is False
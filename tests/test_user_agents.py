@@ -0,0 +1,85 @@
+"""
+Tests for the ingest-time user-agent classifier
+"""
+import pytest
+
+from src.api.events.ingest import event_row
+from src.api.events.models import EventCreateSchema
+from src.api.events.user_agents import classify_user_agent
+
+
+@pytest.mark.parametrize("user_agent,expected", [
+    (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0",
+        ("Windows", "Edge", "Desktop"),
+    ),
+    (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+        "Version/17.0 Safari/605.1.15",
+        ("MacOS", "Safari", "Desktop"),
+    ),
+    (
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) CriOS/120.0 Mobile/15E148 Safari/604.1",
+        ("iOS", "Chrome", "Mobile"),
+    ),
+    (
+        "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0 Mobile Safari/537.36",
+        ("Android", "Chrome", "Mobile"),
+    ),
+    (
+        "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+        ("Linux", "Firefox", "Desktop"),
+    ),
+    (
+        "Googlebot/2.1 (+http://www.google.com/bot.html)",
+        ("Other", "Other", "Bot"),
+    ),
+    ("", ("Other", "Other", "Other")),
+    (None, ("Other", "Other", "Other")),
+])
+def test_classify_user_agent(user_agent, expected):
+    """
+    Test common user agents are classified
+    """
+    assert tuple(classify_user_agent(user_agent)) == expected
+
+
+def test_classify_user_agent_is_cached():
+    """
+    Test repeated user agents are served from the LRU cache
+    """
+    classify_user_agent.cache_clear()
+    classify_user_agent("Mozilla/5.0 (Windows NT 10.0)")
+    classify_user_agent("Mozilla/5.0 (Windows NT 10.0)")
+    info = classify_user_agent.cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
+
+
+def test_event_row_adds_derived_columns():
+    """
+    Test ingested rows carry the classification
+    """
+    payload = EventCreateSchema(page="/", user_agent="Mozilla/5.0 (Macintosh)", session_id="s1")
+    row = event_row(payload)
+    assert row["operating_system"] == "MacOS"
+    assert row["device_type"] == "Desktop"
+
+
+def test_create_event_stores_operating_system(test_client, mock_db):
+    """
+    Test create_event classifies the user agent before saving
+    """
+    response = test_client.post("/api/events/", json={
+        "page": "/",
+        "user_agent": "Mozilla/5.0 (Linux; Android 14) Mobile",
+        "session_id": "s1",
+    })
+
+    assert response.status_code == 200
+    assert response.json()["operating_system"] == "Android"
+    insert = mock_db.exec.call_args[0][0]
+    assert insert.compile().params["device_type"] == "Mobile"
@@ -14,8 +14,8 @@ def client():
     """
     # Create a mock for init_db that does nothing
     with patch('src.api.db.session.init_db'):
-        # Also mock the get_session function
-        with patch('src.api.events.routing.get_session', return_value=MagicMock()):
+        # Also mock the get_async_session function
+        with patch('src.api.events.routing.get_read_session', return_value=MagicMock()):
             with TestClient(app) as test_client:
                 yield test_client
 